@@ -0,0 +1,102 @@
+"""Recall@k versus query latency for the FAISS index kinds in rob2.rag.store.
+
+Builds each index over a synthetic, clustered corpus of unit vectors (so
+the numbers resemble embedding search rather than uniform noise), then sweeps
+``nprobe`` for IVF kinds and ``efSearch`` for HNSW. Ground truth is exact
+inner-product search. Latency is measured one query at a time, as the RAG
+path issues them.
+
+    python benchmarks/bench_ann.py --n 200000 --dim 1536 --k 10
+"""
+
+import argparse
+import sys
+import time
+from dataclasses import replace
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import faiss  # noqa: E402
+
+from rob2.rag.store import IndexConfig, build_index, prepare_vectors, set_search_params  # noqa: E402
+
+
+def synthetic_corpus(n: int, dim: int, clusters: int, queries: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype("float32")
+
+    def sample(count):
+        points = centers[rng.integers(clusters, size=count)] + 0.6 * rng.normal(size=(count, dim)).astype("float32")
+        return points.astype("float32")
+
+    return sample(n), sample(queries)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray, k: int) -> float:
+    hits = sum(len(set(f[:k]) & set(t[:k])) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def time_queries(index, queries: np.ndarray, k: int):
+    found = np.empty((len(queries), k), dtype="int64")
+    started = time.perf_counter()
+    for row, query in enumerate(queries):
+        _, ids = index.search(query.reshape(1, -1), k)
+        found[row] = ids[0]
+    return found, (time.perf_counter() - started) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=100_000, help="corpus vectors")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--kinds", default="flat-ip,ivf-flat,ivf-pq,hnsw")
+    parser.add_argument("--nprobe", default="1,4,16,64")
+    parser.add_argument("--ef-search", default="16,64,256")
+    parser.add_argument("--pq-m", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=1, help="FAISS OpenMP threads")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(args.threads)
+    corpus, queries = synthetic_corpus(args.n, args.dim, args.clusters, args.queries)
+    ids = np.arange(args.n, dtype="int64")
+    exact_config = IndexConfig(kind="flat-ip")
+    corpus = prepare_vectors(corpus, exact_config)
+    queries = prepare_vectors(queries, exact_config)
+    exact = faiss.IndexFlatIP(args.dim)
+    exact.add(corpus)
+    _, truth = exact.search(queries, args.k)
+
+    print(f"{args.n} vectors, dim {args.dim}, {args.queries} queries, k={args.k}")
+    print(f"{'kind':<10}{'param':<14}{'build s':>9}{'size MB':>9}{'ms/query':>10}{f'recall@{args.k}':>11}")
+    for kind in args.kinds.split(","):
+        config = IndexConfig(kind=kind, pq_m=args.pq_m, min_train=0)
+        started = time.perf_counter()
+        index = build_index(config, corpus, ids)
+        build_seconds = time.perf_counter() - started
+        size_mb = faiss.serialize_index(index).nbytes / 1e6
+        if kind.startswith("ivf"):
+            sweep = [("nprobe", int(v)) for v in args.nprobe.split(",")]
+        elif kind == "hnsw":
+            sweep = [("ef_search", int(v)) for v in args.ef_search.split(",")]
+        else:
+            sweep = [("", 0)]
+        for field, value in sweep:
+            if field:
+                set_search_params(index, replace(config, **{field: value}))
+            found, ms = time_queries(index, queries, args.k)
+            param = f"{field}={value}" if field else "exact"
+            print(
+                f"{kind:<10}{param:<14}{build_seconds:>9.1f}{size_mb:>9.1f}{ms:>10.3f}"
+                f"{recall_at_k(found, truth, args.k):>11.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Compare per-question and batched-domain prompting on real studies.
+
+Runs both modes over the same PDFs with the response cache disabled and
+reports tokens, estimated cost, wall-clock time, answer agreement on the
+questions both modes asked, and agreement of the final domain judgements.
+
+    python benchmarks/bench_batched.py studies/ --limit 5
+
+``--backend mock`` runs the same comparison offline with
+``rob2.backends.MockBackend`` (answers are deterministic, so it measures
+the engine, not the model).
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from compare import agreement, report  # noqa: E402
+from rob2.backends import make_backend  # noqa: E402
+from rob2.runner import AssessmentRunner, RunnerConfig  # noqa: E402
+
+
+async def run_mode(client, pdfs, batch_domains: bool, args):
+    config = RunnerConfig(
+        model=args.model,
+        max_concurrency=args.concurrency,
+        tokens_per_minute=args.tpm,
+        use_cache=False,
+        batch_domains=batch_domains,
+    )
+    runner = AssessmentRunner(client, config=config)
+    started = time.perf_counter()
+    results = await runner.run(pdfs)
+    return results, time.perf_counter() - started, runner.limiter.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("studies", type=Path)
+    parser.add_argument("--limit", type=int, default=3)
+    parser.add_argument("--model", default=RunnerConfig.model)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--tpm", type=int, default=RunnerConfig.tokens_per_minute)
+    parser.add_argument("--price", type=float, default=2.0, help="USD per 1M tokens (blended)")
+    parser.add_argument("--backend", choices=["responses", "chat", "mock"], default="responses")
+    parser.add_argument("--base-url", help="OpenAI-compatible API base URL")
+    args = parser.parse_args()
+
+    client = make_backend(args.backend, base_url=args.base_url)
+    pdfs = sorted(args.studies.glob("*.pdf"))[: args.limit]
+    if not pdfs:
+        raise SystemExit(f"No PDFs in {args.studies}")
+
+    single, single_time, single_stats = asyncio.run(run_mode(client, pdfs, False, args))
+    batched, batched_time, batched_stats = asyncio.run(run_mode(client, pdfs, True, args))
+
+    counts = agreement(AssessmentRunner(client).specs, single, batched)
+    report((("per-question", single_stats, single_time), ("batched", batched_stats, batched_time)), counts, args.price)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Throughput of the full multi-study engine against the mock backend.
+
+Runs ``AssessmentRunner`` over synthetic studies with
+``rob2.backends.MockBackend`` standing in for the provider, so concurrency,
+speculation and batching can be tuned without paying for calls. Rate limits
+are off unless ``--rpm``/``--tpm`` are given; ``--latency`` and
+``--failure-rate`` simulate provider response times and 429s. The mock also
+simulates the provider's prompt cache, so ``--layout question_first`` shows
+what the prefix layout saves.
+
+    python benchmarks/bench_engine.py --studies 2000 --latency 0.5 --concurrency 256
+"""
+
+import argparse
+import asyncio
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rob2.backends import MockBackend  # noqa: E402
+from rob2.llm import PREFIX_LAYOUT, QUESTION_FIRST_LAYOUT  # noqa: E402
+from rob2.runner import AssessmentRunner, RunnerConfig, Study  # noqa: E402
+from rob2.usage import pricing_for  # noqa: E402
+
+
+def synthetic_studies(root: Path, n: int):
+    studies = []
+    for i in range(n):
+        path = root / f"{i:05d}_Mock_2024.pdf"
+        path.write_bytes(f"%PDF-1.4 mock study {i}\n".encode())
+        studies.append(Study(path))
+    return studies
+
+
+async def run_mode(label: str, studies, args, **options):
+    backend = MockBackend(latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate, seed=args.seed)
+    config = RunnerConfig(
+        max_concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        use_cache=False,
+        prompt_layout=args.layout,
+        **options,
+    )
+    runner = AssessmentRunner(backend, config=config)
+    for study in studies:
+        study.file_id = None
+    started = time.perf_counter()
+    results = await runner.run(studies)
+    seconds = time.perf_counter() - started
+    answers = sum(len(result.rows) for result in results)
+    errors = sum(not result.ok for result in results)
+    stats = runner.limiter.stats
+    usage = runner.usage
+    print(
+        f"{label:<14}{seconds:>9.2f}{len(studies) / seconds * 60:>14.0f}{answers / seconds * 60:>14.0f}"
+        f"{stats.requests:>10}{stats.retries:>9}{errors:>8}"
+        f"{usage.cache_hit_ratio:>9.0%}{pricing_for(runner.model).cost(usage):>10.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--studies", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=256, help="requests in flight")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per call")
+    parser.add_argument("--jitter", type=float, default=0.3, help="latency jitter as a fraction")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of calls answered with a 429")
+    parser.add_argument("--rpm", type=int, default=0, help="requests per minute (0: unlimited)")
+    parser.add_argument("--tpm", type=int, default=0, help="tokens per minute (0: unlimited)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--layout", choices=[PREFIX_LAYOUT, QUESTION_FIRST_LAYOUT], default=PREFIX_LAYOUT)
+    parser.add_argument(
+        "--modes", default="question,speculate,batched", help="comma-separated: question, speculate, batched"
+    )
+    args = parser.parse_args()
+
+    modes = {
+        "question": {},
+        "speculate": {"speculate": True},
+        "batched": {"batch_domains": True},
+    }
+    work = Path(tempfile.mkdtemp(prefix="rob2_engine_"))
+    try:
+        studies = synthetic_studies(work, args.studies)
+        print(f"{args.studies} studies, {args.latency}s simulated latency, concurrency {args.concurrency}")
+        print(f"{'mode':<14}{'seconds':>9}{'studies/min':>14}{'answers/min':>14}{'requests':>10}{'retries':>9}{'errors':>8}{'cached':>9}{'cost $':>10}")
+        for mode in args.modes.split(","):
+            asyncio.run(run_mode(mode, studies, args, **modes[mode]))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
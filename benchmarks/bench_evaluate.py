@@ -0,0 +1,61 @@
+"""Bulk versus scalar domain evaluation on random answer matrices.
+
+For each domain, draws ``--rows`` random response codes per question,
+evaluates them with ``evaluate_many`` (table gather) and a sample of them
+with the scalar ``evaluate`` rule chain, checks that both agree on the
+sample, and reports rows per second for each path.
+
+    python benchmarks/bench_evaluate.py --rows 1000000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rob2.common import JUDGEMENT_CODE, RESPONSE_CODES  # noqa: E402
+from rob2.domains import get_domain_specs  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--scalar-rows", type=int, default=50_000, help="rows timed on the scalar path")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'domain':<24}{'compile s':>10}{'bulk s':>9}{'bulk rows/s':>14}{'scalar rows/s':>15}{'speed-up':>10}")
+    for key, spec in get_domain_specs().items():
+        codes = rng.integers(len(RESPONSE_CODES), size=(args.rows, len(spec.questions)), dtype=np.uint8)
+
+        started = time.perf_counter()
+        spec.evaluate_many(codes[:1])
+        compile_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        judgements, _ = spec.evaluate_many(codes)
+        bulk_seconds = time.perf_counter() - started
+
+        sample = codes[: args.scalar_rows]
+        started = time.perf_counter()
+        scalar = [spec.evaluate(*(RESPONSE_CODES[code] for code in row)).judgement for row in sample.tolist()]
+        scalar_seconds = time.perf_counter() - started
+        expected = np.array([JUDGEMENT_CODE[judgement] for judgement in scalar], dtype=np.uint8)
+        if not np.array_equal(judgements[: len(sample)], expected):
+            raise SystemExit(f"{key}: bulk and scalar judgements disagree")
+
+        bulk_rate = args.rows / bulk_seconds
+        scalar_rate = len(sample) / scalar_seconds
+        print(
+            f"{key:<24}{compile_seconds:>10.3f}{bulk_seconds:>9.3f}{bulk_rate:>14,.0f}{scalar_rate:>15,.0f}"
+            f"{bulk_rate / scalar_rate:>9.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Export time and file size for response rows in each output format.
+
+Generates synthetic rows shaped like the runner's (justifications and
+citations of realistic length), streams them study by study through each
+``rob2.export`` writer, and compares against the old per-study
+``pandas.DataFrame.to_excel`` path.
+
+    python benchmarks/bench_export.py --rows 10000
+"""
+
+import argparse
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rob2.export import ArrowWriter, CsvWriter, ExcelWriter, ParquetDatasetWriter, clean_excel  # noqa: E402
+
+WORDS = "randomised allocation concealed participants outcome assessors blinded analysis protocol missing".split()
+
+
+def synthetic_rows(n: int, rows_per_study: int, seed: int = 0):
+    rng = random.Random(seed)
+
+    def text(words):
+        return " ".join(rng.choice(WORDS) for _ in range(words))
+
+    studies = []
+    for start in range(0, n, rows_per_study):
+        name = f"{start // rows_per_study:05d}_Author_2021.pdf"
+        rows = []
+        for i in range(min(rows_per_study, n - start)):
+            domain = f"domain_{i % 5 + 1}"
+            rows.append({
+                "file_name": name,
+                "domain": domain,
+                "question_code": f"{i % 5 + 1}.{i // 5 + 1}",
+                "question_text": text(15),
+                "prompt_path": f"prompts/{domain}/question_{i // 5 + 1}.txt",
+                "answer": rng.choice(["Y", "PY", "NI", "PN", "N"]),
+                "justification": text(rng.randint(40, 120)),
+                "citations": "; ".join(text(rng.randint(10, 30)) for _ in range(rng.randint(0, 3))),
+            })
+        studies.append(rows)
+    return studies
+
+
+def size_of(path: Path) -> int:
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+    return path.stat().st_size
+
+
+def pandas_excel(studies, out: Path):
+    import pandas as pd
+
+    out.mkdir(parents=True, exist_ok=True)
+    for rows in studies:
+        pd.DataFrame([clean_excel(row) for row in rows]).to_excel(out / f"{rows[0]['file_name']}.xlsx", index=False)
+
+
+def stream(writer, studies):
+    with writer:
+        for rows in studies:
+            writer.write(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--rows-per-study", type=int, default=20)
+    args = parser.parse_args()
+
+    studies = synthetic_rows(args.rows, args.rows_per_study)
+    work = Path(tempfile.mkdtemp(prefix="rob2_export_"))
+    cases = [
+        ("csv", work / "rows.csv", lambda p: stream(CsvWriter(p), studies)),
+        ("arrow", work / "rows.arrow", lambda p: stream(ArrowWriter(p), studies)),
+        ("parquet (zstd)", work / "parquet", lambda p: stream(ParquetDatasetWriter(p), studies)),
+        ("xlsx per study (write-only)", work / "xlsx", lambda p: stream(ExcelWriter(p), studies)),
+        ("xlsx per study (pandas)", work / "xlsx_pandas", lambda p: pandas_excel(studies, p)),
+    ]
+    print(f"{args.rows} rows in {len(studies)} studies")
+    print(f"{'format':<30}{'seconds':>9}{'size MB':>9}")
+    try:
+        for label, path, run in cases:
+            started = time.perf_counter()
+            try:
+                run(path)
+            except ImportError as exc:
+                print(f"{label:<30}  skipped ({exc.name} not installed)")
+                continue
+            seconds = time.perf_counter() - started
+            print(f"{label:<30}{seconds:>9.2f}{size_of(path) / 1e6:>9.2f}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
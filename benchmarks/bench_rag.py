@@ -0,0 +1,77 @@
+"""Compare whole-PDF and retrieval-augmented answering on real studies.
+
+Runs the per-question walk twice over the same PDFs with the response cache
+disabled: once attaching each PDF, once sending only the top-k retrieved
+chunks per question (rob2.rag.qa). Reports requests, tokens, estimated cost,
+wall-clock time (RAG includes indexing new studies) and agreement of answers
+and domain judgements. Embedding requests are not included in the token
+counts.
+
+    python benchmarks/bench_rag.py studies/ --limit 5 --k 6
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from compare import agreement, report  # noqa: E402
+from rob2.ratelimit import RateLimiter  # noqa: E402
+from rob2.runner import AssessmentRunner, RunnerConfig  # noqa: E402
+
+
+async def run_mode(client, pdfs, retriever, args):
+    config = RunnerConfig(
+        model=args.model,
+        max_concurrency=args.concurrency,
+        tokens_per_minute=args.tpm,
+        use_cache=False,
+    )
+    runner = AssessmentRunner(client, config=config, retriever=retriever)
+    started = time.perf_counter()
+    results = await runner.run(pdfs)
+    return results, time.perf_counter() - started, runner.limiter.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("studies", type=Path)
+    parser.add_argument("--limit", type=int, default=3)
+    parser.add_argument("--k", type=int, default=6, help="chunks retrieved per question")
+    parser.add_argument("--index-dir", type=Path, default=Path("rag_index"))
+    parser.add_argument("--model", default=RunnerConfig.model)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--tpm", type=int, default=RunnerConfig.tokens_per_minute)
+    parser.add_argument("--price", type=float, default=2.0, help="USD per 1M tokens (blended)")
+    args = parser.parse_args()
+
+    from openai import AsyncOpenAI, OpenAI
+
+    from rob2.rag.embeddings import embed_texts
+    from rob2.rag.qa import Retriever
+    from rob2.rag.store import CorpusIndex
+
+    client = AsyncOpenAI(max_retries=0)
+    embed_client = OpenAI(max_retries=0)
+    embed_limiter = RateLimiter(requests_per_minute=3_000, tokens_per_minute=1_000_000)
+    pdfs = sorted(args.studies.glob("*.pdf"))[: args.limit]
+    if not pdfs:
+        raise SystemExit(f"No PDFs in {args.studies}")
+
+    corpus = CorpusIndex(args.index_dir)
+    retriever = Retriever(corpus, lambda texts: embed_texts(embed_client, texts, limiter=embed_limiter), k=args.k)
+
+    full, full_time, full_stats = asyncio.run(run_mode(client, pdfs, None, args))
+    rag, rag_time, rag_stats = asyncio.run(run_mode(client, pdfs, retriever, args))
+    corpus.close()
+
+    counts = agreement(AssessmentRunner(client).specs, full, rag)
+    report((("whole-PDF", full_stats, full_time), (f"rag k={args.k}", rag_stats, rag_time)), counts, args.price)
+    print(f"token reduction: {full_stats.tokens / max(rag_stats.tokens, 1):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
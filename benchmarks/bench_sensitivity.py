@@ -0,0 +1,67 @@
+"""Time single-answer sensitivity analysis for a simulated review.
+
+Each simulated study walks every domain (Domain 2 effect of assignment)
+with uniformly drawn model answers, then ``SensitivityAnalyzer`` reports
+every flip. The first pass includes building each domain's enumeration; the
+second reuses it, as a re-run over an updated review would.
+
+    python benchmarks/bench_sensitivity.py --studies 1000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rob2.decision import ANSWER_CHOICES  # noqa: E402
+from rob2.domains import get_domain_specs  # noqa: E402
+from rob2.sensitivity import SensitivityAnalyzer  # noqa: E402
+
+DOMAINS = (
+    "domain_1_randomization",
+    "domain_2_assigment",
+    "domain_3_missing_data",
+    "domain_4_measurement",
+    "domain_5_reporting",
+)
+
+
+def simulate(specs, studies: int, seed: int):
+    rng = random.Random(seed)
+    review = {}
+    for n in range(studies):
+        states = {}
+        for key in DOMAINS:
+            state = {}
+            code = specs[key].get_next_question(state)
+            while code is not None:
+                state[code] = rng.choice(ANSWER_CHOICES)
+                code = specs[key].get_next_question(state)
+            states[key] = state
+        review[f"study_{n:04d}"] = states
+    return review
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--studies", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    specs = get_domain_specs()
+    review = simulate(specs, args.studies, args.seed)
+    analyzer = SensitivityAnalyzer(specs)
+    for label in ("cold", "warm"):
+        started = time.perf_counter()
+        reports = analyzer.analyze_many(review)
+        seconds = time.perf_counter() - started
+        flips = sum(len(report.flips) for report in reports)
+        changing = sum(len(report.changing()) for report in reports)
+        print(f"{label}: {len(reports)} studies, {flips} flips ({changing} changing) in {seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Shared reporting for benchmarks that compare two runner modes."""
+
+import sys
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rob2.common import DomainSpec  # noqa: E402
+from rob2.decision import evaluate_state  # noqa: E402
+from rob2.runner import StudyResult  # noqa: E402
+
+
+def cost(tokens: int, price_per_million: float) -> float:
+    return tokens / 1_000_000 * price_per_million
+
+
+def agreement(
+    specs: Dict[str, DomainSpec], results_a: List[StudyResult], results_b: List[StudyResult]
+) -> Tuple[int, int, int, int]:
+    """``(same_answer, shared, same_judgement, judged)`` between two runs over the same studies.
+
+    Answers are compared on questions both runs asked; judgements on domains
+    neither run failed.
+    """
+    shared = same_answer = judged = same_judgement = 0
+    for a, b in zip(results_a, results_b):
+        for domain_key, state_a in a.states.items():
+            state_b = b.states.get(domain_key, {})
+            for code, answer in state_a.items():
+                if code in state_b:
+                    shared += 1
+                    same_answer += answer == state_b[code]
+            if domain_key in a.errors or domain_key in b.errors:
+                continue
+            spec = specs[domain_key]
+            judged += 1
+            same_judgement += evaluate_state(spec, state_a).judgement == evaluate_state(spec, state_b).judgement
+    return same_answer, shared, same_judgement, judged
+
+
+def report(modes: Sequence[Tuple[str, object, float]], counts: Tuple[int, int, int, int], price: float) -> None:
+    """Print requests/tokens/cost/time per ``(name, ThrottleStats, seconds)`` and the agreement counts."""
+    print(f"{'mode':<14}{'requests':>10}{'tokens':>12}{'cost $':>10}{'seconds':>10}")
+    for name, stats, elapsed in modes:
+        print(f"{name:<14}{stats.requests:>10}{stats.tokens:>12}{cost(stats.tokens, price):>10.3f}{elapsed:>10.1f}")
+    same_answer, shared, same_judgement, judged = counts
+    print(f"answer agreement:    {same_answer}/{shared} ({same_answer / max(shared, 1):.0%})")
+    print(f"judgement agreement: {same_judgement}/{judged} ({same_judgement / max(judged, 1):.0%})")
@@ -0,0 +1,458 @@
+"""Pluggable LLM backends behind one sync/async interface.
+
+The runner asks questions through an :class:`LLMBackend`, which turns an
+:class:`~rob2.llm.LLMRequest` (prompt, optional uploaded PDF, model and JSON
+schema) into a :class:`~rob2.llm.Completion`:
+
+- :class:`OpenAIResponsesBackend` wraps an ``OpenAI`` or ``AsyncOpenAI``
+  client and sends Responses API requests, as the notebook does.
+- :class:`OpenAIChatBackend` sends the same request to Chat Completions.
+- :class:`HTTPBackend` posts Chat Completions requests to any
+  OpenAI-compatible server (vLLM, llama.cpp, Ollama) over ``httpx``; it
+  cannot read PDFs, so use it with a retriever (see :mod:`rob2.rag.qa`).
+- :class:`MockBackend` answers locally and deterministically, from a script
+  or a hash of the request, with optional simulated latency and 429s, for
+  load tests and CI.
+
+``AssessmentRunner`` still accepts a bare OpenAI client, which
+:func:`as_backend` wraps in :class:`OpenAIResponsesBackend`;
+:func:`make_backend` builds one by name for the CLI and benchmarks.
+"""
+
+import asyncio
+import hashlib
+import inspect
+import json
+import random
+import time
+from typing import Any, Callable, Dict, Mapping, Optional, Sequence, Union
+
+from .llm import (
+    PREFIX_LAYOUT,
+    Completion,
+    LLMRequest,
+    Usage,
+    build_request,
+    cached_tokens,
+    estimate_tokens,
+    usage_tokens,
+)
+from .ratelimit import _headers_of
+
+ANSWER_CHOICES = ("Y", "PY", "PN", "N", "NI")
+
+
+class BackendError(Exception):
+    """HTTP error from a backend, shaped like OpenAI's so the rate limiter can retry it."""
+
+    def __init__(self, message: str, status_code: int, headers: Optional[Mapping[str, str]] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class LLMBackend:
+    """Answer :class:`~rob2.llm.LLMRequest` objects; subclasses implement ``complete`` or ``acomplete``."""
+
+    #: Whether ``upload`` is supported and ``LLMRequest.file_id`` is honoured.
+    supports_files = True
+    #: Whether uploads are OpenAI file ids that :class:`~rob2.files.FileRegistry` may record and reuse.
+    openai_files = False
+
+    def complete(self, request: LLMRequest) -> Completion:
+        raise NotImplementedError
+
+    async def acomplete(self, request: LLMRequest) -> Completion:
+        return await asyncio.to_thread(self.complete, request)
+
+    def upload(self, name: str, data: bytes) -> str:
+        """Upload a PDF and return the id to put in ``LLMRequest.file_id``."""
+        raise NotImplementedError(f"{type(self).__name__} cannot read PDFs; pass a retriever instead")
+
+    async def aupload(self, name: str, data: bytes) -> str:
+        return await asyncio.to_thread(self.upload, name, data)
+
+    def model_name(self, model: str) -> str:
+        """Model recorded in cache and journal keys, so answers from different backends never mix."""
+        return model
+
+
+def _is_async(method) -> bool:
+    return inspect.iscoroutinefunction(method)
+
+
+def _json_schema_format(request: LLMRequest) -> Dict[str, Any]:
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": request.schema_name, "schema": request.schema, "strict": True},
+    }
+
+
+def _chat_messages(request: LLMRequest, content) -> list:
+    messages = [{"role": "user", "content": content}]
+    if request.preamble:
+        messages.insert(0, {"role": "system", "content": request.preamble})
+    return messages
+
+
+def _chat_completion(response, headers: Optional[Mapping[str, str]] = None) -> Completion:
+    usage = getattr(response, "usage", None)
+    return Completion(
+        response.choices[0].message.content or "",
+        Usage(
+            getattr(usage, "prompt_tokens", 0) or 0,
+            getattr(usage, "completion_tokens", 0) or 0,
+            cached_tokens(response),
+        ),
+        headers,
+    )
+
+
+def _parsed(raw):
+    """``(response, headers)`` from a ``with_raw_response`` result or a plain response."""
+    headers = _headers_of(raw)
+    if headers is not None and callable(getattr(raw, "parse", None)):
+        return raw.parse(), headers
+    return raw, None
+
+
+# --------------------------------------------
+# OpenAI SDK backends
+# --------------------------------------------
+class _OpenAIBackend(LLMBackend):
+    """Shared upload handling for an ``OpenAI`` or ``AsyncOpenAI`` client."""
+
+    openai_files = True
+
+    def __init__(self, client):
+        self.client = client
+
+    def _create(self, kind: str):
+        api = getattr(self.client, kind) if kind == "responses" else self.client.chat.completions
+        return getattr(api, "with_raw_response", api).create
+
+    def upload(self, name: str, data: bytes) -> str:
+        if _is_async(self.client.files.create):
+            raise TypeError("Use aupload with an AsyncOpenAI client")
+        return self.client.files.create(file=(name, data), purpose="user_data").id
+
+    async def aupload(self, name: str, data: bytes) -> str:
+        if not _is_async(self.client.files.create):
+            return await super().aupload(name, data)
+        file = await self.client.files.create(file=(name, data), purpose="user_data")
+        return file.id
+
+
+class OpenAIResponsesBackend(_OpenAIBackend):
+    """Responses API (``client.responses.create``), the notebook's request shape."""
+
+    def _completion(self, raw) -> Completion:
+        response, headers = _parsed(raw)
+        return Completion(response.output_text, Usage(*usage_tokens(response), cached_tokens(response)), headers)
+
+    @staticmethod
+    def request_kwargs(request: LLMRequest) -> Dict[str, Any]:
+        return build_request(
+            request.prompt,
+            request.file_id,
+            request.model,
+            request.schema,
+            request.schema_name,
+            request.preamble,
+            request.layout,
+            request.cache_key,
+        )
+
+    def complete(self, request: LLMRequest) -> Completion:
+        create = self._create("responses")
+        if _is_async(create):
+            raise TypeError("Use acomplete with an AsyncOpenAI client")
+        return self._completion(create(**self.request_kwargs(request)))
+
+    async def acomplete(self, request: LLMRequest) -> Completion:
+        create = self._create("responses")
+        if not _is_async(create):
+            return await super().acomplete(request)
+        return self._completion(await create(**self.request_kwargs(request)))
+
+
+class OpenAIChatBackend(_OpenAIBackend):
+    """Chat Completions (``client.chat.completions.create``) with a JSON-schema response format."""
+
+    @staticmethod
+    def request_kwargs(request: LLMRequest) -> Dict[str, Any]:
+        content = [{"type": "text", "text": request.prompt}]
+        if request.file_id is not None:
+            document = {"type": "file", "file": {"file_id": request.file_id}}
+            content.insert(0 if request.layout == PREFIX_LAYOUT else 1, document)
+        kwargs = {
+            "model": request.model,
+            "messages": _chat_messages(request, content),
+            "response_format": _json_schema_format(request),
+        }
+        if request.cache_key:
+            kwargs["prompt_cache_key"] = request.cache_key
+        return kwargs
+
+    def complete(self, request: LLMRequest) -> Completion:
+        create = self._create("chat")
+        if _is_async(create):
+            raise TypeError("Use acomplete with an AsyncOpenAI client")
+        return _chat_completion(*_parsed(create(**self.request_kwargs(request))))
+
+    async def acomplete(self, request: LLMRequest) -> Completion:
+        create = self._create("chat")
+        if not _is_async(create):
+            return await super().acomplete(request)
+        return _chat_completion(*_parsed(await create(**self.request_kwargs(request))))
+
+
+# --------------------------------------------
+# OpenAI-compatible HTTP servers
+# --------------------------------------------
+def _import_httpx():
+    try:
+        import httpx
+    except ImportError as exc:
+        raise ImportError('httpx is missing. Install with `pip install "rob2[http]"`.') from exc
+    return httpx
+
+
+class HTTPBackend(LLMBackend):
+    """``POST {base_url}/chat/completions`` on an OpenAI-compatible server.
+
+    ``model`` replaces the requested model name (local servers serve their
+    own models). ``response_format`` is ``"json_schema"`` (default),
+    ``"json_object"`` for servers without schema support, or ``None``.
+    Connection failures and timeouts surface as ``ConnectionError`` and
+    ``TimeoutError`` and HTTP errors as :class:`BackendError`, so the rate
+    limiter retries them.
+    """
+
+    supports_files = False
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000/v1",
+        model: Optional[str] = None,
+        api_key: Optional[str] = None,
+        timeout: float = 120.0,
+        response_format: Optional[str] = "json_schema",
+    ):
+        _import_httpx()  # fail here rather than on the first request
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.timeout = timeout
+        self.response_format = response_format
+        self._client = None
+        self._aclient = None
+
+    def model_name(self, model: str) -> str:
+        return self.model or model
+
+    def payload(self, request: LLMRequest) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {
+            "model": self.model_name(request.model),
+            "messages": _chat_messages(request, request.prompt),
+        }
+        if self.response_format == "json_schema":
+            payload["response_format"] = _json_schema_format(request)
+        elif self.response_format:
+            payload["response_format"] = {"type": self.response_format}
+        return payload
+
+    @staticmethod
+    def _completion(response) -> Completion:
+        if response.status_code >= 400:
+            raise BackendError(f"{response.status_code}: {response.text[:500]}", response.status_code, response.headers)
+        body = response.json()
+        usage = body.get("usage") or {}
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        return Completion(
+            body["choices"][0]["message"].get("content") or "",
+            Usage(usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0), cached),
+            response.headers,
+        )
+
+    def complete(self, request: LLMRequest) -> Completion:
+        httpx = _import_httpx()
+        if self._client is None:
+            self._client = httpx.Client(base_url=self.base_url, headers=self.headers, timeout=self.timeout)
+        try:
+            response = self._client.post("/chat/completions", json=self.payload(request))
+        except httpx.TimeoutException as exc:
+            raise TimeoutError(str(exc)) from exc
+        except httpx.TransportError as exc:
+            raise ConnectionError(str(exc)) from exc
+        return self._completion(response)
+
+    async def acomplete(self, request: LLMRequest) -> Completion:
+        httpx = _import_httpx()
+        if self._aclient is None:
+            self._aclient = httpx.AsyncClient(base_url=self.base_url, headers=self.headers, timeout=self.timeout)
+        try:
+            response = await self._aclient.post("/chat/completions", json=self.payload(request))
+        except httpx.TimeoutException as exc:
+            raise TimeoutError(str(exc)) from exc
+        except httpx.TransportError as exc:
+            raise ConnectionError(str(exc)) from exc
+        return self._completion(response)
+
+
+# --------------------------------------------
+# Deterministic mock
+# --------------------------------------------
+class MockBackend(LLMBackend):
+    """Local, deterministic answers in the shape of the real structured outputs.
+
+    Answers come from ``script``: a mapping from question code (or
+    ``"<domain>/<code>"``) to an answer string or ``{answer, justification,
+    citations}`` payload, or a callable taking the request and question code.
+    Anything not scripted is picked from ``choices`` by a hash of ``seed``,
+    the study, the domain and the question code, so reruns give the same
+    answers. Each call sleeps ``latency`` seconds (± ``jitter`` as a
+    fraction), fails with a retryable 429 with probability
+    ``failure_rate``, and reports the preamble, ``document_tokens`` (when a
+    file is attached) and the prompt as input tokens.
+
+    With ``prompt_caching`` the mock reports cached tokens the way OpenAI
+    does: a request's prefix (everything before the prompt with
+    ``PREFIX_LAYOUT``, the whole request otherwise) is cached once a request
+    with it has completed, in 128-token steps and only from 1,024 tokens.
+    """
+
+    def __init__(
+        self,
+        script: Union[Mapping[str, Any], Callable[[LLMRequest, str], Any], None] = None,
+        choices: Sequence[str] = ANSWER_CHOICES,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        document_tokens: int = 12_000,
+        seed: int = 0,
+        prompt_caching: bool = True,
+    ):
+        self.script = script
+        self.choices = tuple(choices)
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.document_tokens = document_tokens
+        self.seed = seed
+        self.prompt_caching = prompt_caching
+        self._prefixes = set()
+        self.calls = 0
+        self.failures = 0
+        self._rng = random.Random(seed)
+
+    def model_name(self, model: str) -> str:
+        return f"mock:{model}"
+
+    def upload(self, name: str, data: bytes) -> str:
+        return f"file-mock-{hashlib.sha256(data).hexdigest()[:24]}"
+
+    async def aupload(self, name: str, data: bytes) -> str:
+        return self.upload(name, data)
+
+    def _payload(self, request: LLMRequest, code: str) -> Dict[str, Any]:
+        scripted = None
+        if callable(self.script):
+            scripted = self.script(request, code)
+        elif self.script is not None:
+            domain = request.metadata.get("domain")
+            scripted = self.script.get(f"{domain}/{code}", self.script.get(code))
+        if isinstance(scripted, dict):
+            return {"answer": "NI", "justification": "", "citations": [], **scripted}
+        if scripted is None:
+            # Keyed on the study and question rather than the prompt, so per-question,
+            # batched and retrieval modes agree.
+            study = request.metadata.get("study") or request.file_id or request.prompt
+            key = f"{self.seed}\0{study}\0{request.metadata.get('domain')}\0{code}".encode()
+            scripted = self.choices[hashlib.blake2b(key, digest_size=8).digest()[0] % len(self.choices)]
+        return {"answer": scripted, "justification": f"Mock answer to {code}.", "citations": []}
+
+    def _reply(self, request: LLMRequest) -> Completion:
+        self.calls += 1
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            self.failures += 1
+            raise BackendError("mock rate limit", 429, {"retry-after-ms": "10"})
+        properties = request.schema.get("properties", {})
+        if "answer" in properties:
+            codes = request.metadata.get("question_codes") or ["?"]
+            output = self._payload(request, codes[0])
+        else:
+            # A batched domain schema: one answer object per question code.
+            output = {code: self._payload(request, code) for code in request.schema.get("required", properties)}
+        text = json.dumps(output)
+        input_tokens, cached = self._input_tokens(request)
+        return Completion(text, Usage(input_tokens, estimate_tokens(text), cached))
+
+    def _input_tokens(self, request: LLMRequest):
+        """``(input_tokens, cached_tokens)`` as a provider with prompt caching would report them."""
+        preamble = estimate_tokens(request.preamble) if request.preamble else 0
+        document = self.document_tokens if request.file_id is not None else 0
+        total = preamble + document + estimate_tokens(request.prompt)
+        if request.layout == PREFIX_LAYOUT:
+            key, prefix = (request.model, request.preamble, request.file_id), preamble + document
+        else:
+            key, prefix = (request.model, request.preamble, request.prompt, request.file_id), total
+        if not self.prompt_caching or prefix < 1024:
+            return total, 0
+        if key not in self._prefixes:
+            self._prefixes.add(key)
+            return total, 0
+        return total, prefix // 128 * 128
+
+    def _delay(self) -> float:
+        if not self.latency:
+            return 0.0
+        return max(0.0, self.latency * (1 + self.jitter * (2 * self._rng.random() - 1)))
+
+    def complete(self, request: LLMRequest) -> Completion:
+        delay = self._delay()
+        if delay:
+            time.sleep(delay)
+        return self._reply(request)
+
+    async def acomplete(self, request: LLMRequest) -> Completion:
+        delay = self._delay()
+        if delay:
+            await asyncio.sleep(delay)
+        return self._reply(request)
+
+
+# --------------------------------------------
+# Construction
+# --------------------------------------------
+BACKENDS = ("responses", "chat", "http", "mock")
+
+
+def as_backend(client) -> LLMBackend:
+    """``client`` itself if it is a backend, otherwise a Responses backend around it."""
+    return client if isinstance(client, LLMBackend) else OpenAIResponsesBackend(client)
+
+
+def make_backend(
+    kind: str = "responses",
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None,
+    model: Optional[str] = None,
+    **kwargs,
+) -> LLMBackend:
+    """Backend by name: ``responses``, ``chat`` (``AsyncOpenAI``), ``http`` or ``mock``.
+
+    Extra keyword arguments go to :class:`MockBackend` or :class:`HTTPBackend`.
+    """
+    if kind in ("responses", "chat"):
+        from openai import AsyncOpenAI
+
+        # Retries are the rate limiter's job.
+        client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        return OpenAIResponsesBackend(client) if kind == "responses" else OpenAIChatBackend(client)
+    if kind == "http":
+        return HTTPBackend(base_url or "http://localhost:8000/v1", model=model, api_key=api_key, **kwargs)
+    if kind == "mock":
+        return MockBackend(**kwargs)
+    raise ValueError(f"Unknown backend {kind!r}; choose from {', '.join(BACKENDS)}")
+
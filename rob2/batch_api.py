@@ -0,0 +1,540 @@
+"""Provider Batch API pipeline for overnight bulk reviews.
+
+The pipeline turns the question plan for a whole directory of studies into
+JSONL batch requests, submits them, polls until the batch finishes and merges
+the answers back into each study's per-domain answers. Because
+``get_next_question`` decides the next question from earlier answers, the
+pipeline then plans a follow-up round, and repeats until every domain of
+every study is complete. A :class:`~rob2.speculation.SpeculationPolicy` can be
+given to include likely follow-up questions early and cut the number of
+rounds. Requests use the runner's prompt layout (``rob2.llm.PREFIX_LAYOUT``
+by default): the shared preamble and the study PDF come first, so the
+provider's prompt cache can reuse them across a study's questions.
+
+Everything needed to resume lives in ``<work_dir>/state.json`` (uploaded file
+ids, submitted batches, answers, attempt counts), written after every step,
+so the process can be stopped and restarted at any point::
+
+    python -m rob2.batch_api studies/ --work-dir batch_runs/review1 --output outputs
+
+A round is recorded before its batch is created and matched against
+``batches.list`` on resume, so a crash mid-submit never pays for it twice.
+
+:class:`LocalBatchClient` is an in-process fake of the files and batches
+endpoints for exercising the pipeline without network calls.
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .cache import sha256_file
+from .common import DomainSpec, Response
+from .decision import ANSWER_CHOICES, walk_answers
+from .domains import get_domain_specs
+from .export import write_excel
+from .files import FileRegistry, LocalFiles, upload_name
+from .llm import (
+    DEFAULT_MODEL,
+    PREFIX_LAYOUT,
+    QUESTION_FIRST_LAYOUT,
+    ROB2_PREAMBLE,
+    build_request,
+    layout_options,
+    parse_answer,
+)
+from .prompts import get_prompt_manifest, load_prompt
+from .speculation import SpeculationPolicy
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/responses"
+STATE_FILE = "state.json"
+FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def output_text_from_body(body: dict) -> str:
+    """Extract the model's text from a Responses API JSON body."""
+    if body.get("output_text"):
+        return body["output_text"]
+    for item in body.get("output", []):
+        for content in item.get("content") or []:
+            if content.get("type") == "output_text":
+                return content["text"]
+    raise ValueError("Response body has no output text.")
+
+
+def _custom_id(study: str, domain_key: str, code: str) -> str:
+    return f"{study}::{domain_key}::{code}"
+
+
+def _split_custom_id(custom_id: str) -> Tuple[str, str, str]:
+    study, domain_key, code = custom_id.rsplit("::", 2)
+    return study, domain_key, code
+
+
+class BatchPipeline:
+    """Resumable multi-round Batch API run over many studies."""
+
+    def __init__(
+        self,
+        client,
+        pdf_paths: Iterable[Union[str, Path]],
+        work_dir: Union[str, Path],
+        prompt_files: Optional[Dict[str, Dict[str, Path]]] = None,
+        specs: Optional[Dict[str, DomainSpec]] = None,
+        model: str = DEFAULT_MODEL,
+        domains: Optional[Sequence[str]] = None,
+        policy: Optional[SpeculationPolicy] = None,
+        files: Optional[FileRegistry] = None,
+        max_attempts: int = 3,
+        completion_window: str = "24h",
+        layout: str = PREFIX_LAYOUT,
+        preamble: str = ROB2_PREAMBLE,
+    ):
+        self.client = client
+        self.work_dir = Path(work_dir)
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.prompt_files = prompt_files if prompt_files is not None else get_prompt_manifest()
+        self.specs = specs if specs is not None else get_domain_specs()
+        self.domain_keys = [k for k in (domains or self.prompt_files) if k in self.specs]
+        self.model = model
+        self.policy = policy
+        self.files = files
+        self.max_attempts = max_attempts
+        self.completion_window = completion_window
+        self.layout = layout
+        self.preamble = preamble
+        self.state = self._load()
+        if self.state["model"] != model:
+            raise ValueError(
+                f"{self.work_dir} holds a run with {self.state['model']}; "
+                f"resume it with that model or use a new work directory for {model}"
+            )
+        for pdf_path in pdf_paths:
+            pdf_path = Path(pdf_path)
+            self.state["studies"].setdefault(
+                pdf_path.name,
+                {"pdf_path": str(pdf_path), "file_id": None, "answers": {}, "attempts": {}, "failed": []},
+            )
+        self.save()
+
+    # --------------------------------------------
+    # Persistence
+    # --------------------------------------------
+    @property
+    def state_path(self) -> Path:
+        return self.work_dir / STATE_FILE
+
+    def _load(self) -> dict:
+        if self.state_path.exists():
+            return json.loads(self.state_path.read_text(encoding="utf-8"))
+        return {"model": self.model, "rounds": [], "studies": {}}
+
+    def save(self) -> None:
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.state, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, self.state_path)
+
+    # --------------------------------------------
+    # Planning
+    # --------------------------------------------
+    def _responses(self, study: dict, domain_key: str) -> Dict[str, Response]:
+        answers = study["answers"].get(domain_key, {})
+        return {code: Response(a["answer"]) for code, a in answers.items()}
+
+    def plan(self) -> List[Tuple[str, str, str]]:
+        """(study, domain, question) triples still needed, including prefetches."""
+        planned = []
+        for name, study in self.state["studies"].items():
+            for domain_key in self.domain_keys:
+                spec = self.specs[domain_key]
+                known = self._responses(study, domain_key)
+                path, next_code = walk_answers(spec, known)
+                if next_code is None or _custom_id(name, domain_key, next_code) in study["failed"]:
+                    continue
+                codes = [next_code]
+                if self.policy is not None:
+                    on_path = {code: known[code] for code in path}
+                    codes += [c for c in self.policy.candidates(spec, on_path) if c not in known and c != next_code]
+                for code in codes:
+                    if _custom_id(name, domain_key, code) not in study["failed"]:
+                        planned.append((name, domain_key, code))
+        return planned
+
+    def is_complete(self) -> bool:
+        return not self.plan() and not self._open_round()
+
+    def _open_round(self) -> Optional[dict]:
+        rounds = self.state["rounds"]
+        if rounds and rounds[-1]["status"] not in FINAL_STATUSES:
+            return rounds[-1]
+        return None
+
+    # --------------------------------------------
+    # Provider interaction
+    # --------------------------------------------
+    def _sha256(self, name: str) -> str:
+        study = self.state["studies"][name]
+        if "sha256" not in study:
+            study["sha256"] = sha256_file(Path(study["pdf_path"]))
+        return study["sha256"]
+
+    def _ensure_uploaded(self, name: str) -> str:
+        study = self.state["studies"][name]
+        if study["file_id"] is None:
+            pdf_path = Path(study["pdf_path"])
+            sha256 = self._sha256(name)
+            file_id = self.files.lookup(sha256) if self.files is not None else None
+            if file_id is None:
+                file_id = self.client.files.create(
+                    file=(upload_name(pdf_path.name), pdf_path.read_bytes()), purpose="user_data"
+                ).id
+                if self.files is not None:
+                    self.files.record(sha256, file_id, pdf_path.name)
+            study["file_id"] = file_id
+            self.save()
+        return study["file_id"]
+
+    def submit(self, planned: List[Tuple[str, str, str]]) -> dict:
+        lines = []
+        for name, domain_key, code in planned:
+            prompt = load_prompt(self.prompt_files, domain_key, code)
+            lines.append(json.dumps({
+                "custom_id": _custom_id(name, domain_key, code),
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": build_request(
+                    prompt,
+                    self._ensure_uploaded(name),
+                    self.model,
+                    **layout_options(self.layout, self.preamble, self._sha256(name)),
+                ),
+            }, ensure_ascii=False))
+
+        index = len(self.state["rounds"])
+        input_path = self.work_dir / f"round_{index:03d}.jsonl"
+        input_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        input_file = self.client.files.create(file=(input_path.name, input_path.read_bytes()), purpose="batch")
+        # Saved before the batch exists, so a crash before its id is known
+        # resumes by finding the batch instead of paying for it twice.
+        record = {"index": index, "batch_id": None, "input_file_id": input_file.id, "status": "pending",
+                  "requests": len(lines), "custom_ids": [_custom_id(*item) for item in planned],
+                  "created": time.time()}
+        self.state["rounds"].append(record)
+        self.save()
+        self._create_batch(record)
+        logger.info("Submitted round %d: %d requests as %s", index, len(lines), record["batch_id"])
+        return record
+
+    def _create_batch(self, record: dict) -> None:
+        batch = self.client.batches.create(
+            input_file_id=record["input_file_id"],
+            endpoint=BATCH_ENDPOINT,
+            completion_window=self.completion_window,
+        )
+        record["batch_id"], record["status"] = batch.id, batch.status
+        self.save()
+
+    def _find_batch(self, record: dict) -> Optional[Any]:
+        """The provider's batch for a pending round's input file, if it was created."""
+        for batch in self.client.batches.list(limit=100):
+            if batch.input_file_id == record["input_file_id"]:
+                return batch
+            if getattr(batch, "created_at", None) and batch.created_at < record["created"] - 3600:
+                # Listed newest first; anything this old predates the round.
+                return None
+        return None
+
+    def _resume_pending(self, record: dict) -> None:
+        batch = self._find_batch(record)
+        if batch is None:
+            logger.info("Round %d was not submitted before the interruption; submitting it", record["index"])
+            self._create_batch(record)
+            return
+        logger.info("Round %d was submitted as %s before the interruption", record["index"], batch.id)
+        record["batch_id"], record["status"] = batch.id, batch.status
+        self.save()
+
+    def poll(self, record: dict) -> str:
+        if record["batch_id"] is None:
+            self._resume_pending(record)
+        batch = self.client.batches.retrieve(record["batch_id"])
+        if batch.status in FINAL_STATUSES:
+            for file_attr in ("output_file_id", "error_file_id"):
+                file_id = getattr(batch, file_attr, None)
+                if file_id:
+                    self.merge(self.client.files.content(file_id).text)
+            if batch.status != "completed":
+                logger.warning("Batch %s ended as %s", batch.id, batch.status)
+        record["status"] = batch.status
+        self.save()
+        if batch.status in FINAL_STATUSES:
+            self._clean_up(record, batch)
+        return batch.status
+
+    def _clean_up(self, record: dict, batch=None) -> None:
+        """Delete a merged round's input, output and error files from the provider."""
+        batch = batch or self.client.batches.retrieve(record["batch_id"])
+        file_ids = [record["input_file_id"]] + [
+            getattr(batch, attr, None) for attr in ("output_file_id", "error_file_id")
+        ]
+        for file_id in filter(None, file_ids):
+            try:
+                self.client.files.delete(file_id)
+            except Exception as exc:
+                if getattr(exc, "status_code", None) != 404:
+                    logger.warning("Could not delete %s of round %d: %s", file_id, record["index"], exc)
+                    return
+        record["cleaned"] = True
+        self.save()
+
+    def merge(self, jsonl_text: str) -> int:
+        """Store answers from a batch output (or error) file; returns answers merged."""
+        merged = 0
+        for line in jsonl_text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            name, domain_key, code = _split_custom_id(item["custom_id"])
+            study = self.state["studies"].get(name)
+            if study is None:
+                continue
+            response = item.get("response") or {}
+            try:
+                if response.get("status_code") != 200:
+                    raise ValueError(item.get("error") or response.get("status_code"))
+                answer = parse_answer(json.loads(output_text_from_body(response["body"])))
+                Response(answer.answer)
+            except (ValueError, KeyError) as exc:
+                self._record_failure(study, item["custom_id"], exc)
+                continue
+            study["answers"].setdefault(domain_key, {})[code] = {
+                "answer": answer.answer,
+                "justification": answer.justification,
+                "citations": answer.citations,
+            }
+            merged += 1
+        return merged
+
+    def _record_failure(self, study: dict, custom_id: str, exc: Exception) -> None:
+        attempts = study["attempts"].get(custom_id, 0) + 1
+        study["attempts"][custom_id] = attempts
+        logger.warning("%s failed (attempt %d): %s", custom_id, attempts, exc)
+        if attempts >= self.max_attempts:
+            study["failed"].append(custom_id)
+
+    # --------------------------------------------
+    # Driving
+    # --------------------------------------------
+    def step(self) -> str:
+        """Advance by one action: poll an open batch, submit the next round, or report done."""
+        record = self._open_round()
+        if record is not None:
+            status = self.poll(record)
+            return "waiting" if status not in FINAL_STATUSES else "merged"
+        for done in self.state["rounds"]:
+            if done["batch_id"] and not done.get("cleaned"):
+                # Merged before an interruption that came ahead of the clean-up.
+                self._clean_up(done)
+        planned = self.plan()
+        if not planned:
+            return "done"
+        failed_rounds = list(itertools.takewhile(
+            lambda r: r["status"] != "completed", reversed(self.state["rounds"])
+        ))
+        if len(failed_rounds) >= self.max_attempts:
+            raise RuntimeError(f"The last {len(failed_rounds)} batches did not complete; see {self.state_path}.")
+        self.submit(planned)
+        return "submitted"
+
+    def run(self, poll_interval: float = 60.0, sleep: Callable[[float], None] = time.sleep) -> None:
+        while True:
+            status = self.step()
+            if status == "done":
+                return
+            if status == "waiting":
+                sleep(poll_interval)
+
+    # --------------------------------------------
+    # Results
+    # --------------------------------------------
+    def states(self, name: str) -> Dict[str, Dict[str, Response]]:
+        """Per-domain ``state`` dicts holding only answers on the decision path."""
+        study = self.state["studies"][name]
+        states = {}
+        for domain_key in self.domain_keys:
+            known = self._responses(study, domain_key)
+            path, _ = walk_answers(self.specs[domain_key], known)
+            states[domain_key] = {code: known[code] for code in path}
+        return states
+
+    def incomplete(self, name: str) -> Dict[str, str]:
+        """Domains of ``name`` that stopped at a question which failed ``max_attempts`` times."""
+        study = self.state["studies"][name]
+        stuck = {}
+        for domain_key in self.domain_keys:
+            _, next_code = walk_answers(self.specs[domain_key], self._responses(study, domain_key))
+            if next_code is not None and _custom_id(name, domain_key, next_code) in study["failed"]:
+                stuck[domain_key] = next_code
+        return stuck
+
+    def rows(self, name: str) -> List[dict]:
+        """Answered rows, plus one unanswered row per incomplete domain marking where it stopped."""
+        study = self.state["studies"][name]
+        rows = []
+        incomplete = self.incomplete(name)
+        for domain_key, state in self.states(name).items():
+            spec = self.specs[domain_key]
+            for code in state:
+                answer = study["answers"][domain_key][code]
+                rows.append({
+                    "file_name": name,
+                    "domain": domain_key,
+                    "question_code": code,
+                    "question_text": spec.questions.get(code, ""),
+                    "prompt_path": str(self.prompt_files[domain_key][code]),
+                    "answer": answer["answer"],
+                    "justification": answer["justification"],
+                    "citations": "; ".join(answer["citations"]),
+                })
+            if domain_key in incomplete:
+                code = incomplete[domain_key]
+                rows.append({
+                    "file_name": name,
+                    "domain": domain_key,
+                    "question_code": code,
+                    "question_text": spec.questions.get(code, ""),
+                    "prompt_path": str(self.prompt_files[domain_key][code]),
+                    "answer": "",
+                    "justification": f"INCOMPLETE: no valid answer after {self.max_attempts} attempts; "
+                    "the domain judgement is missing.",
+                    "citations": "",
+                })
+        return rows
+
+    def export(self, output_dir: Union[str, Path]) -> List[Path]:
+        output_dir = Path(output_dir)
+        for name in self.state["studies"]:
+            for domain_key, code in self.incomplete(name).items():
+                logger.warning("%s %s is incomplete: %s failed %d times", name, domain_key, code, self.max_attempts)
+        return [
+            write_excel(self.rows(name), output_dir / f"{Path(name).stem}_responses.xlsx")
+            for name in self.state["studies"]
+        ]
+
+
+# --------------------------------------------
+# Local fake of the batch endpoint
+# --------------------------------------------
+def scripted_responder(body: dict) -> dict:
+    """Deterministic Responses API body: the answer is derived from a hash of the request."""
+    digest = hashlib.sha256(json.dumps(body, sort_keys=True).encode("utf-8")).digest()
+    answer = ANSWER_CHOICES[digest[0] % len(ANSWER_CHOICES)].value
+    text = json.dumps({"answer": answer, "justification": "Scripted local answer.", "citations": []})
+    return {
+        "object": "response",
+        "output": [{"type": "message", "content": [{"type": "output_text", "text": text}]}],
+        "usage": {"input_tokens": 0, "output_tokens": 0},
+    }
+
+
+class LocalBatches:
+    """In-memory ``batches`` endpoint completing each batch after ``polls`` retrievals."""
+
+    def __init__(self, files: LocalFiles, responder: Callable[[dict], dict] = scripted_responder, polls: int = 1):
+        self.files = files
+        self.responder = responder
+        self.polls = polls
+        self.batches: Dict[str, SimpleNamespace] = {}
+        self._ids = itertools.count(1)
+
+    def create(self, input_file_id: str, endpoint: str, completion_window: str, **kwargs) -> SimpleNamespace:
+        batch = SimpleNamespace(
+            id=f"batch-local-{next(self._ids)}",
+            input_file_id=input_file_id,
+            endpoint=endpoint,
+            status="validating",
+            output_file_id=None,
+            error_file_id=None,
+            polls=0,
+            created_at=int(time.time()),
+        )
+        self.batches[batch.id] = batch
+        return batch
+
+    def list(self, limit: int = 20, **kwargs) -> List[SimpleNamespace]:
+        return list(reversed(self.batches.values()))
+
+    def retrieve(self, batch_id: str) -> SimpleNamespace:
+        batch = self.batches[batch_id]
+        batch.polls += 1
+        if batch.status not in FINAL_STATUSES:
+            batch.status = "in_progress"
+            if batch.polls >= self.polls:
+                self._complete(batch)
+        return batch
+
+    def _complete(self, batch: SimpleNamespace) -> None:
+        out = []
+        for line in self.files.content(batch.input_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            out.append(json.dumps({
+                "id": f"{batch.id}-{len(out)}",
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "body": self.responder(request["body"])},
+                "error": None,
+            }))
+        batch.output_file_id = self.files.create(("output.jsonl", "\n".join(out) + "\n"), purpose="batch_output").id
+        batch.status = "completed"
+
+
+class LocalBatchClient:
+    """Client exposing ``files`` and ``batches`` backed by the local fakes."""
+
+    def __init__(self, responder: Callable[[dict], dict] = scripted_responder, polls: int = 1):
+        self.files = LocalFiles()
+        self.batches = LocalBatches(self.files, responder, polls)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m rob2.batch_api", description="Run RoB 2 assessments via the Batch API.")
+    parser.add_argument("studies", type=Path, help="directory of study PDFs")
+    parser.add_argument("--work-dir", type=Path, required=True, help="resumable state directory")
+    parser.add_argument("--output", type=Path, default=Path("outputs"), help="directory for per-study Excel files")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--domains", help="comma-separated domain keys (default: all)")
+    parser.add_argument("--prefetch", type=float, help="speculation threshold for including follow-up questions early")
+    parser.add_argument("--poll-interval", type=float, default=300.0)
+    parser.add_argument("--layout", choices=[PREFIX_LAYOUT, QUESTION_FIRST_LAYOUT], default=PREFIX_LAYOUT)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    from openai import OpenAI
+
+    pipeline = BatchPipeline(
+        OpenAI(),
+        sorted(args.studies.glob("*.pdf")),
+        args.work_dir,
+        model=args.model,
+        domains=args.domains.split(",") if args.domains else None,
+        policy=SpeculationPolicy(args.prefetch) if args.prefetch is not None else None,
+        files=FileRegistry(),
+        layout=args.layout,
+    )
+    pipeline.run(args.poll_interval)
+    for path in pipeline.export(args.output):
+        print(f"Saved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Batched prompting: every signalling question of a domain in one request.
+
+Per-question mode re-sends the whole PDF with each question. Batched mode
+concatenates a domain's prompt files into a single prompt, asks for one
+``{answer, justification, citations}`` object per question code, and then
+replays the answers through ``get_next_question`` so questions the decision
+tree would not have reached are dropped.
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .common import DomainSpec
+from .decision import walk_answers
+from .llm import RESPONSE_SCHEMA, Answer, cached_tokens, parse_answer, usage_tokens
+from .prompts import load_prompt
+
+DOMAIN_SCHEMA_NAME = "domain_details"
+
+BATCH_PREAMBLE = (
+    "You are answering every Risk of Bias 2 signalling question for one domain of the attached trial report.\n"
+    "Answer each question independently, as if it had been asked on its own, following its instructions.\n"
+    "Return one object per question code with \"answer\" (one of Y, PY, NI, PN, N), \"justification\" "
+    "and \"citations\" (exact quotes from the document).\n"
+)
+
+
+def domain_schema(question_codes: List[str]) -> Dict[str, Any]:
+    """Strict JSON schema with one answer object per question code."""
+    return {
+        "type": "object",
+        "properties": {code: RESPONSE_SCHEMA for code in question_codes},
+        "required": list(question_codes),
+        "additionalProperties": False,
+    }
+
+
+def build_domain_prompt(prompt_files: Dict[str, Dict[str, Path]], spec: DomainSpec) -> str:
+    """Preamble followed by each question's prompt file under a code header."""
+    sections = [BATCH_PREAMBLE]
+    for code in spec.questions:
+        sections.append(f"=== Question {code} ===\n{load_prompt(prompt_files, spec.key, code).strip()}\n")
+    return "\n".join(sections)
+
+
+def parse_domain_response(response, question_codes: List[str]) -> Dict[str, Answer]:
+    """Split a batched response into per-question answers.
+
+    Usage is attributed to the first question so token totals stay correct.
+    """
+    payload = json.loads(response.output_text)
+    answers = {code: parse_answer(payload[code]) for code in question_codes if code in payload}
+    if answers:
+        first = answers[next(iter(answers))]
+        first.input_tokens, first.output_tokens = usage_tokens(response)
+        first.cached_tokens = cached_tokens(response)
+    return answers
+
+
+def replay(spec: DomainSpec, answers: Dict[str, Answer]) -> List[str]:
+    """Question codes ``get_next_question`` reaches when fed ``answers``, in order."""
+    path, missing = walk_answers(spec, {code: answer.to_response() for code, answer in answers.items()})
+    if missing:
+        raise KeyError(f"Batched response has no answer for {spec.key} question {missing}")
+    return path
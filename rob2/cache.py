@@ -0,0 +1,196 @@
+"""Content-addressed on-disk cache of parsed model answers.
+
+Entries are keyed by the SHA-256 of the PDF bytes together with the prompt
+text, the model name and the JSON schema, so editing one prompt file only
+invalidates that question. Storage is a single SQLite file; entries are
+evicted by age (since last use) and by total size, least recently used first.
+
+The CLI's worker processes share the cache, journal and file registry, so
+every such database is opened with :func:`connect` (WAL, a long busy
+timeout) and writes go through :func:`retry_locked`.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, TypeVar, Union
+
+from .llm import Answer
+
+DEFAULT_CACHE_PATH = Path(".rob2_cache") / "responses.sqlite"
+
+# Seconds a connection waits for another process's write lock.
+SQLITE_TIMEOUT = 30.0
+
+T = TypeVar("T")
+
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    pdf_sha256 TEXT NOT NULL,
+    domain TEXT,
+    question_code TEXT,
+    model TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+CREATE INDEX IF NOT EXISTS responses_pdf ON responses (pdf_sha256, domain);
+"""
+
+
+def sha256_file(path: Union[str, Path], chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def connect(path: Union[str, Path]) -> sqlite3.Connection:
+    """WAL connection that waits up to ``SQLITE_TIMEOUT`` for other processes' writes."""
+    conn = sqlite3.connect(str(path), timeout=SQLITE_TIMEOUT, check_same_thread=False)
+    conn.execute(f"PRAGMA busy_timeout = {int(SQLITE_TIMEOUT * 1000)}")
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def retry_locked(conn: sqlite3.Connection, write: Callable[[], T], attempts: int = 3) -> T:
+    """Run ``write`` (statements plus commit), retrying if the database stays locked past the busy timeout."""
+    for attempt in range(attempts):
+        try:
+            return write()
+        except sqlite3.OperationalError as exc:
+            conn.rollback()
+            if "locked" not in str(exc) and "busy" not in str(exc) or attempt == attempts - 1:
+                raise
+            time.sleep(0.1 * 2**attempt)
+    raise AssertionError("unreachable")
+
+
+def cache_key(pdf_sha256: str, prompt: str, model: str, schema: Dict[str, Any]) -> str:
+    """Stable key for one (document, prompt, model, schema) combination."""
+    digest = hashlib.sha256()
+    for part in (pdf_sha256, model, json.dumps(schema, sort_keys=True), prompt):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed answer cache with LRU size and age eviction."""
+
+    def __init__(
+        self,
+        path: Union[str, Path] = DEFAULT_CACHE_PATH,
+        max_bytes: Optional[int] = 512 * 1024 * 1024,
+        max_age_days: Optional[float] = 90,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = connect(self.path)
+        self._conn.executescript(_SCHEMA_SQL)
+        self.evict()
+
+    def get(self, key: str) -> Optional[Answer]:
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            retry_locked(self._conn, lambda: self._touch(key))
+            self.hits += 1
+        return Answer(**json.loads(row[0]), cached=True)
+
+    def _touch(self, key: str) -> None:
+        self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._conn.commit()
+
+    def put(
+        self,
+        key: str,
+        answer: Answer,
+        pdf_sha256: str,
+        model: str,
+        domain: Optional[str] = None,
+        question_code: Optional[str] = None,
+    ) -> None:
+        payload = json.dumps(
+            {
+                "answer": answer.answer,
+                "justification": answer.justification,
+                "citations": answer.citations,
+            },
+            ensure_ascii=False,
+        )
+        now = time.time()
+        row = (key, pdf_sha256, domain, question_code, model, payload, len(payload), now, now)
+
+        def write() -> None:
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+            self._conn.commit()
+
+        with self._lock:
+            retry_locked(self._conn, write)
+
+    def invalidate(self, pdf_sha256: Optional[str] = None, domain: Optional[str] = None) -> int:
+        """Delete entries for a document and/or domain; with no filters, clear everything."""
+        clauses, params = [], []
+        if pdf_sha256 is not None:
+            clauses.append("pdf_sha256 = ?")
+            params.append(pdf_sha256)
+        if domain is not None:
+            clauses.append("domain = ?")
+            params.append(domain)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            deleted = self._conn.execute(f"DELETE FROM responses{where}", params).rowcount
+            self._conn.commit()
+        return deleted
+
+    def evict(self) -> int:
+        """Drop entries unused for ``max_age_days`` then trim LRU entries above ``max_bytes``."""
+        deleted = 0
+        with self._lock:
+            if self.max_age_days is not None:
+                cutoff = time.time() - self.max_age_days * 86400
+                deleted += self._conn.execute("DELETE FROM responses WHERE last_used < ?", (cutoff,)).rowcount
+            if self.max_bytes is not None:
+                total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+                if total > self.max_bytes:
+                    excess = total - self.max_bytes
+                    victims = []
+                    for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+                        if excess <= 0:
+                            break
+                        victims.append((key,))
+                        excess -= size
+                    self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+                    deleted += len(victims)
+            self._conn.commit()
+        return deleted
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"entries": entries, "bytes": size, "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "ResponseCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
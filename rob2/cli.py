@@ -0,0 +1,551 @@
+"""``rob2`` command-line entry point.
+
+``rob2 assess`` runs the same engine as the notebook without its globals:
+domain specs from :func:`rob2.domains.get_domain_specs`, prompts from
+:func:`rob2.prompts.get_prompt_manifest` and requests through
+:class:`~rob2.runner.AssessmentRunner`::
+
+    rob2 assess studies/ --domains 1,4 --workers 8 --tpm 120000
+
+With ``--workers 1`` every study runs in this process on one event loop.
+With more, studies are fanned out to a pool of worker processes, each with
+its own runner and an equal share of the request, token and concurrency
+budgets (each share of ``--tpm`` must cover one estimated call, otherwise the
+command refuses to start); prompts are shipped to the workers in memory. Rows stream into one
+export (``--format``) as studies finish, every answer is journaled so an
+interrupted run can be resumed with ``--resume``, and the command ends with a throughput and failure
+summary. The first Ctrl-C (or SIGTERM) stops starting new studies and lets
+running ones finish; a second one stops immediately.
+
+Other module CLIs are available as subcommands (``rob2 batch``,
+``rob2 extract``, ``rob2 sensitivity`` and so on).
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import multiprocessing.util
+import os
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field, replace
+from importlib import import_module
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .llm import PREFIX_LAYOUT, QUESTION_FIRST_LAYOUT
+from .runner import AssessmentRunner, RunnerConfig, Study, StudyResult
+from .usage import Pricing, TokenUsage, format_usage, pricing_for, usage_rows
+
+logger = logging.getLogger(__name__)
+
+# Subcommands handled by another module's main().
+DELEGATED = {
+    "batch": "rob2.batch_api",
+    "extract": "rob2.extract",
+    "sensitivity": "rob2.sensitivity",
+    "prompts": "rob2.prompts",
+    "journal": "rob2.journal",
+    "verify-tables": "rob2.truth_table",
+    "embeddings": "rob2.rag.embedding_cache",
+    "files": "rob2.files",
+}
+
+EXPORT_FORMATS = {"csv": "responses.csv", "parquet": "responses", "arrow": "responses.arrow"}
+
+STATS_FIELDS = ("requests", "retries", "failures", "tokens", "throttled_seconds", "backoff_seconds")
+
+
+def load_api_key(env_path: Path = Path(".env")) -> Optional[str]:
+    """``OPENAI_API_KEY`` from the environment, falling back to a ``.env`` file."""
+    if not os.getenv("OPENAI_API_KEY") and env_path.exists():
+        for line in env_path.read_text(encoding="utf-8").splitlines():
+            if line.strip().startswith("#") or "=" not in line:
+                continue
+            key, value = line.split("=", 1)
+            if key.strip() == "OPENAI_API_KEY" and value.strip():
+                os.environ.setdefault("OPENAI_API_KEY", value.strip())
+                break
+    return os.getenv("OPENAI_API_KEY")
+
+
+def resolve_domains(value: Optional[str], keys: Sequence[str]) -> Optional[List[str]]:
+    """Registry keys for ``"1,4"``-style selections; a number selects every variant of that domain."""
+    if not value:
+        return None
+    selected: List[str] = []
+    for token in (part.strip() for part in value.split(",")):
+        if not token:
+            continue
+        if token in keys:
+            matches = [token]
+        else:
+            prefix = f"domain_{token}"
+            matches = [key for key in keys if key == prefix or key.startswith(prefix + "_")]
+        if not matches:
+            raise ValueError(f"No domain matches {token!r}; choose from {', '.join(keys)}")
+        selected.extend(key for key in matches if key not in selected)
+    return selected
+
+
+def find_studies(paths: Sequence[Path]) -> List[Path]:
+    found: List[Path] = []
+    for path in paths:
+        found.extend(sorted(path.glob("*.pdf")) if path.is_dir() else [path])
+    return found
+
+
+@dataclass
+class AssessOptions:
+    """Everything a worker needs to build its runner; picklable for spawned processes."""
+
+    config: RunnerConfig
+    prompt_files: Dict
+    api_key: Optional[str] = None
+    backend: str = "responses"
+    base_url: Optional[str] = None
+    mock_latency: float = 0.0
+    cache: bool = True
+    journal: Optional[Path] = None
+    index: Optional[Path] = None
+    top_k: int = 6
+    log_level: int = logging.WARNING
+
+
+def _share(budget: int, share: int) -> int:
+    # 0 means unlimited and stays that way.
+    return budget and max(1, budget // share)
+
+
+def workers_for_budget(config: RunnerConfig, workers: int) -> int:
+    """Most workers (up to ``workers``) whose token share still fits one estimated call."""
+    if not config.tokens_per_minute:
+        return workers
+    return max(1, min(workers, config.tokens_per_minute // config.estimated_tokens_per_call))
+
+
+def build_retriever(options: AssessOptions, read_only: bool = False):
+    """Retriever over ``options.index``; embeddings go to the OpenAI API."""
+    from openai import OpenAI
+
+    from .rag.embeddings import embed_texts
+    from .rag.qa import Retriever
+    from .rag.store import CorpusIndex
+
+    client = OpenAI(api_key=options.api_key, max_retries=3)
+    corpus = CorpusIndex(options.index, mmap=read_only)
+    return Retriever(corpus, lambda texts: embed_texts(client, texts), k=options.top_k)
+
+
+def build_runner(options: AssessOptions, share: int = 1) -> AssessmentRunner:
+    """Runner for one process holding ``1/share`` of the configured budgets."""
+    from .backends import make_backend
+    from .cache import ResponseCache
+    from .files import FileRegistry
+    from .journal import RunJournal
+
+    config = options.config
+    if share > 1:
+        config = replace(
+            config,
+            max_concurrency=_share(config.max_concurrency, share),
+            requests_per_minute=_share(config.requests_per_minute, share),
+            tokens_per_minute=_share(config.tokens_per_minute, share),
+        )
+    if options.backend == "mock":
+        backend = make_backend("mock", latency=options.mock_latency, jitter=0.3)
+    elif options.backend == "http":
+        backend = make_backend("http", api_key=options.api_key, base_url=options.base_url, model=config.model)
+    else:
+        backend = make_backend(options.backend, api_key=options.api_key, base_url=options.base_url)
+    return AssessmentRunner(
+        backend,
+        options.prompt_files,
+        config=config,
+        cache=ResponseCache() if options.cache else None,
+        files=FileRegistry(),
+        journal=RunJournal(options.journal) if options.journal else None,
+        # The parent ingested every study, so runners only search the index.
+        retriever=build_retriever(options, read_only=True) if options.index else None,
+    )
+
+
+def _stats(runner: AssessmentRunner) -> Dict[str, float]:
+    return {name: getattr(runner.limiter.stats, name) for name in STATS_FIELDS}
+
+
+@dataclass
+class RunSummary:
+    """Counts reported when ``rob2 assess`` exits."""
+
+    studies: int = 0
+    completed: int = 0
+    failed: List[str] = field(default_factory=list)
+    answers: int = 0
+    stats: Dict[str, float] = field(default_factory=lambda: dict.fromkeys(STATS_FIELDS, 0))
+    interrupted: bool = False
+    started: float = field(default_factory=time.perf_counter)
+    usage: TokenUsage = field(default_factory=TokenUsage)
+    pricing: Pricing = field(default_factory=lambda: pricing_for(RunnerConfig.model))
+    usage_rows: List[dict] = field(default_factory=list)
+
+    def add(self, result: StudyResult) -> None:
+        self.completed += 1
+        self.answers += len(result.rows)
+        self.usage += result.usage
+        self.usage_rows.extend(usage_rows([result], self.pricing))
+        if result.errors:
+            self.failed.append(f"{result.study.name}: {'; '.join(f'{k} {v}' for k, v in result.errors.items())}")
+
+    def summary(self) -> str:
+        seconds = time.perf_counter() - self.started
+        per_minute = 60 / seconds if seconds else 0.0
+        lines = [
+            f"{self.completed}/{self.studies} studies in {seconds:.1f}s "
+            f"({self.completed * per_minute:.1f} studies/min, {self.answers * per_minute:.0f} answers/min), "
+            f"{len(self.failed)} with errors"
+            + (f", {self.studies - self.completed} not finished (interrupted)" if self.interrupted else ""),
+            f"{self.stats['requests']:.0f} requests ({self.stats['retries']:.0f} retries, "
+            f"{self.stats['failures']:.0f} failed), {self.stats['tokens']:.0f} tokens, "
+            f"{self.stats['throttled_seconds']:.1f}s throttled, {self.stats['backoff_seconds']:.1f}s backing off",
+            format_usage(self.usage, self.pricing),
+        ]
+        lines.extend(f"  {failure}" for failure in self.failed)
+        return "\n".join(lines)
+
+
+# --------------------------------------------
+# Worker processes
+# --------------------------------------------
+_WORKER: Optional["_StudyWorker"] = None
+
+
+class _StudyWorker:
+    """A runner and event loop that live for the whole worker process."""
+
+    def __init__(self, options: AssessOptions, share: int):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.runner = build_runner(options, share)
+
+    def assess(self, pdf_path: str) -> Tuple[StudyResult, int, Dict[str, float]]:
+        result = self.loop.run_until_complete(self.runner.assess_study(Study(pdf_path)))
+        return result, os.getpid(), _stats(self.runner)
+
+    def close(self) -> None:
+        if self.runner.journal is not None:
+            self.runner.journal.close()
+
+
+def _init_worker(options: AssessOptions, share: int) -> None:
+    # The parent decides when to stop; a Ctrl-C or SIGTERM sent to the whole
+    # process group must not kill workers mid-answer.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    logging.basicConfig(level=options.log_level, format="%(asctime)s %(message)s")
+    global _WORKER
+    _WORKER = _StudyWorker(options, share)
+    # Runs when the pool shuts the worker down (atexit does not run in pool workers).
+    multiprocessing.util.Finalize(_WORKER, _WORKER.close, exitpriority=10)
+
+
+def _assess_in_worker(pdf_path: str) -> Tuple[StudyResult, int, Dict[str, float]]:
+    return _WORKER.assess(pdf_path)
+
+
+# --------------------------------------------
+# Assess command
+# --------------------------------------------
+class _Stopper:
+    """First signal stops starting new studies; the second one stops at once."""
+
+    def __init__(self, on_force=None):
+        self.stopping = False
+        self.forced = False
+        self.on_force = on_force
+        self._previous = {}
+
+    def __call__(self, signum, frame=None) -> None:
+        if self.stopping:
+            self.forced = True
+            if self.on_force is not None:
+                self.on_force()
+            return
+        self.stopping = True
+        print(
+            f"\n{signal.Signals(signum).name}: finishing running studies; press Ctrl-C again to stop now.",
+            file=sys.stderr,
+        )
+
+    def install(self) -> None:
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            self._previous[signum] = signal.signal(signum, self)
+
+    def restore(self) -> None:
+        for signum, handler in self._previous.items():
+            signal.signal(signum, handler)
+
+
+def _report(result: StudyResult, writers, summary: RunSummary) -> None:
+    for writer in writers:
+        writer.write(result.rows)
+    summary.add(result)
+    status = "ok" if result.ok else f"{len(result.errors)} domain(s) failed"
+    print(f"[{summary.completed}/{summary.studies}] {result.study.name}: {len(result.rows)} answers, {status}")
+
+
+def _assess_inline(options: AssessOptions, pdfs: List[Path], writers, summary: RunSummary) -> None:
+    """Studies on one event loop, ``max_concurrency`` of them started at a time."""
+
+    async def run() -> None:
+        runner = build_runner(options)
+        queue = iter(pdfs)
+        running = set()
+
+        def cancel_running():
+            for task in running:
+                task.cancel()
+
+        stopper = _Stopper(cancel_running)
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stopper, signum)
+        try:
+            while True:
+                while not stopper.stopping and len(running) < options.config.max_concurrency:
+                    pdf = next(queue, None)
+                    if pdf is None:
+                        break
+                    running.add(asyncio.ensure_future(runner.assess_study(Study(pdf))))
+                if not running:
+                    break
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.cancelled():
+                        _report(task.result(), writers, summary)
+        finally:
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(signum)
+            summary.interrupted = stopper.stopping
+            summary.stats = _stats(runner)
+            if runner.journal is not None:
+                runner.journal.close()
+
+    asyncio.run(run())
+
+
+def _assess_pool(options: AssessOptions, pdfs: List[Path], writers, summary: RunSummary, workers: int) -> None:
+    """Studies in ``workers`` spawned processes, one study per worker at a time."""
+
+    def kill():
+        # Workers ignore SIGTERM, see _init_worker.
+        for child in multiprocessing.active_children():
+            child.kill()
+
+    stopper = _Stopper(kill)
+    stopper.install()
+    stats: Dict[int, Dict[str, float]] = {}
+    workers = min(workers, len(pdfs))
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(options, workers),
+    )
+    # Submitting only as many studies as there are workers means a graceful
+    # stop has nothing queued to cancel.
+    queue = iter(pdfs)
+    running: Dict = {}
+    try:
+        while not stopper.forced:
+            while not stopper.stopping and len(running) < workers:
+                pdf = next(queue, None)
+                if pdf is None:
+                    break
+                running[pool.submit(_assess_in_worker, str(pdf))] = pdf
+            if not running:
+                break
+            done, _ = wait(running, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                pdf = running.pop(future)
+                try:
+                    result, pid, worker_stats = future.result()
+                except Exception as exc:
+                    if stopper.forced:
+                        continue
+                    summary.completed += 1
+                    summary.failed.append(f"{pdf.name}: {exc!r}")
+                    continue
+                stats[pid] = worker_stats
+                _report(result, writers, summary)
+    finally:
+        pool.shutdown(wait=not stopper.forced)
+        stopper.restore()
+        summary.interrupted = stopper.stopping
+        summary.stats = {name: sum(worker[name] for worker in stats.values()) for name in STATS_FIELDS}
+
+
+def assess(args: argparse.Namespace) -> int:
+    from .domains import get_domain_specs
+    from .export import ExcelWriter, open_writer
+    from .prompts import get_prompt_manifest
+
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(message)s")
+    specs = get_domain_specs()
+    manifest = get_prompt_manifest(args.prompts)
+    keys = [key for key in manifest if key in specs]
+    try:
+        domains = resolve_domains(args.domains, keys)
+        refresh = [key for value in args.refresh_domain for key in resolve_domains(value, keys)]
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+
+    pdfs = find_studies(args.studies)
+    if args.limit:
+        pdfs = pdfs[: args.limit]
+    if not pdfs:
+        raise SystemExit("No PDF files found.")
+    api_key = load_api_key()
+    if not api_key and ((args.backend != "mock" and args.base_url is None) or args.index):
+        raise SystemExit("Set OPENAI_API_KEY in the environment or in .env.")
+    if args.backend == "http" and not args.index:
+        raise SystemExit("--backend http cannot read PDFs; pass --index DIR to answer from retrieved excerpts.")
+
+    config = RunnerConfig(
+        model=args.model,
+        max_concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        domains=domains,
+        use_cache=not args.no_cache,
+        # --no-cache asks for fresh answers, so it does not replay the journal either.
+        resume=args.resume and not args.no_cache,
+        refresh_domains=refresh,
+        speculate=args.speculate,
+        batch_domains=args.batch_domains,
+        prompt_layout=args.layout,
+    )
+    workers = workers_for_budget(config, args.workers)
+    if workers < args.workers:
+        # Each worker gets tpm / workers; below one call's estimate they would
+        # only throttle each other.
+        raise SystemExit(
+            f"--tpm {config.tokens_per_minute} fits at most {workers} worker(s) at "
+            f"~{config.estimated_tokens_per_call} tokens per call; lower --workers or raise --tpm."
+        )
+    args.output.mkdir(parents=True, exist_ok=True)
+    options = AssessOptions(
+        config=config,
+        prompt_files=manifest,
+        api_key=api_key,
+        backend=args.backend,
+        base_url=args.base_url,
+        mock_latency=args.mock_latency,
+        cache=not args.no_cache,
+        journal=None if args.no_journal else (args.journal or args.output / "run_journal.sqlite"),
+        index=args.index,
+        top_k=args.top_k,
+        log_level=args.log_level,
+    )
+    if args.index:
+        retriever = build_retriever(options)
+        updated = retriever.index.ingest(pdfs, retriever.embed)
+        retriever.index.close()
+        print(f"Indexed {len(updated)} new or changed studies in {args.index}")
+    writers = []
+    if args.format != "none":
+        writers.append(open_writer(args.output / EXPORT_FORMATS[args.format]))
+    if args.excel:
+        writers.append(ExcelWriter(args.output))
+
+    summary = RunSummary(studies=len(pdfs), pricing=pricing_for(args.model))
+    print(f"Assessing {len(pdfs)} studies ({', '.join(domains or keys)}) with {workers} worker(s)")
+    try:
+        if workers > 1:
+            _assess_pool(options, pdfs, writers, summary, workers)
+        else:
+            _assess_inline(options, pdfs, writers, summary)
+    finally:
+        for writer in writers:
+            writer.close()
+        print(summary.summary())
+        if args.usage_report:
+            _write_usage_report(args.usage_report, summary.usage_rows)
+    if summary.interrupted:
+        return 130
+    return 1 if summary.failed else 0
+
+
+def _write_usage_report(path: Path, rows: List[dict]) -> None:
+    import csv
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.DictWriter(handle, fieldnames=list(rows[0]) if rows else ["study"])
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Usage report: {path}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="rob2", description="RoB 2 assessment tools.")
+    sub = parser.add_subparsers(dest="command", metavar="command")
+    run = sub.add_parser("assess", help="assess study PDFs")
+    run.add_argument("studies", type=Path, nargs="+", help="PDF files or directories of PDFs")
+    run.add_argument("--domains", help="e.g. 1,4 or domain_2_adhering (default: every domain with prompts)")
+    run.add_argument("--workers", type=int, default=1,
+                     help="worker processes (1 runs in this process); --tpm / workers must cover one ~15000-token call")
+    run.add_argument("--model", default=RunnerConfig.model)
+    run.add_argument("--backend", choices=["responses", "chat", "http", "mock"], default="responses",
+                     help="OpenAI Responses or Chat Completions API, an OpenAI-compatible server (http), "
+                          "or local mock answers for load tests")
+    run.add_argument("--base-url", help="OpenAI-compatible API base URL")
+    run.add_argument("--index", type=Path, 
+                     help="answer from excerpts retrieved from this corpus index (needed by --backend http)")
+    run.add_argument("--top-k", type=int, default=6, help="excerpts retrieved per question (--index)")
+    run.add_argument("--mock-latency", type=float, default=0.0, help="simulated seconds per call (--backend mock)")
+    run.add_argument("--concurrency", type=int, default=RunnerConfig.max_concurrency, help="requests in flight")
+    run.add_argument("--rpm", type=int, default=RunnerConfig.requests_per_minute,
+                     help="requests per minute (0: unlimited)")
+    run.add_argument("--tpm", type=int, default=RunnerConfig.tokens_per_minute, help="tokens per minute (0: unlimited)")
+    run.add_argument("--output", type=Path, default=Path("outputs"))
+    run.add_argument("--format", choices=[*EXPORT_FORMATS, "none"], default="csv", help="combined export")
+    run.add_argument("--excel", action="store_true", help="also write one workbook per study")
+    run.add_argument("--prompts", type=Path, help="prompts directory or manifest JSON")
+    run.add_argument("--journal", type=Path, help="run journal (default: <output>/run_journal.sqlite)")
+    run.add_argument("--no-journal", action="store_true")
+    run.add_argument("--resume", action="store_true",
+                     help="continue from the journal; answers to edited prompts are asked again")
+    run.add_argument("--no-cache", action="store_true", help="bypass the response cache and the journal's answers")
+    run.add_argument("--refresh-domain", action="append", default=[], help="re-ask a domain (repeatable)")
+    run.add_argument("--speculate", action="store_true", help="prefetch likely follow-up questions")
+    run.add_argument("--batch-domains", action="store_true", help="one request per domain")
+    run.add_argument("--layout", choices=[PREFIX_LAYOUT, QUESTION_FIRST_LAYOUT], default=RunnerConfig.prompt_layout,
+                     help="prefix: shared preamble and study document first so the provider can cache them")
+    run.add_argument("--usage-report", type=Path, help="CSV of tokens, prompt-cache hits and cost per study")
+    run.add_argument("--limit", type=int, help="only the first N studies")
+    run.add_argument("-v", "--verbose", dest="log_level", action="store_const", const=logging.INFO,
+                     default=logging.WARNING, help="log every answer")
+    for name, module in DELEGATED.items():
+        sub.add_parser(name, help=f"same as python -m {module}", add_help=False)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in DELEGATED:
+        import_module(DELEGATED[argv[0]]).main(argv[1:])
+        return
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command != "assess":
+        parser.print_help()
+        raise SystemExit(2)
+    raise SystemExit(assess(args))
+
+
+if __name__ == "__main__":
+    main()
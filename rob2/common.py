@@ -2,7 +2,12 @@
 
 from dataclasses import dataclass
 from enum import Enum
-from typing import Callable, Dict, Iterable, List, Optional
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+    from .truth_table import TruthTable
 
 
 class Response(Enum):
@@ -19,6 +24,22 @@ NO = {Response.N, Response.PN}
 NO_INFO = {Response.NI}
 NOT_APPLICABLE = {Response.NA}
 
+# Integer encoding of answers for tables and arrays; 0 means unanswered.
+RESPONSE_CODES: Tuple[Optional[Response], ...] = (
+    None,
+    Response.Y,
+    Response.PY,
+    Response.NI,
+    Response.PN,
+    Response.N,
+    Response.NA,
+)
+CODE_OF: Dict[Optional[Response], int] = {response: code for code, response in enumerate(RESPONSE_CODES)}
+
+# Integer encoding of domain judgements, in increasing risk.
+JUDGEMENTS: Tuple[str, ...] = ("Low", "Some concerns", "High")
+JUDGEMENT_CODE: Dict[str, int] = {judgement: code for code, judgement in enumerate(JUDGEMENTS)}
+
 
 class DomainResult:
     """Container for final RoB judgement across domains."""
@@ -55,6 +76,8 @@ class DomainSpec:
     questions: Dict[str, str]
     get_next_question: Callable[[dict], Optional[str]]
     evaluate: Callable[..., DomainResult]
+    evaluate_many: Optional[Callable[..., Tuple["np.ndarray", "np.ndarray"]]] = None
+    compiled: Optional[Callable[[], "TruthTable"]] = None
 
 
 class BaseDomain:
@@ -70,6 +93,19 @@ class BaseDomain:
     def evaluate(self, *args, **kwargs) -> DomainResult:
         raise NotImplementedError
 
+    def compiled(self) -> "TruthTable":
+        """Lookup-table form of :meth:`evaluate`, built once per process."""
+        from .truth_table import compile_domain
+
+        return compile_domain(self)
+
+    def evaluate_many(self, answers) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Judgement codes and result IDs for a rows x questions matrix of answers.
+
+        See :meth:`rob2.truth_table.TruthTable.evaluate_many`.
+        """
+        return self.compiled().evaluate_many(answers)
+
     def as_spec(self) -> DomainSpec:
         """Return a light registry-friendly view of this domain."""
         return DomainSpec(
@@ -78,4 +114,6 @@ class BaseDomain:
             questions=self.questions,
             get_next_question=self.get_next_question,
             evaluate=self.evaluate,
+            evaluate_many=self.evaluate_many,
+            compiled=self.compiled,
         )
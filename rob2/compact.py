@@ -0,0 +1,175 @@
+"""Compact result and state representations for large evaluation runs.
+
+:class:`CompactResult` is a slotted handle holding a judgement code and the
+ID of an interned result in a domain's :class:`~rob2.truth_table.TruthTable`;
+the domain name, explanation and decision path are looked up only when
+asked for (``pretty()``, ``to_dict()`` or attribute access), so a result
+costs one small object, or nothing when the table's shared handles are used.
+
+:class:`AnswerState` stores one domain's answers as one byte per question
+(the ``rob2.common.RESPONSE_CODES`` encoding) and behaves like the usual
+``state`` dict keyed by question code, so ``get_next_question`` and
+``evaluate`` work on it unchanged.
+"""
+
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, Mapping, MutableMapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .common import CODE_OF, JUDGEMENTS, RESPONSE_CODES, DomainResult, Response
+
+if TYPE_CHECKING:
+    from .truth_table import TruthTable
+
+
+class CompactResult:
+    """Judgement code plus path-template ID, resolved through its table."""
+
+    __slots__ = ("table", "judgement_code", "path_id")
+
+    def __init__(self, table: "TruthTable", judgement_code: int, path_id: int):
+        self.table = table
+        self.judgement_code = judgement_code
+        self.path_id = path_id
+
+    def resolve(self) -> DomainResult:
+        """The shared full result this handle stands for."""
+        return self.table.results[self.path_id]
+
+    @property
+    def domain_key(self) -> str:
+        return self.table.domain.key
+
+    @property
+    def judgement(self) -> str:
+        return JUDGEMENTS[self.judgement_code]
+
+    @property
+    def domain_name(self) -> str:
+        return self.resolve().domain_name
+
+    @property
+    def explanation(self) -> str:
+        return self.resolve().explanation
+
+    @property
+    def path(self) -> Sequence[str]:
+        return self.resolve().path
+
+    def pretty(self):
+        self.resolve().pretty()
+
+    def to_dict(self) -> Dict[str, str]:
+        """Flat row for exports."""
+        result = self.resolve()
+        return {
+            "domain": self.domain_key,
+            "judgement": result.judgement,
+            "explanation": result.explanation,
+            "path": " | ".join(result.path),
+        }
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, CompactResult):
+            return NotImplemented
+        return self.table is other.table and self.path_id == other.path_id
+
+    def __hash__(self) -> int:
+        return hash((id(self.table), self.path_id))
+
+    def __repr__(self) -> str:
+        return f"CompactResult({self.domain_key!r}, {self.judgement!r}, path_id={self.path_id})"
+
+
+@lru_cache(maxsize=None)
+def _positions(codes: Tuple[str, ...]) -> Dict[str, int]:
+    return {code: position for position, code in enumerate(codes)}
+
+
+def _encode(response: Optional[Response]) -> int:
+    try:
+        return CODE_OF[response]
+    except (KeyError, TypeError):
+        raise ValueError(f"Invalid input: {response}. Must be a Response enum or None.") from None
+
+
+class AnswerState(MutableMapping):
+    """One domain's answers as a fixed-width byte array keyed by question index.
+
+    Unanswered questions are absent from the mapping view, as in a plain
+    ``state`` dict; assigning ``None`` clears an answer.
+    """
+
+    __slots__ = ("codes", "positions", "values")
+
+    def __init__(self, codes: Iterable[str], values: Optional[Iterable[int]] = None):
+        self.codes: Tuple[str, ...] = tuple(codes)
+        self.positions = _positions(self.codes)
+        self.values = bytearray(values) if values is not None else bytearray(len(self.codes))
+        if len(self.values) != len(self.codes):
+            raise ValueError(f"Expected {len(self.codes)} answer codes, got {len(self.values)}")
+        if any(value >= len(RESPONSE_CODES) for value in self.values):
+            raise ValueError(f"Response codes must be in 0..{len(RESPONSE_CODES) - 1}")
+
+    @classmethod
+    def for_domain(cls, domain, answers: Optional[Mapping[str, Optional[Response]]] = None) -> "AnswerState":
+        """Empty (or pre-filled) state for a ``BaseDomain`` or ``DomainSpec``."""
+        state = cls(domain.questions)
+        if answers:
+            state.update(answers)
+        return state
+
+    def __getitem__(self, code: str) -> Response:
+        value = self.values[self.positions[code]]
+        if not value:
+            raise KeyError(code)
+        return RESPONSE_CODES[value]
+
+    def get(self, code: str, default=None):
+        position = self.positions.get(code)
+        if position is None or not self.values[position]:
+            return default
+        return RESPONSE_CODES[self.values[position]]
+
+    def __setitem__(self, code: str, response: Optional[Response]) -> None:
+        self.values[self.positions[code]] = _encode(response)
+
+    def __delitem__(self, code: str) -> None:
+        position = self.positions[code]
+        if not self.values[position]:
+            raise KeyError(code)
+        self.values[position] = 0
+
+    def __contains__(self, code) -> bool:
+        position = self.positions.get(code)
+        return position is not None and bool(self.values[position])
+
+    def __iter__(self) -> Iterator[str]:
+        return (code for code, value in zip(self.codes, self.values) if value)
+
+    def __len__(self) -> int:
+        return len(self.values) - self.values.count(0)
+
+    def copy(self) -> "AnswerState":
+        return AnswerState(self.codes, self.values)
+
+    def answers(self) -> Tuple[Optional[Response], ...]:
+        """Answers in question order, ``None`` where unanswered (``evaluate``'s arguments)."""
+        return tuple(RESPONSE_CODES[value] for value in self.values)
+
+    def as_array(self) -> np.ndarray:
+        """Response codes as a ``uint8`` array sharing this state's memory."""
+        return np.frombuffer(self.values, dtype=np.uint8)
+
+    def __repr__(self) -> str:
+        return f"AnswerState({dict(self.items())!r})"
+
+
+def stack_states(states: Iterable[AnswerState]) -> np.ndarray:
+    """Rows x questions code matrix for ``evaluate_many`` from states of one domain."""
+    states = list(states)
+    if not states:
+        return np.zeros((0, 0), dtype=np.uint8)
+    width = len(states[0].codes)
+    return np.frombuffer(b"".join(state.values for state in states), dtype=np.uint8).reshape(-1, width)
@@ -0,0 +1,82 @@
+"""Decision-tree helpers built on each domain's ``get_next_question``.
+
+The domain modules encode their skip logic imperatively; these helpers
+explore it by trying every model answer at each branch, so callers can ask
+which questions are still reachable from a partial ``state`` and how likely
+each one is to be asked.
+"""
+
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from .common import DomainSpec, Response
+
+# Answers the prompts allow the model to give (NA is never produced).
+ANSWER_CHOICES: Tuple[Response, ...] = (Response.Y, Response.PY, Response.NI, Response.PN, Response.N)
+
+_REACH_CACHE: Dict[Tuple[str, FrozenSet, Tuple[Response, ...]], Dict[str, float]] = {}
+
+
+def _freeze(state: Optional[dict]) -> FrozenSet:
+    return frozenset((code, value) for code, value in (state or {}).items() if value is not None)
+
+
+def reach_probabilities(
+    spec: DomainSpec,
+    state: Optional[dict] = None,
+    choices: Tuple[Response, ...] = ANSWER_CHOICES,
+) -> Dict[str, float]:
+    """Probability that each unanswered question is asked, answers drawn uniformly.
+
+    Only questions reachable from ``state`` appear in the result, in the order
+    they are first reached.
+    """
+    memo: Dict[FrozenSet, Dict[str, float]] = {}
+
+    def walk(frozen: FrozenSet) -> Dict[str, float]:
+        if frozen in memo:
+            return memo[frozen]
+        code = spec.get_next_question(dict(frozen))
+        probs: Dict[str, float] = {}
+        if code is not None:
+            probs[code] = 1.0
+            weight = 1.0 / len(choices)
+            for choice in choices:
+                for sub_code, p in walk(frozen | {(code, choice)}).items():
+                    probs[sub_code] = probs.get(sub_code, 0.0) + p * weight
+        memo[frozen] = probs
+        return probs
+
+    key = (spec.key, _freeze(state), tuple(choices))
+    if key not in _REACH_CACHE:
+        _REACH_CACHE[key] = walk(key[1])
+    return dict(_REACH_CACHE[key])
+
+
+def evaluate_state(spec: DomainSpec, state: dict):
+    """Run ``spec.evaluate`` with answers taken from a question-code ``state``."""
+    return spec.evaluate(*(state.get(code) for code in spec.questions))
+
+
+def walk_answers(spec: DomainSpec, answers: Dict[str, Response]) -> Tuple[List[str], Optional[str]]:
+    """Follow ``get_next_question`` through known ``answers``.
+
+    Returns the codes on the path and the first question whose answer is not
+    known yet (``None`` once the domain is complete).
+    """
+    state: Dict[str, Response] = {}
+    path: List[str] = []
+    code = spec.get_next_question(state)
+    while code and code in answers:
+        state[code] = answers[code]
+        path.append(code)
+        code = spec.get_next_question(state)
+    return path, code
+
+
+def reachable_questions(
+    spec: DomainSpec,
+    state: Optional[dict] = None,
+    choices: Tuple[Response, ...] = ANSWER_CHOICES,
+) -> List[str]:
+    """Question codes that some sequence of answers from ``state`` would ask."""
+    return list(reach_probabilities(spec, state, choices))
@@ -2,14 +2,20 @@
 
 This module centralizes domain discovery and metadata so callers can consume
 questions and navigation/evaluation hooks without importing individual modules.
-Currently it registers the refactored Domain 1 implementation as an example.
+Domain modules are imported on first use and each domain is instantiated
+once per process; :func:`get_domain_spec` loads a single domain without
+touching the others.
 """
 
+import threading
 from importlib import import_module
-from typing import Dict
+from typing import TYPE_CHECKING, Any, Dict, Mapping, Optional, Tuple
 
 from .common import BaseDomain, DomainSpec
 
+if TYPE_CHECKING:
+    import numpy as np
+
 # Map domain key -> dotted path to a BaseDomain subclass
 DOMAIN_CLASSES = {
     "domain_1_randomization": "rob2.domain_1_randomization:Domain1",
@@ -20,6 +26,9 @@ DOMAIN_CLASSES = {
     "domain_5_reporting": "rob2.domain_5_reporting:Domain5Reporting",
 }
 
+_SPECS: Dict[str, DomainSpec] = {}
+_LOCK = threading.Lock()
+
 
 def _load_domain(path: str) -> BaseDomain:
     module_path, class_name = path.split(":")
@@ -28,12 +37,54 @@ def _load_domain(path: str) -> BaseDomain:
     return domain_cls()
 
 
+def get_domain_spec(key: str) -> DomainSpec:
+    """Spec for one registered domain, importing its module on first use."""
+    spec = _SPECS.get(key)
+    if spec is None:
+        if key not in DOMAIN_CLASSES:
+            raise KeyError(f"Unknown domain: {key}")
+        with _LOCK:
+            spec = _SPECS.get(key)
+            if spec is None:
+                path = DOMAIN_CLASSES[key]
+                domain = _load_domain(path)
+                if not isinstance(domain, BaseDomain):
+                    raise TypeError(f"{path} does not implement BaseDomain")
+                spec = _SPECS[key] = domain.as_spec()
+    return spec
+
+
 def get_domain_specs() -> Dict[str, DomainSpec]:
-    """Instantiate and return all registered domain specs."""
-    specs: Dict[str, DomainSpec] = {}
-    for key, path in DOMAIN_CLASSES.items():
-        domain = _load_domain(path)
-        if not isinstance(domain, BaseDomain):
-            raise TypeError(f"{path} does not implement BaseDomain")
-        specs[key] = domain.as_spec()
-    return specs
+    """Return all registered domain specs, in registry order.
+
+    Specs are created once per process and shared; the returned dict is a
+    fresh copy, so callers may add or drop entries.
+    """
+    return {key: get_domain_spec(key) for key in DOMAIN_CLASSES}
+
+
+def clear_domain_cache() -> None:
+    """Forget loaded specs, e.g. after editing a domain module in a notebook."""
+    with _LOCK:
+        _SPECS.clear()
+
+
+def evaluate_many(
+    answers: Mapping[str, Any],
+    specs: Optional[Dict[str, DomainSpec]] = None,
+) -> Dict[str, Tuple["np.ndarray", "np.ndarray"]]:
+    """Bulk-evaluate several domains at once.
+
+    ``answers`` maps a domain key to that domain's rows x questions answer
+    matrix (see :meth:`rob2.truth_table.TruthTable.evaluate_many`); the result
+    maps the same keys to ``(judgement_codes, result_ids)`` arrays.
+    """
+    if specs is None:
+        unknown = [key for key in answers if key not in DOMAIN_CLASSES]
+        if unknown:
+            raise KeyError(f"Unknown domains: {', '.join(unknown)}")
+        return {key: get_domain_spec(key).evaluate_many(matrix) for key, matrix in answers.items()}
+    unknown = [key for key in answers if key not in specs]
+    if unknown:
+        raise KeyError(f"Unknown domains: {', '.join(unknown)}")
+    return {key: specs[key].evaluate_many(matrix) for key, matrix in answers.items()}
@@ -0,0 +1,295 @@
+"""Writers for response tables.
+
+Rows from every study can be streamed, as each study finishes, into one
+columnar file or dataset through a :class:`RowWriter`: :class:`CsvWriter`
+(standard library), :class:`ArrowWriter` (Arrow IPC file) or
+:class:`ParquetDatasetWriter` (a Parquet dataset partitioned by domain).
+Both columnar writers need ``pyarrow``. Pass a writer to
+``AssessmentRunner(writer=...)`` or call ``write(rows)`` yourself, and use
+:func:`open_writer` to pick one from a path.
+
+Excel is a rendering step: :func:`write_excel` uses openpyxl's write-only
+mode, :class:`ExcelWriter` renders one workbook per study as it finishes,
+and :func:`render_excel` builds the per-study workbooks from a finished CSV,
+Arrow or Parquet export.
+"""
+
+import csv
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+ROW_FIELDS = (
+    "file_name",
+    "domain",
+    "question_code",
+    "question_text",
+    "prompt_path",
+    "answer",
+    "justification",
+    "citations",
+)
+
+
+def clean_excel(val):
+    """Strip characters openpyxl refuses to write."""
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    if isinstance(val, str):
+        return ILLEGAL_CHARACTERS_RE.sub("", val)
+    if isinstance(val, list):
+        return [clean_excel(v) for v in val]
+    if isinstance(val, dict):
+        return {k: clean_excel(v) for k, v in val.items()}
+    return val
+
+
+def _columns(rows: Sequence[dict]) -> List[str]:
+    columns: Dict[str, None] = {}
+    for row in rows:
+        columns.update(dict.fromkeys(row))
+    return list(columns)
+
+
+def write_excel(
+    rows: Iterable[dict],
+    output_file: Union[str, Path],
+    fields: Optional[Sequence[str]] = None,
+) -> Path:
+    """Write response rows to ``output_file`` as a single-sheet workbook.
+
+    Uses openpyxl's write-only mode, which streams cells to disk instead of
+    building the whole sheet in memory.
+    """
+    from openpyxl import Workbook
+
+    rows = list(rows)
+    fields = list(fields) if fields is not None else _columns(rows)
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Sheet1")
+    sheet.append(fields)
+    for row in rows:
+        sheet.append([clean_excel(row.get(name)) for name in fields])
+    workbook.save(output_file)
+    return output_file
+
+
+# --------------------------------------------
+# Streaming writers
+# --------------------------------------------
+class RowWriter:
+    """Sink for response rows; ``write`` is typically called once per finished study."""
+
+    def __init__(self, fields: Sequence[str] = ROW_FIELDS):
+        self.fields = tuple(fields)
+        self.rows_written = 0
+
+    def write(self, rows: Iterable[dict]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CsvWriter(RowWriter):
+    """All rows in one CSV file, flushed after every write."""
+
+    def __init__(self, path: Union[str, Path], fields: Sequence[str] = ROW_FIELDS, append: bool = False):
+        super().__init__(fields)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        header = not (append and self.path.exists() and self.path.stat().st_size)
+        self._file = open(self.path, "a" if append else "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fields, extrasaction="ignore")
+        if header:
+            self._writer.writeheader()
+
+    def write(self, rows: Iterable[dict]) -> None:
+        rows = list(rows)
+        self._writer.writerows(rows)
+        self._file.flush()
+        self.rows_written += len(rows)
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+
+def _arrow_table(rows: Sequence[dict], fields: Sequence[str]):
+    import pyarrow as pa
+
+    schema = pa.schema([(name, pa.string()) for name in fields])
+    columns = {name: [None if row.get(name) is None else str(row[name]) for row in rows] for name in fields}
+    return pa.Table.from_pydict(columns, schema=schema)
+
+
+class ArrowWriter(RowWriter):
+    """All rows in one Arrow IPC file, one record batch per write."""
+
+    def __init__(self, path: Union[str, Path], fields: Sequence[str] = ROW_FIELDS):
+        import pyarrow as pa
+
+        super().__init__(fields)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._sink = pa.OSFile(str(self.path), "wb")
+        self._writer = pa.ipc.new_file(self._sink, _arrow_table([], self.fields).schema)
+
+    def write(self, rows: Iterable[dict]) -> None:
+        rows = list(rows)
+        if rows:
+            self._writer.write_table(_arrow_table(rows, self.fields))
+            self.rows_written += len(rows)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+            self._writer = None
+
+
+class ParquetDatasetWriter(RowWriter):
+    """A Parquet dataset under ``root`` partitioned by ``partition_cols``.
+
+    Rows are buffered and written as a new set of part files every
+    ``rows_per_file`` rows and on close, so memory stays bounded and each
+    run adds files without rewriting earlier ones.
+    """
+
+    def __init__(
+        self,
+        root: Union[str, Path],
+        fields: Sequence[str] = ROW_FIELDS,
+        partition_cols: Sequence[str] = ("domain",),
+        rows_per_file: int = 50_000,
+        compression: str = "zstd",
+    ):
+        super().__init__(fields)
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.partition_cols = list(partition_cols)
+        self.rows_per_file = rows_per_file
+        self.compression = compression
+        self._run = f"{time.time_ns():x}"
+        self._parts = 0
+        self._buffer: List[dict] = []
+
+    def write(self, rows: Iterable[dict]) -> None:
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.rows_per_file:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        import pyarrow.parquet as pq
+
+        pq.write_to_dataset(
+            _arrow_table(self._buffer, self.fields),
+            str(self.root),
+            partition_cols=self.partition_cols,
+            basename_template=f"{self._run}-{self._parts:05d}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            compression=self.compression,
+        )
+        self._parts += 1
+        self.rows_written += len(self._buffer)
+        self._buffer.clear()
+
+    def close(self) -> None:
+        self.flush()
+
+
+class ExcelWriter(RowWriter):
+    """One ``<stem><suffix>`` workbook per study in ``output_dir``."""
+
+    def __init__(self, output_dir: Union[str, Path], suffix: str = "_responses.xlsx", fields: Sequence[str] = ROW_FIELDS):
+        super().__init__(fields)
+        self.output_dir = Path(output_dir)
+        self.suffix = suffix
+
+    def write(self, rows: Iterable[dict]) -> None:
+        by_study: Dict[str, List[dict]] = defaultdict(list)
+        for row in rows:
+            by_study[row["file_name"]].append(row)
+        for name, study_rows in by_study.items():
+            write_excel(study_rows, self.output_dir / f"{Path(name).stem}{self.suffix}", self.fields)
+            self.rows_written += len(study_rows)
+
+
+class MultiWriter(RowWriter):
+    """Fan rows out to several writers."""
+
+    def __init__(self, writers: Sequence[RowWriter]):
+        super().__init__(writers[0].fields if writers else ROW_FIELDS)
+        self.writers = list(writers)
+
+    def write(self, rows: Iterable[dict]) -> None:
+        rows = list(rows)
+        for writer in self.writers:
+            writer.write(rows)
+        self.rows_written += len(rows)
+
+    def close(self) -> None:
+        for writer in self.writers:
+            writer.close()
+
+
+def open_writer(target: Union[str, Path], fields: Sequence[str] = ROW_FIELDS) -> RowWriter:
+    """Writer chosen by suffix: ``.csv``, ``.arrow``/``.feather``, otherwise a Parquet dataset directory."""
+    target = Path(target)
+    suffix = target.suffix.lower()
+    if suffix == ".csv":
+        return CsvWriter(target, fields)
+    if suffix in (".arrow", ".feather", ".ipc"):
+        return ArrowWriter(target, fields)
+    return ParquetDatasetWriter(target, fields)
+
+
+def read_rows(source: Union[str, Path]) -> Iterator[dict]:
+    """Rows back from a CSV file, Arrow IPC file or Parquet dataset."""
+    source = Path(source)
+    suffix = source.suffix.lower()
+    if suffix == ".csv":
+        with open(source, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+        return
+    if suffix in (".arrow", ".feather", ".ipc"):
+        import pyarrow as pa
+
+        with pa.memory_map(str(source)) as f:
+            reader = pa.ipc.open_file(f)
+            for index in range(reader.num_record_batches):
+                yield from reader.get_batch(index).to_pylist()
+        return
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(str(source), format="parquet", partitioning="hive")
+    for batch in dataset.to_batches():
+        yield from batch.to_pylist()
+
+
+def render_excel(
+    source: Union[str, Path],
+    output_dir: Union[str, Path],
+    suffix: str = "_responses.xlsx",
+    fields: Sequence[str] = ROW_FIELDS,
+) -> List[Path]:
+    """Per-study workbooks from a finished export, rows ordered as the runner orders them."""
+    by_study: Dict[str, List[dict]] = defaultdict(list)
+    for row in read_rows(source):
+        by_study[row["file_name"]].append(row)
+    written = []
+    for name, rows in sorted(by_study.items()):
+        rows.sort(key=lambda row: (row["domain"], row["question_code"]))
+        written.append(write_excel(rows, Path(output_dir) / f"{Path(name).stem}{suffix}", fields))
+    return written
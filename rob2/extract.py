@@ -0,0 +1,426 @@
+"""Parallel, cached PDF text extraction into a content-addressed artifact store.
+
+Each PDF is parsed once per content hash. Page-level text (and, on request,
+``pymupdf4llm`` markdown) is written under
+``<root>/<sha256[:2]>/<sha256>/`` as JSON lines, and downstream chunking,
+embedding and prompting stream pages back from there, so re-running a
+pipeline over unchanged PDFs costs no parse time. New PDFs are parsed in a
+process pool, one PDF per task. From the shell::
+
+    python -m rob2.extract studies/ [--markdown] [--workers 8]
+
+Scanned reports come back from PyMuPDF with (almost) no text. The parse step
+triages pages: a page with images and fewer than ``OCR_MAX_DENSITY``
+characters per square inch is queued for OCR (``pytesseract``) in a second,
+smaller process pool, keyed by a hash of the page's image bytes so an OCR'd
+page is never OCR'd again. Text-only PDFs are yielded as soon as they are
+parsed and never wait for the OCR lane.
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .cache import sha256_file
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARTIFACT_DIR = Path(".rob2_cache") / "artifacts"
+
+# Bump when the artifact layout or extraction settings change.
+EXTRACTOR_VERSION = 2
+
+# Characters per square inch below which a page with images is OCR'd. A
+# typical text page has 30-40; a scanned page with a running header has ~0.5.
+OCR_MAX_DENSITY = 1.0
+OCR_DPI = 300
+
+_OCR_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS ocr (
+    page_hash TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    created REAL NOT NULL
+);
+"""
+
+
+@dataclass
+class Artifact:
+    """Extracted text of one PDF, read lazily from disk."""
+
+    sha256: str
+    path: Path
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        return json.loads((self.path / "meta.json").read_text(encoding="utf-8"))
+
+    def _lines(self, name: str) -> Iterator[Dict[str, Any]]:
+        with open(self.path / name, "r", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def pages(self) -> Iterator[Dict[str, Any]]:
+        """``{"page", "text"}`` per page, in the shape ``load_pdf`` returns.
+
+        OCR'd pages also carry ``"ocr": True``.
+        """
+        return self._lines("pages.jsonl")
+
+    def markdown_pages(self) -> Iterator[Dict[str, Any]]:
+        """``{"page", "text"}`` per page as markdown; needs ``markdown=True`` at extraction."""
+        return self._lines("markdown.jsonl")
+
+    def text(self) -> str:
+        return "\n\n".join(page["text"] for page in self.pages())
+
+    def markdown(self) -> str:
+        return "\n\n".join(page["text"] for page in self.markdown_pages())
+
+
+@dataclass
+class ExtractionStats:
+    parsed: int = 0
+    failed: int = 0  # PDFs that could not be parsed
+    reused: int = 0
+    pages: int = 0
+    parse_seconds: float = 0.0  # summed over workers
+    ocr_pages: int = 0  # image-only pages found by triage
+    ocr_cached: int = 0  # of those, answered from the OCR cache
+    ocr_skipped: int = 0  # left empty because OCR is disabled, unavailable or failed
+    ocr_seconds: float = 0.0  # summed over OCR workers
+    wall_seconds: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.parsed} parsed ({self.pages} pages, {self.parse_seconds:.1f}s CPU), "
+            f"{self.reused} reused, {self.failed} failed; OCR {self.ocr_pages} pages ({self.ocr_cached} cached, "
+            f"{self.ocr_skipped} skipped, {self.ocr_seconds:.1f}s CPU); {self.wall_seconds:.1f}s wall"
+        )
+
+
+def _write_lines(path: Path, rows: List[Dict[str, Any]]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def _page_hash(doc, page) -> str:
+    digest = hashlib.sha256(f"rotation={page.rotation}".encode())
+    for image in page.get_images(full=True):
+        digest.update(doc.extract_image(image[0])["image"])
+    return digest.hexdigest()
+
+
+def extract_pdf(
+    pdf_path: str, target: str, markdown: bool = False, ocr_density: float = OCR_MAX_DENSITY
+) -> Dict[str, Any]:
+    """Parse ``pdf_path`` into the artifact directory ``target``; returns its metadata.
+
+    Runs in worker processes. Output is written to a temporary directory and
+    renamed into place, so readers never see a half-written artifact. Pages
+    that need OCR are listed in ``meta["ocr_pending"]`` with their page hash.
+    """
+    import fitz  # PyMuPDF
+
+    started = time.perf_counter()
+    target = Path(target)
+    tmp = target.with_name(f"{target.name}.tmp-{os.getpid()}")
+    tmp.mkdir(parents=True, exist_ok=True)
+
+    pages, pending = [], []
+    doc = fitz.open(pdf_path)
+    try:
+        for page in doc:
+            text = (page.get_text("text") or "").strip()
+            pages.append({"page": page.number + 1, "text": text})
+            square_inches = max(page.rect.width * page.rect.height / 72**2, 1.0)
+            if len(text) / square_inches < ocr_density and page.get_images():
+                pending.append({"page": page.number + 1, "hash": _page_hash(doc, page)})
+    finally:
+        doc.close()
+    _write_lines(tmp / "pages.jsonl", pages)
+    if markdown:
+        import pymupdf4llm
+
+        chunks = pymupdf4llm.to_markdown(pdf_path, page_chunks=True)
+        _write_lines(tmp / "markdown.jsonl", [{"page": n, "text": c["text"]} for n, c in enumerate(chunks, 1)])
+
+    meta = {
+        "version": EXTRACTOR_VERSION,
+        "source": Path(pdf_path).name,
+        "pages": len(pages),
+        "markdown": markdown,
+        "ocr_pending": pending,
+        "ocr_pages": 0,
+        "seconds": time.perf_counter() - started,
+    }
+    (tmp / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    if target.exists():
+        shutil.rmtree(target)
+    try:
+        tmp.rename(target)
+    except OSError:
+        # Another worker finished the same content first.
+        shutil.rmtree(tmp, ignore_errors=True)
+    return meta
+
+
+def ocr_page(pdf_path: str, page_number: int, dpi: int = OCR_DPI, lang: str = "eng") -> Tuple[str, float]:
+    """Render one page and OCR it; returns ``(text, seconds)``. Runs in the OCR pool."""
+    import fitz  # PyMuPDF
+    import pytesseract
+    from PIL import Image
+
+    started = time.perf_counter()
+    doc = fitz.open(pdf_path)
+    try:
+        pix = doc[page_number - 1].get_pixmap(dpi=dpi)
+        image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    finally:
+        doc.close()
+    text = pytesseract.image_to_string(image, lang=lang).strip()
+    return text, time.perf_counter() - started
+
+
+def ocr_available() -> bool:
+    return importlib.util.find_spec("pytesseract") is not None and shutil.which("tesseract") is not None
+
+
+class ArtifactStore:
+    """Content-addressed directory of extracted PDF text.
+
+    ``ocr=None`` enables the OCR lane when ``pytesseract`` and the
+    ``tesseract`` binary are both available.
+    """
+
+    def __init__(
+        self,
+        root: Union[str, Path] = DEFAULT_ARTIFACT_DIR,
+        workers: Optional[int] = None,
+        ocr: Optional[bool] = None,
+        ocr_workers: int = 2,
+        ocr_lang: str = "eng",
+    ):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.workers = workers or os.cpu_count() or 1
+        self.ocr = ocr_available() if ocr is None else ocr
+        self.ocr_workers = ocr_workers
+        self.ocr_lang = ocr_lang
+        self.stats = ExtractionStats()
+        self._ocr_conn = sqlite3.connect(str(self.root / "ocr.sqlite"))
+        self._ocr_conn.executescript(_OCR_SCHEMA_SQL)
+
+    def path_for(self, sha256: str) -> Path:
+        return self.root / sha256[:2] / sha256
+
+    def get(self, sha256: str, markdown: bool = False) -> Optional[Artifact]:
+        """The artifact for this content, if fully extracted with the current version."""
+        artifact = Artifact(sha256, self.path_for(sha256))
+        try:
+            meta = artifact.meta
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != EXTRACTOR_VERSION or (markdown and not meta.get("markdown")):
+            return None
+        if self.ocr and meta.get("ocr_pending"):
+            # Extracted while OCR was off (or interrupted): parse again; done pages hit the OCR cache.
+            return None
+        return artifact
+
+    # --------------------------------------------
+    # OCR cache and merging
+    # --------------------------------------------
+    def _cached_ocr(self, page_hash: str) -> Optional[str]:
+        row = self._ocr_conn.execute("SELECT text FROM ocr WHERE page_hash = ?", (page_hash,)).fetchone()
+        return row[0] if row else None
+
+    def _store_ocr(self, page_hash: str, text: str, seconds: float) -> None:
+        self._ocr_conn.execute(
+            "INSERT OR REPLACE INTO ocr VALUES (?, ?, ?, ?)", (page_hash, text, seconds, time.time())
+        )
+        self._ocr_conn.commit()
+
+    def _merge_ocr(self, sha256: str, texts: Dict[int, str], failed: Sequence[int] = ()) -> None:
+        """Write OCR text into an artifact's pages and clear its pending list.
+
+        Pages in ``failed`` keep their (empty) parsed text and are listed in
+        ``meta["ocr_failed"]`` instead of being retried on every run.
+        """
+        artifact = Artifact(sha256, self.path_for(sha256))
+        pages = list(artifact.pages())
+        for page in pages:
+            text = texts.get(page["page"])
+            if text is not None and len(text) > len(page["text"]):
+                page["text"], page["ocr"] = text, True
+        tmp = artifact.path / "pages.jsonl.tmp"
+        _write_lines(tmp, pages)
+        tmp.replace(artifact.path / "pages.jsonl")
+        meta = artifact.meta
+        meta["ocr_pending"], meta["ocr_pages"] = [], len(texts)
+        meta["ocr_failed"] = sorted(failed)
+        (artifact.path / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+    # --------------------------------------------
+    # Extraction
+    # --------------------------------------------
+    def extract(self, pdf_path: Union[str, Path], markdown: bool = False, sha256: Optional[str] = None) -> Artifact:
+        artifact = self.extract_all([pdf_path], markdown, [sha256] if sha256 else None)[0]
+        if artifact is None:
+            raise ValueError(f"{pdf_path} could not be parsed")
+        return artifact
+
+    def extract_all(
+        self,
+        pdf_paths: Sequence[Union[str, Path]],
+        markdown: bool = False,
+        sha256s: Optional[Sequence[str]] = None,
+    ) -> List[Optional[Artifact]]:
+        """Artifacts for ``pdf_paths`` in order (``None`` where parsing failed), parsing only content not seen before."""
+        artifacts: Dict[int, Artifact] = dict(self.iter_extract(pdf_paths, markdown, sha256s))
+        return [artifacts.get(i) for i in range(len(pdf_paths))]
+
+    def iter_extract(
+        self,
+        pdf_paths: Sequence[Union[str, Path]],
+        markdown: bool = False,
+        sha256s: Optional[Sequence[str]] = None,
+    ) -> Iterator[Tuple[int, Artifact]]:
+        """Yield ``(position, artifact)`` as each PDF becomes ready.
+
+        Cached PDFs come first, then PDFs as their parse finishes; PDFs with
+        image-only pages follow once their OCR is done. A PDF that fails to
+        parse is logged and not yielded; a page whose OCR fails is logged,
+        counted in ``stats.ocr_skipped`` and left with its parsed text.
+        """
+        started = time.perf_counter()
+        pdf_paths = [Path(p) for p in pdf_paths]
+        sha256s = list(sha256s) if sha256s else [sha256_file(p) for p in pdf_paths]
+        positions: Dict[str, List[int]] = {}
+        todo: Dict[str, Path] = {}
+        for i, (pdf_path, sha256) in enumerate(zip(pdf_paths, sha256s)):
+            positions.setdefault(sha256, []).append(i)
+            if sha256 in todo or self.get(sha256, markdown) is None:
+                todo.setdefault(sha256, pdf_path)
+            else:
+                self.stats.reused += 1
+                yield i, Artifact(sha256, self.path_for(sha256))
+
+        def ready(sha256: str) -> Iterator[Tuple[int, Artifact]]:
+            for i in positions[sha256]:
+                yield i, Artifact(sha256, self.path_for(sha256))
+
+        if not todo:
+            self.stats.wall_seconds += time.perf_counter() - started
+            return
+
+        # spawn: forking a process that holds HTTP clients and event loops is not safe.
+        context = multiprocessing.get_context("spawn")
+        parse_pool = ProcessPoolExecutor(max_workers=min(self.workers, len(todo)), mp_context=context)
+        ocr_pool: Optional[ProcessPoolExecutor] = None
+        parsing = {
+            parse_pool.submit(extract_pdf, str(path), str(self.path_for(sha256)), markdown): sha256
+            for sha256, path in todo.items()
+        }
+        ocr_jobs: Dict[Any, Tuple[str, int, str]] = {}  # future -> (sha256, page, page hash)
+        ocr_texts: Dict[str, Dict[int, str]] = {}
+        ocr_left: Dict[str, int] = {}
+        ocr_failed: Dict[str, List[int]] = {}
+        try:
+            while parsing or ocr_jobs:
+                done, _ = wait(list(parsing) + list(ocr_jobs), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in parsing:
+                        sha256 = parsing.pop(future)
+                        try:
+                            meta = future.result()
+                        except Exception as exc:  # a corrupt PDF must not stop the others
+                            self.stats.failed += 1
+                            logger.warning("%s: could not be parsed: %s", todo[sha256].name, exc)
+                            continue
+                        self.stats.parsed += 1
+                        self.stats.pages += meta["pages"]
+                        self.stats.parse_seconds += meta["seconds"]
+                        pending = meta["ocr_pending"]
+                        self.stats.ocr_pages += len(pending)
+                        if pending and not self.ocr:
+                            self.stats.ocr_skipped += len(pending)
+                            logger.warning(
+                                "%s: %d image-only pages left without text (OCR unavailable)",
+                                meta["source"], len(pending),
+                            )
+                            yield from ready(sha256)
+                            continue
+                        texts = ocr_texts.setdefault(sha256, {})
+                        for item in pending:
+                            cached = self._cached_ocr(item["hash"])
+                            if cached is not None:
+                                texts[item["page"]] = cached
+                                self.stats.ocr_cached += 1
+                                continue
+                            if ocr_pool is None:
+                                ocr_pool = ProcessPoolExecutor(max_workers=self.ocr_workers, mp_context=context)
+                            job = ocr_pool.submit(ocr_page, str(todo[sha256]), item["page"], OCR_DPI, self.ocr_lang)
+                            ocr_jobs[job] = (sha256, item["page"], item["hash"])
+                            ocr_left[sha256] = ocr_left.get(sha256, 0) + 1
+                        if not ocr_left.get(sha256):
+                            if pending:
+                                self._merge_ocr(sha256, texts)
+                            yield from ready(sha256)
+                    else:
+                        sha256, page, page_hash = ocr_jobs.pop(future)
+                        try:
+                            text, seconds = future.result()
+                        except Exception as exc:
+                            self.stats.ocr_skipped += 1
+                            ocr_failed.setdefault(sha256, []).append(page)
+                            logger.warning("%s page %d: OCR failed: %s", todo[sha256].name, page, exc)
+                        else:
+                            self._store_ocr(page_hash, text, seconds)
+                            self.stats.ocr_seconds += seconds
+                            ocr_texts[sha256][page] = text
+                        ocr_left[sha256] -= 1
+                        if not ocr_left[sha256]:
+                            self._merge_ocr(sha256, ocr_texts[sha256], ocr_failed.get(sha256, ()))
+                            yield from ready(sha256)
+        finally:
+            parse_pool.shutdown(cancel_futures=True)
+            if ocr_pool is not None:
+                ocr_pool.shutdown(cancel_futures=True)
+            self.stats.wall_seconds += time.perf_counter() - started
+
+    def close(self) -> None:
+        self._ocr_conn.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m rob2.extract", description="Extract text from study PDFs.")
+    parser.add_argument("studies", type=Path, help="directory of PDFs")
+    parser.add_argument("--artifacts", type=Path, default=DEFAULT_ARTIFACT_DIR)
+    parser.add_argument("--markdown", action="store_true", help="also convert pages to markdown")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--ocr-workers", type=int, default=2)
+    parser.add_argument("--no-ocr", action="store_true", help="leave image-only pages empty")
+    args = parser.parse_args(argv)
+
+    ocr = False if args.no_ocr else None
+    store = ArtifactStore(args.artifacts, args.workers, ocr=ocr, ocr_workers=args.ocr_workers)
+    store.extract_all(sorted(args.studies.glob("*.pdf")), markdown=args.markdown)
+    print(store.stats.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""Registry of uploaded study PDFs and clean-up of stale remote files.
+
+``client.files.create`` is only needed once per distinct PDF: the registry
+maps the SHA-256 of the PDF bytes to the remote ``file_id`` with an expiry
+time, so every domain, run and notebook cell reuses the same upload.
+:func:`collect_garbage` deletes expired uploads, uploads replaced by a fresh
+upload of the same PDF and, optionally, remote files this tool uploaded
+(their names start with ``UPLOAD_PREFIX``) that the registry does not know
+about, in bulk. Run it from the shell with::
+
+    python -m rob2.files gc [--orphans] [--all]
+
+:class:`LocalFiles` / :class:`AsyncLocalFiles` are in-memory stand-ins for the
+files API so the registry and runner can be exercised without network calls.
+"""
+
+import argparse
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Union
+
+from .cache import connect, retry_locked, sha256_file
+
+DEFAULT_REGISTRY_PATH = Path(".rob2_cache") / "files.sqlite"
+
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS uploads (
+    sha256 TEXT PRIMARY KEY,
+    file_id TEXT NOT NULL,
+    filename TEXT,
+    uploaded REAL NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS uploads_expires ON uploads (expires);
+CREATE TABLE IF NOT EXISTS replaced (
+    file_id TEXT PRIMARY KEY,
+    filename TEXT,
+    replaced REAL NOT NULL
+);
+"""
+
+# Remote names of uploaded PDFs start with this, so orphan collection only
+# touches files this tool created.
+UPLOAD_PREFIX = "rob2-"
+
+
+def upload_name(filename: str) -> str:
+    """Remote file name for an upload of ``filename``."""
+    return filename if filename.startswith(UPLOAD_PREFIX) else UPLOAD_PREFIX + filename
+
+
+@dataclass
+class Upload:
+    sha256: str
+    file_id: str
+    filename: str
+    uploaded: float
+    expires: float
+
+
+class FileRegistry:
+    """SQLite map of PDF content hash -> remote file id."""
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_REGISTRY_PATH, ttl_days: float = 30):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl_days * 86400
+        self._lock = threading.Lock()
+        self._conn = connect(self.path)
+        self._conn.executescript(_SCHEMA_SQL)
+
+    def lookup(self, sha256: str) -> Optional[str]:
+        """Return the file id for an unexpired upload of this content."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_id FROM uploads WHERE sha256 = ? AND expires > ?", (sha256, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def record(self, sha256: str, file_id: str, filename: str = "") -> None:
+        now = time.time()
+
+        def write() -> None:
+            old = self._conn.execute("SELECT file_id, filename FROM uploads WHERE sha256 = ?", (sha256,)).fetchone()
+            if old is not None and old[0] != file_id:
+                # Re-uploaded after expiry: queue the old remote file for gc.
+                self._conn.execute("INSERT OR IGNORE INTO replaced VALUES (?, ?, ?)", (old[0], old[1], now))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?, ?)",
+                (sha256, file_id, filename, now, now + self.ttl),
+            )
+            self._conn.commit()
+
+        with self._lock:
+            retry_locked(self._conn, write)
+
+    def forget(self, file_ids: List[str]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM uploads WHERE file_id = ?", [(f,) for f in file_ids])
+            self._conn.executemany("DELETE FROM replaced WHERE file_id = ?", [(f,) for f in file_ids])
+            self._conn.commit()
+
+    def uploads(self, expired_only: bool = False) -> List[Upload]:
+        query = "SELECT sha256, file_id, filename, uploaded, expires FROM uploads"
+        params = ()
+        if expired_only:
+            query += " WHERE expires <= ?"
+            params = (time.time(),)
+        with self._lock:
+            return [Upload(*row) for row in self._conn.execute(query, params)]
+
+    def replaced_file_ids(self) -> List[str]:
+        """Remote files superseded by a newer upload of the same PDF."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT file_id FROM replaced")]
+
+    def known_file_ids(self) -> set:
+        with self._lock:
+            return {
+                row[0] for row in self._conn.execute("SELECT file_id FROM uploads UNION SELECT file_id FROM replaced")
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# --------------------------------------------
+# Upload helpers
+# --------------------------------------------
+def upload_pdf(client, registry: FileRegistry, pdf_path: Union[str, Path], sha256: Optional[str] = None) -> str:
+    """Return a file id for ``pdf_path``, uploading only if the registry has none."""
+    pdf_path = Path(pdf_path)
+    sha256 = sha256 or sha256_file(pdf_path)
+    file_id = registry.lookup(sha256)
+    if file_id is None:
+        file = client.files.create(file=(upload_name(pdf_path.name), pdf_path.read_bytes()), purpose="user_data")
+        file_id = file.id
+        registry.record(sha256, file_id, pdf_path.name)
+    return file_id
+
+
+def collect_garbage(
+    client,
+    registry: FileRegistry,
+    include_orphans: bool = False,
+    delete_all: bool = False,
+    workers: int = 8,
+) -> List[str]:
+    """Delete expired and replaced uploads (or every registered upload with ``delete_all``).
+
+    With ``include_orphans`` remote ``user_data`` files named with
+    ``UPLOAD_PREFIX`` but missing from the registry, e.g. left behind by an
+    interrupted run, are deleted too; files other tools uploaded are never
+    touched. Returns the deleted file ids.
+    """
+    targets = [u.file_id for u in registry.uploads(expired_only=not delete_all)]
+    targets.extend(registry.replaced_file_ids())
+    if include_orphans:
+        known = registry.known_file_ids()
+        targets.extend(
+            f.id
+            for f in client.files.list(purpose="user_data")
+            if f.id not in known and (getattr(f, "filename", None) or "").startswith(UPLOAD_PREFIX)
+        )
+
+    def delete(file_id: str) -> Optional[str]:
+        try:
+            client.files.delete(file_id)
+        except Exception as exc:
+            # Already gone remotely; still drop it from the registry.
+            if getattr(exc, "status_code", None) != 404:
+                return None
+        return file_id
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        deleted = [file_id for file_id in pool.map(delete, targets) if file_id]
+    registry.forget(deleted)
+    return deleted
+
+
+# --------------------------------------------
+# Local stand-ins for the files API
+# --------------------------------------------
+class FileNotFound(Exception):
+    status_code = 404
+
+
+class LocalFiles:
+    """In-memory implementation of ``create``/``retrieve``/``content``/``delete``/``list``."""
+
+    def __init__(self):
+        self.files: Dict[str, SimpleNamespace] = {}
+        self.data: Dict[str, bytes] = {}
+        self.uploads = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def create(self, file, purpose: str = "user_data") -> SimpleNamespace:
+        name, data = file if isinstance(file, tuple) else (getattr(file, "name", "upload"), file.read())
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        with self._lock:
+            obj = SimpleNamespace(
+                id=f"file-local-{next(self._ids)}",
+                filename=name,
+                bytes=len(data),
+                purpose=purpose,
+                created_at=int(time.time()),
+            )
+            self.files[obj.id] = obj
+            self.data[obj.id] = data
+            self.uploads += 1
+        return obj
+
+    def retrieve(self, file_id: str) -> SimpleNamespace:
+        if file_id not in self.files:
+            raise FileNotFound(file_id)
+        return self.files[file_id]
+
+    def content(self, file_id: str) -> SimpleNamespace:
+        data = self.data.get(file_id)
+        if data is None:
+            raise FileNotFound(file_id)
+        return SimpleNamespace(content=data, text=data.decode("utf-8", errors="replace"), read=lambda: data)
+
+    def delete(self, file_id: str) -> SimpleNamespace:
+        with self._lock:
+            self.data.pop(file_id, None)
+            if self.files.pop(file_id, None) is None:
+                raise FileNotFound(file_id)
+        return SimpleNamespace(id=file_id, deleted=True)
+
+    def list(self, purpose: Optional[str] = None) -> List[SimpleNamespace]:
+        return [f for f in list(self.files.values()) if purpose is None or f.purpose == purpose]
+
+
+class AsyncLocalFiles:
+    """Async facade over :class:`LocalFiles` for ``AsyncOpenAI``-style callers."""
+
+    def __init__(self, files: Optional[LocalFiles] = None):
+        self.sync = files or LocalFiles()
+
+    async def create(self, file, purpose: str = "user_data") -> SimpleNamespace:
+        return self.sync.create(file, purpose)
+
+    async def retrieve(self, file_id: str) -> SimpleNamespace:
+        return self.sync.retrieve(file_id)
+
+    async def content(self, file_id: str) -> SimpleNamespace:
+        return self.sync.content(file_id)
+
+    async def delete(self, file_id: str) -> SimpleNamespace:
+        return self.sync.delete(file_id)
+
+    async def list(self, purpose: Optional[str] = None) -> List[SimpleNamespace]:
+        return self.sync.list(purpose)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m rob2.files", description="Manage uploaded study PDFs.")
+    parser.add_argument("--registry", default=str(DEFAULT_REGISTRY_PATH))
+    sub = parser.add_subparsers(dest="command", required=True)
+    gc = sub.add_parser("gc", help="delete stale uploads")
+    gc.add_argument("--orphans", action="store_true", help=f"also delete remote files named {UPLOAD_PREFIX}* that are missing from the registry")
+    gc.add_argument("--all", action="store_true", help="delete every registered upload, expired or not")
+    sub.add_parser("list", help="show registered uploads")
+    args = parser.parse_args(argv)
+
+    registry = FileRegistry(args.registry)
+    if args.command == "list":
+        for upload in registry.uploads():
+            expires = time.strftime("%Y-%m-%d", time.localtime(upload.expires))
+            print(f"{upload.file_id}  {upload.filename}  expires {expires}")
+        return
+
+    from openai import OpenAI
+
+    deleted = collect_garbage(OpenAI(), registry, include_orphans=args.orphans, delete_all=args.all)
+    print(f"Deleted {len(deleted)} remote files.")
+
+
+if __name__ == "__main__":
+    main()
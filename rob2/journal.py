@@ -0,0 +1,235 @@
+"""Append-only run journal so an interrupted batch can resume without re-asking.
+
+Every answered question is recorded as soon as it arrives, with the output
+row and the domain ``state`` after the answer, keyed by the SHA-256 of the
+PDF, the domain and the model. Pass a :class:`RunJournal` to
+``AssessmentRunner(journal=...)``: on the next run each domain's ``state``
+and rows are rebuilt from the journal and the walk continues from
+``get_next_question(state)``, so nothing already paid for is asked again.
+Each answer also stores a hash of what was sent for it (prompt text,
+preamble, layout); answers whose hash no longer matches, and every answer
+after them on the domain's path, are asked again.
+
+Storage is SQLite in WAL mode with ``synchronous=NORMAL``. Records are
+buffered and committed every ``commit_every`` answers or ``commit_interval``
+seconds (a commit survives a crash or kernel restart); a background thread
+commits on that schedule even when no new answers arrive, and the WAL is
+checkpointed, which fsyncs it, at most every ``fsync_interval`` seconds (to
+survive power loss). Inspect a journal with::
+
+    python -m rob2.journal outputs/run_journal.sqlite
+"""
+
+import argparse
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Tuple, Union
+
+from .cache import connect, retry_locked
+from .common import Response
+
+DEFAULT_JOURNAL_PATH = Path(".rob2_cache") / "journal.sqlite"
+
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS answers (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    pdf_sha256 TEXT NOT NULL,
+    study TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    question_code TEXT NOT NULL,
+    model TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    row TEXT NOT NULL,
+    state TEXT NOT NULL,
+    created REAL NOT NULL,
+    prompt_hash TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS answers_study ON answers (pdf_sha256, domain, model);
+"""
+
+_Record = Tuple[str, str, str, str, str, str, str, str, float, str]
+
+
+@dataclass
+class Restored:
+    """Journaled progress of one (study, domain)."""
+
+    state: Dict[str, Response] = field(default_factory=dict)
+    rows: List[dict] = field(default_factory=list)
+
+
+class RunJournal:
+    """SQLite journal of answered questions with batched commits."""
+
+    def __init__(
+        self,
+        path: Union[str, Path] = DEFAULT_JOURNAL_PATH,
+        commit_every: int = 32,
+        commit_interval: float = 1.0,
+        fsync_interval: float = 10.0,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self.fsync_interval = fsync_interval
+        self.recorded = 0
+        self._pending: List[_Record] = []
+        self._last_commit = self._last_fsync = time.monotonic()
+        self._lock = threading.Lock()
+        self._conn = connect(self.path)
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA_SQL)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(answers)")}
+        if "prompt_hash" not in columns:
+            # Journals from before prompt hashes: their answers match no hash and are re-asked.
+            self._conn.execute("ALTER TABLE answers ADD COLUMN prompt_hash TEXT NOT NULL DEFAULT ''")
+            self._conn.commit()
+        self._closed = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        if commit_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_periodically, name="rob2-journal", daemon=True)
+            self._flusher.start()
+
+    def _flush_periodically(self) -> None:
+        # Buffered answers are committed on schedule even if the run stalls.
+        while not self._closed.wait(self.commit_interval):
+            with self._lock:
+                if self._closed.is_set():
+                    return
+                if self._pending or time.monotonic() - self._last_fsync >= self.fsync_interval:
+                    self._commit(time.monotonic())
+
+    def record(
+        self,
+        pdf_sha256: str,
+        study: str,
+        domain_key: str,
+        question_code: str,
+        model: str,
+        row: dict,
+        state: Dict[str, Response],
+        prompt_hash: str = "",
+    ) -> None:
+        """Queue one answered question together with the domain state after it."""
+        snapshot = json.dumps({code: value.value for code, value in state.items() if value is not None})
+        record = (
+            pdf_sha256,
+            study,
+            domain_key,
+            question_code,
+            model,
+            row.get("answer", ""),
+            json.dumps(row, ensure_ascii=False),
+            snapshot,
+            time.time(),
+            prompt_hash,
+        )
+        with self._lock:
+            self._pending.append(record)
+            self.recorded += 1
+            now = time.monotonic()
+            if len(self._pending) >= self.commit_every or now - self._last_commit >= self.commit_interval:
+                self._commit(now)
+
+    def _commit(self, now: float) -> None:
+        if self._pending:
+            retry_locked(self._conn, self._insert_pending)
+            self._pending.clear()
+        self._last_commit = now
+        if now - self._last_fsync >= self.fsync_interval:
+            self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+            self._last_fsync = now
+
+    def _insert_pending(self) -> None:
+        self._conn.executemany(
+            "INSERT INTO answers "
+            "(pdf_sha256, study, domain, question_code, model, answer, row, state, created, prompt_hash) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            self._pending,
+        )
+        self._conn.commit()
+
+    def flush(self) -> None:
+        """Commit queued records now."""
+        with self._lock:
+            self._commit(time.monotonic())
+
+    def restore(
+        self, pdf_sha256: str, domain_key: str, model: str, prompt_hashes: Optional[Mapping[str, str]] = None
+    ) -> Restored:
+        """Latest state and the rows of the questions on it for one study and domain.
+
+        With ``prompt_hashes`` (question code -> hash of what would be sent
+        now), the path is cut at the first answer recorded with a different
+        hash, so that question and everything after it are asked again.
+        """
+        self.flush()
+        with self._lock:
+            records = self._conn.execute(
+                "SELECT question_code, row, state, prompt_hash FROM answers "
+                "WHERE pdf_sha256 = ? AND domain = ? AND model = ? ORDER BY seq",
+                (pdf_sha256, domain_key, model),
+            ).fetchall()
+        if not records:
+            return Restored()
+        latest = json.loads(records[-1][2])
+        last: Dict[str, Tuple[int, str, str]] = {}
+        for seq, (code, row, _, prompt_hash) in enumerate(records):
+            last[code] = (seq, row, prompt_hash)
+        restored = Restored()
+        # Answers in the order they were given, which is the order of the path.
+        for code in sorted((c for c in latest if c in last), key=lambda c: last[c][0]):
+            _, row, prompt_hash = last[code]
+            if prompt_hashes is not None and prompt_hash != prompt_hashes.get(code):
+                break
+            restored.state[code] = Response(latest[code])
+            restored.rows.append(json.loads(row))
+        return restored
+
+    def reset(self, pdf_sha256: str, domain_key: str, model: str) -> None:
+        """Forget a study's domain, e.g. before re-asking it."""
+        with self._lock:
+            self._commit(time.monotonic())
+            self._conn.execute(
+                "DELETE FROM answers WHERE pdf_sha256 = ? AND domain = ? AND model = ?",
+                (pdf_sha256, domain_key, model),
+            )
+            self._conn.commit()
+
+    def summary(self) -> List[Tuple[str, str, str, int]]:
+        """``(study, domain, model, answers)`` for every journaled domain."""
+        self.flush()
+        with self._lock:
+            return self._conn.execute(
+                "SELECT study, domain, model, COUNT(DISTINCT question_code) FROM answers "
+                "GROUP BY pdf_sha256, domain, model ORDER BY study, domain"
+            ).fetchall()
+
+    def close(self) -> None:
+        if self._closed.is_set():
+            return
+        with self._lock:
+            self._closed.set()
+            self._commit(time.monotonic())
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m rob2.journal", description="Show journaled progress.")
+    parser.add_argument("path", type=Path, nargs="?", default=DEFAULT_JOURNAL_PATH)
+    args = parser.parse_args(argv)
+    if not args.path.exists():
+        raise SystemExit(f"No journal at {args.path}")
+    journal = RunJournal(args.path)
+    for study, domain, model, answers in journal.summary():
+        print(f"{study}\t{domain}\t{model}\t{answers}")
+    journal.close()
+
+
+if __name__ == "__main__":
+    main()
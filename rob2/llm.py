@@ -0,0 +1,288 @@
+"""Request helpers for answering signalling questions.
+
+These mirror ``generate_response_with_chatgpt`` from ``pdf_to_text.ipynb`` but
+take the client explicitly and return a parsed :class:`Answer`, so the same
+request shape can be used from the notebook, the async runner and scripts.
+
+Provider-neutral calls go through an :class:`~rob2.backends.LLMBackend`:
+:func:`complete`/:func:`acomplete` send an :class:`LLMRequest` under a
+rate limiter and return a :class:`Completion`, which the ``parse_*``
+helpers accept like a Responses API result.
+
+Provider-side prompt caching only discounts a request's longest prefix
+already seen, so with ``layout=PREFIX_LAYOUT`` requests are laid out as the
+shared :data:`ROB2_PREAMBLE`, then the document, then the question-specific
+prompt: every question about one study shares the preamble and PDF tokens
+as a cacheable prefix. ``QUESTION_FIRST_LAYOUT`` is the notebook's original
+order (prompt, then document).
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from .common import Response
+from .ratelimit import RateLimiter
+
+DEFAULT_MODEL = "gpt-4.1"
+
+PREFIX_LAYOUT = "prefix"
+QUESTION_FIRST_LAYOUT = "question_first"
+
+# Identical for every request, so it is part of the cached prefix; question
+# specifics belong in the prompt files, which are sent last.
+ROB2_PREAMBLE = (
+    "You are assisting with a Cochrane Risk of Bias 2 (RoB 2) assessment of a randomised trial. "
+    "The attached document is the trial report. Read all of it before answering.\n"
+    "After the document you will be given RoB 2 signalling questions with instructions. "
+    "Answer each from the document only, with Y (yes), PY (probably yes), PN (probably no), N (no) "
+    "or NI (no information) when the document does not report what is needed. "
+    "Justify each answer in a few sentences and give exact quotes from the document as citations. "
+    "Reply with JSON matching the requested schema."
+)
+
+# ROB2_PREAMBLE for runs with a retriever, where no document is attached and
+# each prompt carries excerpts instead (see rob2.rag.qa.CONTEXT_PREAMBLE).
+RETRIEVAL_PREAMBLE = (
+    "You are assisting with a Cochrane Risk of Bias 2 (RoB 2) assessment of a randomised trial.\n"
+    "You will be given RoB 2 signalling questions with instructions, each followed by excerpts retrieved "
+    "from the trial report. "
+    "Answer each from the excerpts only, with Y (yes), PY (probably yes), PN (probably no), N (no) "
+    "or NI (no information) when the excerpts do not report what is needed. "
+    "Justify each answer in a few sentences and give exact quotes from the excerpts as citations. "
+    "Reply with JSON matching the requested schema."
+)
+
+RESPONSE_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "answer": {"type": "string"},
+        "justification": {"type": "string"},
+        "citations": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["answer", "justification", "citations"],
+    "additionalProperties": False,
+}
+
+
+@dataclass
+class Answer:
+    """Parsed model answer for one signalling question."""
+
+    answer: str
+    justification: str = ""
+    citations: List[str] = field(default_factory=list)
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached: bool = False
+    # Input tokens the provider served from its prompt cache.
+    cached_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    def to_response(self) -> Response:
+        return Response(self.answer.strip())
+
+
+@dataclass
+class LLMRequest:
+    """One structured-output request, independent of the provider API.
+
+    ``metadata`` (study, domain, question codes) is not sent to providers;
+    backends such as :class:`~rob2.backends.MockBackend` may use it.
+    """
+
+    prompt: str
+    file_id: Optional[str] = None
+    model: str = DEFAULT_MODEL
+    schema: Dict[str, Any] = field(default_factory=lambda: RESPONSE_SCHEMA)
+    schema_name: str = "response_details"
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    # Sent first with ``PREFIX_LAYOUT``; see the module docstring.
+    preamble: Optional[str] = None
+    layout: str = QUESTION_FIRST_LAYOUT
+    # Routing hint for the provider's prompt cache (``prompt_cache_key``).
+    cache_key: Optional[str] = None
+
+
+@dataclass
+class Usage:
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+
+
+@dataclass
+class Completion:
+    """A backend's reply: the JSON text, token usage and any rate-limit headers."""
+
+    output_text: str
+    usage: Usage = field(default_factory=Usage)
+    headers: Optional[Mapping[str, str]] = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) used for budgeting."""
+    return len(text) // 4 + 1
+
+
+def layout_options(layout: str, preamble: str, sha256: str) -> Dict[str, Any]:
+    """``preamble``, ``layout`` and ``cache_key`` for a study's requests.
+
+    Shared by the runner and the Batch API pipeline so both send the same
+    prefix. The cache key routes a study's requests to the same prompt-cache
+    shard; ``QUESTION_FIRST_LAYOUT`` sends neither a preamble nor a key.
+    """
+    prefix = layout == PREFIX_LAYOUT
+    return {
+        "preamble": preamble if prefix else None,
+        "layout": layout,
+        "cache_key": f"rob2-{sha256[:32]}" if prefix else None,
+    }
+
+
+def build_request(
+    prompt: str,
+    file_id: Optional[str],
+    model: str = DEFAULT_MODEL,
+    schema: Dict[str, Any] = RESPONSE_SCHEMA,
+    schema_name: str = "response_details",
+    preamble: Optional[str] = None,
+    layout: str = QUESTION_FIRST_LAYOUT,
+    cache_key: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Keyword arguments for ``client.responses.create``.
+
+    ``file_id=None`` sends the prompt alone, e.g. when it already carries
+    retrieved excerpts of the document. ``preamble`` goes first as a system
+    message and ``layout`` places the document before (``PREFIX_LAYOUT``) or
+    after (``QUESTION_FIRST_LAYOUT``) the prompt.
+    """
+    content = [{"type": "input_text", "text": prompt}]
+    if file_id is not None:
+        document = {"type": "input_file", "file_id": file_id}
+        if layout == PREFIX_LAYOUT:
+            content.insert(0, document)
+        else:
+            content.append(document)
+    messages = [{"role": "user", "content": content}]
+    if preamble:
+        messages.insert(0, {"role": "system", "content": preamble})
+    request = {
+        "model": model,
+        "input": messages,
+        "text": {
+            "format": {
+                "type": "json_schema",
+                "name": schema_name,
+                "schema": schema,
+                "strict": True,
+            }
+        },
+    }
+    if cache_key:
+        request["prompt_cache_key"] = cache_key
+    return request
+
+
+def usage_tokens(response) -> Tuple[int, int]:
+    """``(input_tokens, output_tokens)`` reported by a response, zeros if absent."""
+    usage = getattr(response, "usage", None)
+    return (getattr(usage, "input_tokens", 0) or 0, getattr(usage, "output_tokens", 0) or 0)
+
+
+def cached_tokens(response) -> int:
+    """Input tokens served from the provider's prompt cache, from a Responses, Chat or :class:`Completion` usage."""
+    usage = getattr(response, "usage", None)
+    cached = getattr(usage, "cached_tokens", None)
+    if cached is None:
+        details = getattr(usage, "input_tokens_details", None) or getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", 0)
+    return cached or 0
+
+
+def parse_answer(payload: Dict[str, Any]) -> Answer:
+    citations = payload.get("citations", [])
+    return Answer(
+        answer=payload.get("answer", ""),
+        justification=payload.get("justification", ""),
+        citations=list(citations) if isinstance(citations, list) else [str(citations)],
+    )
+
+
+def parse_response(response) -> Answer:
+    """Turn a Responses API result into an :class:`Answer`."""
+    answer = parse_answer(json.loads(response.output_text))
+    answer.input_tokens, answer.output_tokens = usage_tokens(response)
+    answer.cached_tokens = cached_tokens(response)
+    return answer
+
+
+def create_response(client, request: Dict[str, Any], limiter: Optional[RateLimiter] = None, tokens: int = 0):
+    """Blocking ``client.responses.create(**request)``.
+
+    With a ``limiter`` the call waits for request/token budget, retries
+    transient failures and reconciles the ``tokens`` estimate with real usage.
+    """
+    if limiter is None:
+        return client.responses.create(**request)
+    response = limiter.call_sync(client.responses.with_raw_response.create, tokens=tokens, **request)
+    limiter.reconcile(tokens, sum(usage_tokens(response)))
+    return response
+
+
+async def acreate_response(client, request: Dict[str, Any], limiter: Optional[RateLimiter] = None, tokens: int = 0):
+    """Async counterpart of :func:`create_response` for ``openai.AsyncOpenAI``."""
+    if limiter is None:
+        return await client.responses.create(**request)
+    response = await limiter.call(client.responses.with_raw_response.create, tokens=tokens, **request)
+    limiter.reconcile(tokens, sum(usage_tokens(response)))
+    return response
+
+
+def complete(backend, request: LLMRequest, limiter: Optional[RateLimiter] = None, tokens: int = 0) -> Completion:
+    """Blocking ``backend.complete(request)``, under ``limiter`` when given."""
+    if limiter is None:
+        return backend.complete(request)
+    completion = limiter.call_sync(backend.complete, request, tokens=tokens)
+    limiter.reconcile(tokens, sum(usage_tokens(completion)))
+    return completion
+
+
+async def acomplete(backend, request: LLMRequest, limiter: Optional[RateLimiter] = None, tokens: int = 0) -> Completion:
+    """Async counterpart of :func:`complete`."""
+    if limiter is None:
+        return await backend.acomplete(request)
+    completion = await limiter.call(backend.acomplete, request, tokens=tokens)
+    limiter.reconcile(tokens, sum(usage_tokens(completion)))
+    return completion
+
+
+def generate_response_with_chatgpt(
+    client,
+    prompt: str,
+    file_id: Optional[str],
+    model: str = DEFAULT_MODEL,
+    limiter: Optional[RateLimiter] = None,
+    tokens: int = 0,
+) -> Answer:
+    """Ask one signalling question with a blocking ``openai.OpenAI`` client or any backend."""
+    from .backends import as_backend
+
+    return parse_response(complete(as_backend(client), LLMRequest(prompt, file_id, model), limiter, tokens))
+
+
+async def agenerate_response(
+    client,
+    prompt: str,
+    file_id: Optional[str],
+    model: str = DEFAULT_MODEL,
+    limiter: Optional[RateLimiter] = None,
+    tokens: int = 0,
+) -> Answer:
+    """Ask one signalling question with an ``openai.AsyncOpenAI`` client or any backend."""
+    from .backends import as_backend
+
+    return parse_response(await acomplete(as_backend(client), LLMRequest(prompt, file_id, model), limiter, tokens))
@@ -0,0 +1,102 @@
+"""Overall RoB 2 judgement from the domain judgements of one result.
+
+RoB 2 rates a result at low risk overall only if every domain is at low
+risk, at high risk if any domain is, and with some concerns otherwise,
+except that some concerns in several domains may lower confidence enough
+to count as high risk. How many domains that takes is left to the review
+team, so it is the ``some_concerns_threshold`` parameter here (``None``
+switches the rule off).
+
+:func:`overall_many` applies the algorithm to whole review matrices of
+judgement codes, such as the output of ``rob2.domains.evaluate_many``, and
+returns code arrays; :func:`overall_judgement` wraps a single study's
+``DomainResult``s in an :class:`OverallResult`.
+"""
+
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple, Union
+
+import numpy as np
+
+from .common import JUDGEMENT_CODE, JUDGEMENTS, DomainResult
+
+OVERALL_TITLE = "Overall"
+
+DEFAULT_SOME_CONCERNS_THRESHOLD = 3
+
+# Rule IDs returned alongside overall judgement codes.
+ALL_LOW, SOME_CONCERNS, HIGH_DOMAIN, MULTIPLE_SOME_CONCERNS = range(4)
+OVERALL_RULES: Tuple[str, ...] = (
+    "All domains at low risk → Low risk.",
+    "Some concerns in at least one domain, no domain at high risk → Some concerns.",
+    "At least one domain at high risk → High risk.",
+    "Some concerns in {threshold} or more domains substantially lower confidence → High risk.",
+)
+_RULE_JUDGEMENT = np.array([0, 1, 2, 2], dtype=np.uint8)
+
+_EXPLANATIONS = {
+    ALL_LOW: "The result is at low risk of bias for all domains.",
+    SOME_CONCERNS: "The result raises some concerns in at least one domain but is not at high risk in any.",
+    HIGH_DOMAIN: "The result is at high risk of bias in at least one domain.",
+    MULTIPLE_SOME_CONCERNS: "Some concerns in multiple domains substantially lower confidence in the result.",
+}
+
+
+class OverallResult(DomainResult):
+    def __init__(self, judgement, explanation, path):
+        super().__init__(OVERALL_TITLE, judgement, explanation, path)
+
+
+def _judgement_matrix(judgements: Any) -> np.ndarray:
+    if isinstance(judgements, Mapping):
+        columns = [value[0] if isinstance(value, tuple) else value for value in judgements.values()]
+        if not columns:
+            raise ValueError("No domain judgements given")
+        judgements = np.column_stack([np.asarray(column) for column in columns])
+    matrix = np.asarray(judgements)
+    if matrix.ndim != 2:
+        raise ValueError(f"Expected a rows x domains matrix of judgement codes, got shape {matrix.shape}")
+    if matrix.size and (matrix.min() < 0 or matrix.max() >= len(JUDGEMENTS)):
+        raise ValueError(f"Judgement codes must be in 0..{len(JUDGEMENTS) - 1}")
+    return matrix
+
+
+def overall_many(
+    judgements: Union[np.ndarray, Mapping[str, Any]],
+    some_concerns_threshold: Optional[int] = DEFAULT_SOME_CONCERNS_THRESHOLD,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Overall judgement codes and rule IDs for every row.
+
+    ``judgements`` is a rows x domains matrix of codes indexing
+    ``rob2.common.JUDGEMENTS``, or a mapping of domain key to code array (or
+    to the ``(judgement_codes, result_ids)`` pairs ``rob2.domains.evaluate_many``
+    returns). Pass only the Domain 2 variant that applies. Rule IDs index
+    :data:`OVERALL_RULES`.
+    """
+    matrix = _judgement_matrix(judgements)
+    high = (matrix == JUDGEMENT_CODE["High"]).any(axis=1)
+    concerns = (matrix == JUDGEMENT_CODE["Some concerns"]).sum(axis=1)
+    rules = np.where(concerns > 0, SOME_CONCERNS, ALL_LOW).astype(np.uint8)
+    if some_concerns_threshold is not None:
+        rules[concerns >= some_concerns_threshold] = MULTIPLE_SOME_CONCERNS
+    rules[high] = HIGH_DOMAIN
+    return _RULE_JUDGEMENT[rules], rules
+
+
+def overall_judgement(
+    results: Union[Mapping[str, DomainResult], Iterable[DomainResult]],
+    some_concerns_threshold: Optional[int] = DEFAULT_SOME_CONCERNS_THRESHOLD,
+) -> OverallResult:
+    """Combine one study's domain results into the overall judgement."""
+    results = list(results.values()) if isinstance(results, Mapping) else list(results)
+    codes = np.array([[JUDGEMENT_CODE[result.judgement] for result in results]], dtype=np.uint8)
+    _, rules = overall_many(codes, some_concerns_threshold)
+    rule = int(rules[0])
+    path = [f"{result.domain_name}: {result.judgement}" for result in results]
+    path.append(OVERALL_RULES[rule].format(threshold=some_concerns_threshold))
+    return OverallResult(JUDGEMENTS[_RULE_JUDGEMENT[rule]], _EXPLANATIONS[rule], path)
+
+
+def judgement_counts(codes: np.ndarray) -> Dict[str, int]:
+    """How many rows received each judgement."""
+    counts = np.bincount(np.asarray(codes, dtype=np.int64), minlength=len(JUDGEMENTS))
+    return {judgement: int(count) for judgement, count in zip(JUDGEMENTS, counts)}
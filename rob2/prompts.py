@@ -0,0 +1,188 @@
+"""Prompt discovery for RoB signalling questions.
+
+Prompt files live under ``prompts/domain_<n>[_<variant>]/question_<m>.txt``.
+The folder name maps to a registry key in ``rob2.domains`` and the file name to
+the signalling question code (``question_3.txt`` in ``domain_4_measurement`` is
+question ``4.3``).
+
+:class:`PromptManifest` reads every prompt once, checks the question codes
+against each domain's ``DomainSpec.questions`` and then serves prompt text
+from memory. It can be saved as JSON and shipped to worker processes, which
+then never glob or read ``prompts/``::
+
+    python -m rob2.prompts build -o prompt_manifest.json
+"""
+
+import argparse
+import json
+import re
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Union
+
+PROMPTS_DIR = Path(__file__).resolve().parent.parent / "prompts"
+
+_DOMAIN_DIR_RE = re.compile(r"^domain_?(\d+)(?:_(.+))?$")
+
+
+def discover_prompt_files(root: Union[str, Path] = PROMPTS_DIR) -> Dict[str, Dict[str, Path]]:
+    """Map domain key -> question code -> prompt file path, sorted for stable output."""
+    found: Dict[str, Dict[str, Path]] = defaultdict(dict)
+    for prompt_path in Path(root).rglob("question_*.txt"):
+        match = _DOMAIN_DIR_RE.match(prompt_path.parent.name)
+        if not match:
+            continue
+        domain_id, variant = match.groups()
+
+        stem_parts = prompt_path.stem.split("_")
+        qnum = stem_parts[1] if len(stem_parts) > 1 else "unknown"
+        question_code = f"{domain_id}.{qnum}"
+
+        domain_key = f"domain_{domain_id}" if not variant else f"domain_{domain_id}_{variant}"
+        found[domain_key][question_code] = prompt_path
+
+    return {
+        domain: {code: path for code, path in sorted(questions.items())}
+        for domain, questions in sorted(found.items())
+    }
+
+
+def load_prompt(prompt_files: Mapping[str, Mapping[str, Path]], domain_key: str, question_code: str) -> str:
+    """Return the prompt text for a question, raising if no prompt file exists."""
+    if isinstance(prompt_files, PromptManifest):
+        return prompt_files.text(domain_key, question_code)
+    prompt_path = prompt_files.get(domain_key, {}).get(question_code)
+    if prompt_path is None or not Path(prompt_path).exists():
+        raise FileNotFoundError(f"No prompt file for {domain_key} question {question_code}")
+    return Path(prompt_path).read_text(encoding="utf-8")
+
+
+class PromptManifest(Mapping):
+    """In-memory prompt texts, usable wherever a ``prompt_files`` mapping is.
+
+    Maps domain key -> question code -> source path like
+    :func:`discover_prompt_files`; :meth:`text` (and :func:`load_prompt`)
+    return the text loaded when the manifest was built.
+    """
+
+    def __init__(self, texts: Dict[str, Dict[str, str]], paths: Dict[str, Dict[str, Path]]):
+        self.texts = texts
+        self.paths = paths
+
+    @classmethod
+    def build(cls, root: Union[str, Path] = PROMPTS_DIR) -> "PromptManifest":
+        paths = discover_prompt_files(root)
+        texts = {
+            domain: {code: path.read_text(encoding="utf-8") for code, path in questions.items()}
+            for domain, questions in paths.items()
+        }
+        return cls(texts, paths)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "PromptManifest":
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        texts = {domain: {code: entry["text"] for code, entry in questions.items()} for domain, questions in data.items()}
+        paths = {
+            domain: {code: Path(entry["path"]) for code, entry in questions.items()}
+            for domain, questions in data.items()
+        }
+        return cls(texts, paths)
+
+    def save(self, path: Union[str, Path]) -> Path:
+        path = Path(path)
+        data = {
+            domain: {code: {"path": str(self.paths[domain][code]), "text": text} for code, text in questions.items()}
+            for domain, questions in self.texts.items()
+        }
+        path.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding="utf-8")
+        return path
+
+    def __getitem__(self, domain_key: str) -> Dict[str, Path]:
+        return self.paths[domain_key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.paths)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def text(self, domain_key: str, question_code: str) -> str:
+        try:
+            return self.texts[domain_key][question_code]
+        except KeyError:
+            raise FileNotFoundError(f"No prompt file for {domain_key} question {question_code}") from None
+
+    def problems(self, specs) -> List[str]:
+        """Mismatches between prompt question codes and ``DomainSpec.questions``."""
+        found = []
+        for domain, questions in self.texts.items():
+            spec = specs.get(domain)
+            if spec is None:
+                found.append(f"{domain}: prompts exist but no domain is registered")
+                continue
+            missing = [code for code in spec.questions if code not in questions]
+            extra = [code for code in questions if code not in spec.questions]
+            if missing:
+                found.append(f"{domain}: no prompt for {', '.join(missing)}")
+            if extra:
+                found.append(f"{domain}: prompts for unknown questions {', '.join(extra)}")
+        return found
+
+    def validate(self, specs) -> "PromptManifest":
+        problems = self.problems(specs)
+        if problems:
+            raise ValueError("Prompt manifest does not match the domain specs:\n" + "\n".join(problems))
+        return self
+
+
+_MANIFESTS: Dict[str, PromptManifest] = {}
+_LOCK = threading.Lock()
+
+
+def get_prompt_manifest(source: Optional[Union[str, Path]] = None) -> PromptManifest:
+    """Validated manifest, built once per process.
+
+    ``source`` is a prompts directory (default :data:`PROMPTS_DIR`) or a JSON
+    file written by :meth:`PromptManifest.save`.
+    """
+    from .domains import get_domain_specs
+
+    source = Path(source) if source is not None else PROMPTS_DIR
+    key = str(source.resolve())
+    with _LOCK:
+        manifest = _MANIFESTS.get(key)
+        if manifest is None:
+            manifest = PromptManifest.load(source) if source.is_file() else PromptManifest.build(source)
+            manifest = _MANIFESTS[key] = manifest.validate(get_domain_specs())
+    return manifest
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from .domains import get_domain_specs
+
+    parser = argparse.ArgumentParser(prog="python -m rob2.prompts", description="Build or check the prompt manifest.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="write prompt texts to a JSON manifest")
+    build.add_argument("--root", type=Path, default=PROMPTS_DIR)
+    build.add_argument("-o", "--output", type=Path, default=Path("prompt_manifest.json"))
+    check = sub.add_parser("check", help="validate prompts against the domain specs")
+    check.add_argument("source", type=Path, nargs="?", default=PROMPTS_DIR, help="prompts directory or manifest")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        manifest = PromptManifest.build(args.root).validate(get_domain_specs())
+        print(f"Wrote {sum(len(q) for q in manifest.texts.values())} prompts to {manifest.save(args.output)}")
+        return
+    source = args.source
+    manifest = PromptManifest.load(source) if source.is_file() else PromptManifest.build(source)
+    problems = manifest.problems(get_domain_specs())
+    for problem in problems:
+        print(problem)
+    if problems:
+        raise SystemExit(1)
+    print(f"{len(manifest)} domains, {sum(len(q) for q in manifest.texts.values())} prompts match the domain specs.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Retrieval (chunking, embeddings, vector index) for RoB 2 study PDFs.
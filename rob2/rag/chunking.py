@@ -0,0 +1,141 @@
+"""PDF loading and paragraph-aware chunking, moved from ``RAG.ipynb``.
+
+Everything is a generator underneath (pages -> paragraphs -> chunks), so
+memory stays flat however long the PDF; the list-returning functions are
+kept for notebook use.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+CHUNK_MIN_WORDS = 150
+CHUNK_MAX_WORDS = 250
+
+
+def iter_paragraphs(text: str) -> Iterator[str]:
+    """Yield blank-line separated paragraphs with their lines joined."""
+    buffer: List[str] = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            buffer.append(line)
+        elif buffer:
+            yield " ".join(buffer)
+            buffer = []
+    if buffer:
+        yield " ".join(buffer)
+
+
+def _split_long_paragraph(words: List[str], min_words: int, max_words: int) -> List[str]:
+    chunks: List[List[str]] = []
+    idx = 0
+    n = len(words)
+    while idx < n:
+        remaining = n - idx
+        if remaining > max_words:
+            take = max_words
+        elif remaining < min_words and chunks:
+            chunks[-1].extend(words[idx:])
+            break
+        else:
+            take = remaining
+        chunks.append(words[idx:idx + take])
+        idx += take
+    return [" ".join(chunk) for chunk in chunks]
+
+
+def _raw_chunks(text: str, min_words: int, max_words: int) -> Iterator[Tuple[str, bool]]:
+    """Chunks before the final merge; the flag marks a short trailing remainder."""
+    current: List[str] = []
+    current_words = 0
+    for para in iter_paragraphs(text):
+        words = para.split()
+        wcount = len(words)
+
+        if wcount > max_words:
+            if current:
+                yield " ".join(current), False
+                current, current_words = [], 0
+            for chunk in _split_long_paragraph(words, min_words, max_words):
+                yield chunk, False
+            continue
+
+        if not current:
+            current = [para]
+            current_words = wcount
+            continue
+
+        if current_words + wcount <= max_words:
+            current.append(para)
+            current_words += wcount
+            continue
+
+        if current_words < min_words:
+            current.append(para)
+            yield " ".join(current), False
+            current, current_words = [], 0
+        else:
+            yield " ".join(current), False
+            current = [para]
+            current_words = wcount
+
+    if current_words:
+        yield " ".join(current), current_words < min_words
+
+
+def iter_chunks(text: str, min_words: int = CHUNK_MIN_WORDS, max_words: int = CHUNK_MAX_WORDS) -> Iterator[str]:
+    """Chunk text by paragraph, keeping boundaries; merge or split to stay within word limits.
+
+    Holds back one chunk so a short final remainder can be merged into it.
+    """
+    if max_words <= 0 or min_words <= 0 or min_words > max_words:
+        raise ValueError("Invalid min/max word configuration.")
+
+    previous: Optional[str] = None
+    for chunk, short_tail in _raw_chunks(text, min_words, max_words):
+        if short_tail and previous is not None:
+            previous = previous + " " + chunk
+            continue
+        if previous is not None:
+            yield previous
+        previous = chunk
+    if previous is not None:
+        yield previous
+
+
+def chunk_text(text: str, min_words: int = CHUNK_MIN_WORDS, max_words: int = CHUNK_MAX_WORDS) -> List[str]:
+    """List form of :func:`iter_chunks`."""
+    return list(iter_chunks(text, min_words, max_words))
+
+
+def iter_pdf_pages(pdf_path: str) -> Iterator[Dict[str, Any]]:
+    """Yield page-level text from a PDF, one page in memory at a time."""
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(pdf_path)
+    try:
+        for page in doc:
+            text = page.get_text("text") or ""
+            yield {"page": page.number + 1, "text": text.strip()}
+    finally:
+        doc.close()
+
+
+def load_pdf(pdf_path: str) -> List[Dict[str, Any]]:
+    """Extract page-level text from a PDF."""
+    return list(iter_pdf_pages(pdf_path))
+
+
+def iter_documents(pages: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Chunk each page and tag chunks with ``p<page>_c<index>`` ids."""
+    for page in pages:
+        for idx, chunk in enumerate(iter_chunks(page["text"])):
+            yield {
+                "id": f"p{page['page']}_c{idx}",
+                "page": page["page"],
+                "text": chunk,
+            }
+
+
+def build_documents(pages: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """List form of :func:`iter_documents`."""
+    return list(iter_documents(pages))
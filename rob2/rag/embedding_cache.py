@@ -0,0 +1,189 @@
+"""Persistent embedding cache keyed by model and text hash.
+
+Vectors for one model live in an append-only float32 file
+(``vectors.f32``) that is read through ``numpy.memmap``; a SQLite offset
+index maps ``sha256(text)`` to a row. Wrap any embedding function with
+:meth:`EmbeddingCache.wrap` and only texts never seen before reach the API,
+so re-indexing after a chunking change embeds just the chunks that changed,
+and retrieval queries are embedded once. Precompute the signalling-question
+queries with::
+
+    python -m rob2.rag.embedding_cache questions
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from .embeddings import EMBED_MODEL, EmbedFn
+
+DEFAULT_EMBED_CACHE_DIR = Path(".rob2_cache") / "embeddings"
+
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS vectors (
+    sha256 TEXT PRIMARY KEY,
+    row INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Memory-mapped float32 vectors for one embedding model."""
+
+    def __init__(self, root: Union[str, Path] = DEFAULT_EMBED_CACHE_DIR, model: str = EMBED_MODEL):
+        self.model = model
+        self.path = Path(root) / re.sub(r"[^A-Za-z0-9._-]", "_", model)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path / "index.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA_SQL)
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        self.dim: Optional[int] = int(row[0]) if row else None
+        self.rows = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+        self._view: Optional[np.memmap] = None
+        # Vectors are appended before their offsets are committed; drop any
+        # tail written by an interrupted put.
+        if self.vectors_path.exists() and self.dim:
+            size = self.rows * self.dim * 4
+            if self.vectors_path.stat().st_size > size:
+                os.truncate(self.vectors_path, size)
+
+    @property
+    def vectors_path(self) -> Path:
+        return self.path / "vectors.f32"
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def _vectors(self) -> np.memmap:
+        if self._view is None or len(self._view) < self.rows:
+            self._view = np.memmap(self.vectors_path, dtype="float32", mode="r", shape=(self.rows, self.dim))
+        return self._view
+
+    def _rows(self, hashes: Sequence[str]) -> Dict[str, int]:
+        found: Dict[str, int] = {}
+        unique = list(dict.fromkeys(hashes))
+        for start in range(0, len(unique), 500):
+            part = unique[start:start + 500]
+            marks = ",".join("?" * len(part))
+            found.update(self._conn.execute(f"SELECT sha256, row FROM vectors WHERE sha256 IN ({marks})", part))
+        return found
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Cached vector per text, ``None`` for misses."""
+        hashes = [text_hash(text) for text in texts]
+        with self._lock:
+            rows = self._rows(hashes)
+            if not rows:
+                return [None] * len(texts)
+            view = self._vectors()
+            return [np.array(view[rows[h]]) if h in rows else None for h in hashes]
+
+    def put_many(self, texts: Sequence[str], vectors: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('dim', ?)", (str(self.dim),))
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"{self.model} vectors have dimension {self.dim}, got {vectors.shape[1]}")
+            known = self._rows([text_hash(text) for text in texts])
+            new: Dict[str, int] = {}
+            for n, text in enumerate(texts):
+                h = text_hash(text)
+                if h not in known and h not in new:
+                    new[h] = n
+            if not new:
+                return
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors[list(new.values())].tobytes())
+            self._conn.executemany(
+                "INSERT INTO vectors VALUES (?, ?)", [(h, self.rows + i) for i, h in enumerate(new)]
+            )
+            self._conn.commit()
+            self.rows += len(new)
+
+    def embed(self, texts: Sequence[str], embed: EmbedFn) -> np.ndarray:
+        """Vectors for ``texts``, calling ``embed`` only for uncached distinct texts."""
+        vectors = self.get_many(texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        self.hits += len(texts) - sum(vector is None for vector in vectors)
+        self.misses += len(missing)
+        if missing:
+            fresh = embed(missing)
+            self.put_many(missing, fresh)
+            by_text = dict(zip(missing, fresh))
+            vectors = [by_text[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        if not vectors:
+            return np.zeros((0, self.dim or 0), dtype="float32")
+        return np.vstack(vectors).astype("float32", copy=False)
+
+    def wrap(self, embed: EmbedFn) -> EmbedFn:
+        """``embed`` with this cache in front of it."""
+        return lambda texts: self.embed(texts, embed)
+
+    def stats(self) -> Dict[str, int]:
+        size = self.vectors_path.stat().st_size if self.vectors_path.exists() else 0
+        return {"vectors": self.rows, "dim": self.dim or 0, "bytes": size, "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            self._view = None
+            self._conn.close()
+
+
+def precompute_questions(cache: EmbeddingCache, embed: EmbedFn, specs=None) -> int:
+    """Embed every signalling-question retrieval query; returns how many were new."""
+    from ..domains import get_domain_specs
+    from .qa import question_query
+
+    specs = specs if specs is not None else get_domain_specs()
+    queries = [question_query(spec, code) for spec in specs.values() for code in spec.questions]
+    before = cache.misses
+    cache.embed(queries, embed)
+    return cache.misses - before
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m rob2.rag.embedding_cache", description="Manage cached embeddings.")
+    parser.add_argument("--root", type=Path, default=DEFAULT_EMBED_CACHE_DIR)
+    parser.add_argument("--model", default=EMBED_MODEL)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("questions", help="precompute signalling-question query embeddings")
+    sub.add_parser("stats", help="show cache size")
+    args = parser.parse_args(argv)
+
+    cache = EmbeddingCache(args.root, args.model)
+    if args.command == "stats":
+        print(cache.stats())
+        return
+
+    from openai import OpenAI
+
+    from .embeddings import embed_texts
+
+    client = OpenAI()
+    added = precompute_questions(cache, lambda texts: embed_texts(client, texts, args.model))
+    print(f"Embedded {added} new question queries; {len(cache)} vectors cached.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""OpenAI embedding calls for chunks and queries.
+
+:func:`embed_texts` sends one request. For whole documents use
+:func:`iter_batches` to cut the chunk stream into requests that fit the
+provider's input limits and :func:`embed_batches` to run a bounded number of
+them concurrently, in order.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ..llm import estimate_tokens
+from ..ratelimit import RateLimiter
+
+EMBED_MODEL = "text-embedding-3-small"
+
+EmbedFn = Callable[[List[str]], np.ndarray]
+
+# Per-request limits of the embeddings endpoint are 300k tokens and 2048
+# inputs; smaller batches give the concurrent pipeline something to overlap.
+EMBED_BATCH_TOKENS = 50_000
+EMBED_BATCH_ITEMS = 2048
+EMBED_CONCURRENCY = 4
+
+
+def embed_texts(
+    client,
+    texts: List[str],
+    model: str = EMBED_MODEL,
+    limiter: Optional[RateLimiter] = None,
+) -> np.ndarray:
+    """Embed ``texts`` in one request and return a float32 ``(n, dim)`` array."""
+    if limiter is None:
+        response = client.embeddings.create(model=model, input=texts)
+    else:
+        tokens = sum(estimate_tokens(text) for text in texts)
+        response = limiter.call_sync(client.embeddings.with_raw_response.create, model=model, input=texts, tokens=tokens)
+        limiter.reconcile(tokens, response.usage.total_tokens)
+    return np.array([item.embedding for item in response.data], dtype="float32")
+
+
+def iter_batches(
+    documents: Iterable[Dict[str, Any]],
+    max_tokens: int = EMBED_BATCH_TOKENS,
+    max_items: int = EMBED_BATCH_ITEMS,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Group documents into batches of at most ``max_tokens`` (estimated) and ``max_items``."""
+    batch: List[Dict[str, Any]] = []
+    tokens = 0
+    for doc in documents:
+        doc_tokens = estimate_tokens(doc["text"])
+        if batch and (tokens + doc_tokens > max_tokens or len(batch) >= max_items):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(doc)
+        tokens += doc_tokens
+    if batch:
+        yield batch
+
+
+def embed_batches(
+    batches: Iterable[List[Dict[str, Any]]],
+    embed: EmbedFn,
+    concurrency: int = EMBED_CONCURRENCY,
+) -> Iterator[Tuple[List[Dict[str, Any]], np.ndarray]]:
+    """Yield ``(batch, vectors)`` in input order, embedding up to ``concurrency`` batches at once.
+
+    Batches are pulled from ``batches`` only as slots free up, so at most
+    ``concurrency`` of them are held in memory.
+    """
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        in_flight: deque = deque()
+        for batch in batches:
+            in_flight.append((batch, pool.submit(embed, [doc["text"] for doc in batch])))
+            if len(in_flight) >= concurrency:
+                done, future = in_flight.popleft()
+                yield done, future.result()
+        while in_flight:
+            done, future = in_flight.popleft()
+            yield done, future.result()
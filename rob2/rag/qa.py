@@ -0,0 +1,115 @@
+"""Retrieval-augmented answering: send each question only the chunks it needs.
+
+Instead of attaching the whole PDF to every request, each signalling question
+is turned into a retrieval query (its question text plus domain-specific
+hints such as CONSORT flow wording for missing data or masking wording for
+outcome measurement), the top-k chunks of that study are pulled from a
+:class:`~rob2.rag.store.CorpusIndex`, and the existing prompt file is sent
+with those excerpts as plain text under the same strict JSON schema.
+
+Pass a :class:`Retriever` to ``AssessmentRunner(retriever=...)``; the runner
+ingests the studies and embeds the queries before asking anything.
+"""
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from ..common import DomainSpec
+from .embeddings import EmbedFn
+
+if TYPE_CHECKING:
+    from .store import CorpusIndex
+
+DEFAULT_TOP_K = 6
+
+# Extra retrieval terms per domain; question texts alone rarely use the
+# vocabulary trial reports use for the same facts.
+QUERY_HINTS: Dict[str, str] = {
+    "domain_1_randomization": "random sequence generation, allocation concealment, baseline characteristics",
+    "domain_2_assigment": (
+        "blinding of participants and personnel, deviations from intended intervention, intention-to-treat analysis"
+    ),
+    "domain_2_adhering": "adherence, compliance, co-interventions, per-protocol analysis, implementation failure",
+    "domain_3_missing_data": (
+        "CONSORT flow diagram, participants randomised and analysed, lost to follow-up, withdrawals, missing data"
+    ),
+    "domain_4_measurement": "outcome measurement, blinding of outcome assessors, assessor masking",
+    "domain_5_reporting": "trial registration, protocol, pre-specified statistical analysis plan, outcomes reported",
+}
+
+CONTEXT_PREAMBLE = (
+    "The trial report is not attached. The numbered excerpts below were retrieved from it and are the only "
+    "parts of the document available to you. Treat them as \"the provided document\". If they do not contain "
+    "the information needed, answer NI. Citations must be exact quotes from the excerpts.\n"
+)
+
+
+def question_query(spec: DomainSpec, question_code: str, hints: Dict[str, str] = QUERY_HINTS) -> str:
+    """Retrieval query for one signalling question: its text plus the domain's hints."""
+    return f"{spec.questions.get(question_code, '')} {hints.get(spec.key, '')}".strip()
+
+
+def format_context(hits: List[dict]) -> str:
+    """Number the retrieved chunks and tag each with its page."""
+    return "\n\n".join(f"[{n}] (page {hit['page']}) {hit['text']}" for n, hit in enumerate(hits, 1))
+
+
+class Retriever:
+    """Per-question top-k retrieval over a corpus index.
+
+    Query embeddings are computed once per question and reused for every
+    study, so a run makes one embedding request for all queries plus the
+    embedding requests of studies not yet in the index.
+    """
+
+    def __init__(
+        self,
+        index: "CorpusIndex",
+        embed: EmbedFn,
+        k: int = DEFAULT_TOP_K,
+        hints: Dict[str, str] = QUERY_HINTS,
+    ):
+        self.index = index
+        self.embed = embed
+        self.k = k
+        self.hints = hints
+        self._queries: Dict[Tuple[str, str], np.ndarray] = {}
+
+    def query_text(self, spec: DomainSpec, question_code: str) -> str:
+        return question_query(spec, question_code, self.hints)
+
+    def prepare(self, pdf_paths: Iterable[Union[str, Path]], specs: Sequence[DomainSpec]) -> List[str]:
+        """Index new or changed studies and embed every question query.
+
+        Returns the names of studies that were (re)indexed.
+        """
+        updated = self.index.ingest(pdf_paths, self.embed)
+        missing = [(spec, code) for spec in specs for code in spec.questions if (spec.key, code) not in self._queries]
+        if missing:
+            vectors = self.embed([self.query_text(spec, code) for spec, code in missing])
+            for (spec, code), vector in zip(missing, vectors):
+                self._queries[(spec.key, code)] = vector
+        return updated
+
+    def _query(self, spec: DomainSpec, question_code: str) -> np.ndarray:
+        key = (spec.key, question_code)
+        if key not in self._queries:
+            self._queries[key] = self.embed([self.query_text(spec, question_code)])[0]
+        return self._queries[key]
+
+    def hits(self, study: str, spec: DomainSpec, question_codes: Sequence[str]) -> List[dict]:
+        """Top-k chunks of ``study`` for each question, merged and ordered by page."""
+        found: Dict[str, dict] = {}
+        for code in question_codes:
+            for hit in self.index.search(self._query(spec, code), self.k, study=study):
+                found.setdefault(hit["id"], hit)
+        if not found:
+            raise LookupError(f"{study} has no indexed text to retrieve from")
+        return sorted(found.values(), key=lambda hit: hit["page"] or 0)
+
+    def prompt(self, study: str, spec: DomainSpec, question_codes: Sequence[str], prompt_text: str) -> str:
+        """``prompt_text`` followed by the excerpts retrieved for ``question_codes``."""
+        context = format_context(self.hits(study, spec, question_codes))
+        return f"{prompt_text.rstrip()}\n\n{CONTEXT_PREAMBLE}\n{context}\n"
@@ -0,0 +1,537 @@
+"""FAISS vector stores for study chunks.
+
+:class:`FaissStore` is the single-document store from ``RAG.ipynb``.
+:class:`CorpusIndex` is a persistent, corpus-level index: vectors live in a
+FAISS index keyed by chunk id and chunk metadata lives in a SQLite side-store.
+PDFs are ingested incrementally by content hash, so adding one trial to a
+large library only embeds that trial, and a study's vectors can be deleted.
+
+Both stores take an :class:`IndexConfig` selecting the FAISS index type:
+exact ``flat-l2``/``flat-ip``, or approximate ``ivf-flat``, ``ivf-pq`` and
+``hnsw``. Every kind except ``flat-l2`` L2-normalises vectors and ranks by
+inner product, i.e. cosine similarity, which is what OpenAI embeddings are
+meant for. IVF kinds train on ingest: vectors are held in an exact index
+until ``min_train`` of them exist, then the IVF index is trained on all of
+them. ``benchmarks/bench_ann.py`` measures recall@k against latency.
+"""
+
+import json
+import math
+import sqlite3
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+try:
+    import faiss  # from faiss-cpu
+except ImportError as exc:
+    raise ImportError("faiss is missing. Install with `pip install faiss-cpu`.") from exc
+
+from ..cache import sha256_file
+from ..extract import ArtifactStore
+from .chunking import iter_documents, iter_pdf_pages
+from .embeddings import EMBED_BATCH_TOKENS, EMBED_CONCURRENCY, EmbedFn, embed_batches, iter_batches
+
+INDEX_KINDS = ("flat-l2", "flat-ip", "ivf-flat", "ivf-pq", "hnsw")
+
+_ID_MAPS = (faiss.IndexIDMap, faiss.IndexIDMap2)
+
+# Fields that can change without rebuilding an existing index.
+_RUNTIME_FIELDS = ("nprobe", "ef_search", "min_train")
+
+
+@dataclass
+class IndexConfig:
+    """Which FAISS index to build and how to search it."""
+
+    kind: str = "flat-ip"
+    nlist: int = 0  # IVF cells; 0 picks about 4*sqrt(n) when training
+    pq_m: int = 16  # IVF-PQ sub-quantisers, must divide the dimension
+    pq_bits: int = 8
+    hnsw_m: int = 32
+    ef_construction: int = 200
+    nprobe: int = 16  # IVF cells visited per query
+    ef_search: int = 64  # HNSW candidate list size per query
+    min_train: int = 10_000  # IVF kinds stay exact until this many vectors exist
+
+    def __post_init__(self):
+        if self.kind not in INDEX_KINDS:
+            raise ValueError(f"Unknown index kind {self.kind!r}; expected one of {', '.join(INDEX_KINDS)}")
+
+    @property
+    def metric(self) -> int:
+        return faiss.METRIC_L2 if self.kind == "flat-l2" else faiss.METRIC_INNER_PRODUCT
+
+    @property
+    def normalize(self) -> bool:
+        return self.kind != "flat-l2"
+
+    @property
+    def needs_training(self) -> bool:
+        return self.kind.startswith("ivf")
+
+    def structure(self) -> Dict[str, Any]:
+        """Fields baked into a built index."""
+        return {k: v for k, v in asdict(self).items() if k not in _RUNTIME_FIELDS}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IndexConfig":
+        return cls(**{k: v for k, v in data.items() if k in cls.__dataclass_fields__})
+
+
+def infer_config(index) -> IndexConfig:
+    """Best-effort :class:`IndexConfig` for an index saved without one."""
+    inner = faiss.downcast_index(index.index) if isinstance(index, _ID_MAPS) else index
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf = faiss.downcast_index(ivf)
+        kind = "ivf-pq" if isinstance(ivf, faiss.IndexIVFPQ) else "ivf-flat"
+        return IndexConfig(kind=kind, nlist=ivf.nlist, nprobe=ivf.nprobe)
+    if isinstance(inner, faiss.IndexHNSW):
+        return IndexConfig(kind="hnsw", ef_search=inner.hnsw.efSearch)
+    return IndexConfig(kind="flat-ip" if index.metric_type == faiss.METRIC_INNER_PRODUCT else "flat-l2")
+
+
+def prepare_vectors(vectors: np.ndarray, config: IndexConfig) -> np.ndarray:
+    """Contiguous float32 copy, L2-normalised for inner-product kinds."""
+    x = np.array(vectors, dtype="float32", order="C", copy=True)
+    if x.ndim == 1:
+        x = x.reshape(1, -1)
+    if config.normalize and len(x):
+        faiss.normalize_L2(x)
+    return x
+
+
+def make_index(config: IndexConfig, dim: int, n: int = 0):
+    """Empty index of ``config.kind``; IVF kinds still need ``train``.
+
+    Every kind supports ``add_with_ids`` and ``reconstruct`` by id: flat and
+    HNSW indexes are wrapped in ``IndexIDMap2``, IVF indexes keep a hash-table
+    direct map.
+    """
+    if config.kind in ("flat-l2", "flat-ip"):
+        return faiss.IndexIDMap2(faiss.IndexFlat(dim, config.metric))
+    if config.kind == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dim, config.hnsw_m, config.metric)
+        hnsw.hnsw.efConstruction = config.ef_construction
+        return faiss.IndexIDMap2(hnsw)
+    nlist = config.nlist or max(1, min(int(4 * math.sqrt(n)), n // 39))
+    quantizer = faiss.IndexFlat(dim, config.metric)
+    if config.kind == "ivf-flat":
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist, config.metric)
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, config.pq_m, config.pq_bits, config.metric)
+    index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    return index
+
+
+def is_staging(index, config: IndexConfig) -> bool:
+    """True while an IVF-configured index is still the exact pre-training index."""
+    return config.needs_training and faiss.try_extract_index_ivf(index) is None
+
+
+def set_search_params(index, config: IndexConfig) -> None:
+    """Apply ``nprobe``/``ef_search`` to whichever IVF or HNSW index ``index`` holds."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(config.nprobe, ivf.nlist)
+        return
+    inner = faiss.downcast_index(index.index) if isinstance(index, _ID_MAPS) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = config.ef_search
+
+
+def build_index(config: IndexConfig, vectors: np.ndarray, ids: np.ndarray):
+    """Fresh index holding prepared ``vectors`` under ``ids``.
+
+    IVF kinds are trained on ``vectors`` once there are ``min_train`` of them;
+    below that an exact index of the same metric is returned instead.
+    """
+    dim = vectors.shape[1]
+    if config.needs_training and len(vectors) < max(config.min_train, 1):
+        index = faiss.IndexIDMap2(faiss.IndexFlat(dim, config.metric))
+    else:
+        index = make_index(config, dim, len(vectors))
+        if not index.is_trained:
+            index.train(vectors)
+    set_search_params(index, config)
+    if len(vectors):
+        index.add_with_ids(vectors, np.asarray(ids, dtype="int64"))
+    return index
+
+
+def add_vectors(index, config: IndexConfig, vectors: np.ndarray, ids: np.ndarray):
+    """Add prepared ``vectors``; returns the index, which is replaced when IVF training kicks in."""
+    if index is not None and not (
+        is_staging(index, config) and index.ntotal + len(vectors) >= max(config.min_train, 1)
+    ):
+        index.add_with_ids(vectors, np.asarray(ids, dtype="int64"))
+        return index
+    if index is not None and index.ntotal:
+        held = index.index.reconstruct_n(0, index.ntotal)
+        vectors = np.vstack([held, vectors])
+        ids = np.concatenate([faiss.vector_to_array(index.id_map), ids])
+    return build_index(config, vectors, ids)
+
+
+def read_index(path: Union[str, Path], mmap: bool = False):
+    """Load an index; with ``mmap`` IVF inverted lists stay on disk, read-only."""
+    if mmap:
+        return faiss.read_index(str(path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    return faiss.read_index(str(path))
+
+
+class FaissStore:
+    def __init__(self, dim: int, config: Optional[IndexConfig] = None):
+        self.dim = dim
+        self.config = config or IndexConfig()
+        self.index = None
+        self.meta: List[Dict[str, Any]] = []
+
+    def add(self, embeddings: np.ndarray, metadatas: List[Dict[str, Any]]):
+        if embeddings.shape[0] != len(metadatas):
+            raise ValueError("Embeddings and metadata counts do not match.")
+        ids = np.arange(len(self.meta), len(self.meta) + len(metadatas), dtype="int64")
+        self.index = add_vectors(self.index, self.config, prepare_vectors(embeddings, self.config), ids)
+        self.meta.extend(metadatas)
+
+    def search(self, query_embedding: np.ndarray, k: int = 5) -> List[Dict[str, Any]]:
+        if self.index is None:
+            return []
+        query_embedding = prepare_vectors(query_embedding, self.config)
+        distances, indices = self.index.search(query_embedding, k)
+        results = []
+        for dist, idx in zip(distances[0], indices[0]):
+            if idx == -1:
+                continue
+            results.append({"score": float(dist), **self.meta[idx]})
+        return results
+
+    def save(self, index_path: str = "faiss.index", meta_path: str = "metadata.json"):
+        if self.index is not None:
+            faiss.write_index(self.index, index_path)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(
+        cls,
+        index_path: str = "faiss.index",
+        meta_path: str = "metadata.json",
+        config: Optional[IndexConfig] = None,
+        mmap: bool = False,
+    ) -> "FaissStore":
+        index = read_index(index_path, mmap)
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        store = cls(index.d, config or infer_config(index))
+        if not isinstance(index, _ID_MAPS) and faiss.try_extract_index_ivf(index) is None:
+            # Stores saved before index options existed hold a bare IndexFlatL2.
+            index = build_index(store.config, index.reconstruct_n(0, index.ntotal), np.arange(index.ntotal))
+        store.index = index
+        set_search_params(index, store.config)
+        store.meta = meta
+        return store
+
+
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS studies (
+    study TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    pdf_path TEXT,
+    chunks INTEGER NOT NULL,
+    added REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    study TEXT NOT NULL,
+    chunk TEXT NOT NULL,
+    page INTEGER,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_study ON chunks (study);
+CREATE TABLE IF NOT EXISTS stale (
+    id INTEGER PRIMARY KEY
+);
+"""
+
+
+class CorpusIndex:
+    """Incrementally maintained index over a library of study PDFs.
+
+    ``index_dir`` holds ``vectors.faiss`` (whose ids are the ``chunks.id``
+    primary keys), ``index.json`` (its :class:`IndexConfig`) and
+    ``meta.sqlite``. Passing a ``config`` whose structure differs from the
+    saved one rebuilds the index; ``nprobe``/``ef_search`` apply immediately.
+
+    HNSW cannot delete vectors, so deleted chunk ids go into the ``stale``
+    table, are skipped at search time and are compacted away by a rebuild once
+    they exceed ``stale_fraction`` of the index. With ``mmap=True`` the index is
+    opened read-only and IVF inverted lists are memory-mapped from disk.
+
+    With an ``artifacts`` store, PDFs are parsed in parallel into (or read
+    back from) cached page text instead of being re-parsed on every ingest.
+    """
+
+    def __init__(
+        self,
+        index_dir: Union[str, Path],
+        config: Optional[IndexConfig] = None,
+        mmap: bool = False,
+        stale_fraction: float = 0.2,
+        artifacts: Optional[ArtifactStore] = None,
+    ):
+        self.index_dir = Path(index_dir)
+        self.artifacts = artifacts
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.read_only = mmap
+        self.stale_fraction = stale_fraction
+        self._conn = sqlite3.connect(str(self.index_dir / "meta.sqlite"))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA_SQL)
+        self._stale = self._conn.execute("SELECT COUNT(*) FROM stale").fetchone()[0]
+        self.index = read_index(self.vectors_path, mmap) if self.vectors_path.exists() else None
+        saved = None
+        if self.config_path.exists():
+            saved = IndexConfig.from_dict(json.loads(self.config_path.read_text(encoding="utf-8")))
+        elif self.index is not None:
+            saved = infer_config(self.index)
+        self.config = config or saved or IndexConfig()
+        if self.index is None:
+            return
+        set_search_params(self.index, self.config)
+        if not self.read_only:
+            if saved is not None and self.config.structure() != saved.structure():
+                self.rebuild()
+            elif self._maintain():
+                self.commit()
+
+    @property
+    def vectors_path(self) -> Path:
+        return self.index_dir / "vectors.faiss"
+
+    @property
+    def config_path(self) -> Path:
+        return self.index_dir / "index.json"
+
+    def _check_writable(self) -> None:
+        if self.read_only:
+            raise RuntimeError(f"{self.index_dir} was opened with mmap=True and is read-only")
+
+    def _vectors(self, ids: List[int]) -> np.ndarray:
+        if isinstance(self.index, _ID_MAPS) and len(ids) > 1000:
+            stored = self.index.index.reconstruct_n(0, self.index.ntotal)
+            position = {int(i): n for n, i in enumerate(faiss.vector_to_array(self.index.id_map))}
+            return stored[[position[i] for i in ids]]
+        return np.vstack([self.index.reconstruct(int(i)) for i in ids])
+
+    def _maintain(self) -> bool:
+        """Rebuild in memory if the index needs it; returns whether it did."""
+        if self.index is None or self.read_only:
+            return False
+        live = self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        # Vectors are saved before metadata is committed, so an interrupted
+        # ingest can leave vectors whose chunk rows were rolled back.
+        orphans = self.index.ntotal != live + self._stale
+        compact = self._stale > self.stale_fraction * max(self.index.ntotal, 1)
+        train = is_staging(self.index, self.config) and live >= self.config.min_train
+        if orphans or compact or train:
+            self._rebuild_index()
+            return True
+        return False
+
+    def _rebuild_index(self) -> None:
+        ids = [row[0] for row in self._conn.execute("SELECT id FROM chunks ORDER BY id")]
+        vectors = self._vectors(ids) if ids else np.zeros((0, self.index.d), "float32")
+        self.index = build_index(self.config, prepare_vectors(vectors, self.config), np.array(ids, dtype="int64"))
+        self._conn.execute("DELETE FROM stale")
+        self._stale = 0
+
+    def rebuild(self) -> None:
+        """Re-create the index from its live vectors, e.g. after changing ``config``.
+
+        Vectors are read back with ``reconstruct``, which is lossy for IVF-PQ;
+        re-ingest the PDFs to rebuild a PQ index exactly.
+        """
+        self._check_writable()
+        if self.index is not None:
+            self._rebuild_index()
+            self.commit()
+
+    # --------------------------------------------
+    # Ingestion
+    # --------------------------------------------
+    def needs_ingest(self, pdf_path: Union[str, Path], sha256: Optional[str] = None) -> bool:
+        row = self._conn.execute("SELECT sha256 FROM studies WHERE study = ?", (Path(pdf_path).name,)).fetchone()
+        return row is None or row[0] != (sha256 or sha256_file(pdf_path))
+
+    def add_study(
+        self,
+        study: str,
+        documents: List[Dict[str, Any]],
+        embeddings: np.ndarray,
+        sha256: str,
+        pdf_path: str = "",
+    ) -> None:
+        """Replace a study's chunks with ``documents`` and their ``embeddings``.
+
+        Changes become durable on the next :meth:`commit`.
+        """
+        self._check_writable()
+        if embeddings.shape[0] != len(documents):
+            raise ValueError("Embeddings and metadata counts do not match.")
+        self.delete_study(study, commit=False)
+        count = self._add_chunks(study, documents, embeddings)
+        self._record_study(study, sha256, pdf_path, count)
+
+    def _add_chunks(self, study: str, documents: List[Dict[str, Any]], embeddings: np.ndarray) -> int:
+        # Ids of stale HNSW vectors must never be handed out again.
+        last = self._conn.execute(
+            "SELECT MAX(id) FROM (SELECT id FROM chunks UNION ALL SELECT id FROM stale)"
+        ).fetchone()[0]
+        ids = list(range((last or 0) + 1, (last or 0) + 1 + len(documents)))
+        self._conn.executemany(
+            "INSERT INTO chunks (id, study, chunk, page, text) VALUES (?, ?, ?, ?, ?)",
+            [(i, study, doc["id"], doc.get("page"), doc["text"]) for i, doc in zip(ids, documents)],
+        )
+        if ids:
+            vectors = prepare_vectors(embeddings, self.config)
+            self.index = add_vectors(self.index, self.config, vectors, np.array(ids, dtype="int64"))
+        return len(ids)
+
+    def _record_study(self, study: str, sha256: str, pdf_path: str, chunks: int) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO studies VALUES (?, ?, ?, ?, ?)",
+            (study, sha256, pdf_path, chunks, time.time()),
+        )
+
+    def ingest(
+        self,
+        pdf_paths: Iterable[Union[str, Path]],
+        embed: EmbedFn,
+        commit_every: int = 25,
+        batch_tokens: int = EMBED_BATCH_TOKENS,
+        concurrency: int = EMBED_CONCURRENCY,
+        force: bool = False,
+    ) -> List[str]:
+        """Embed new or changed PDFs only; returns the names of studies (re)indexed.
+
+        Pages stream through chunking into embedding requests of at most
+        ``batch_tokens``, up to ``concurrency`` at a time, and each batch is
+        written to the index as it arrives, so memory does not grow with PDF
+        length. ``force`` re-chunks every PDF, e.g. after changing chunk
+        sizes; with a cached ``embed`` (:mod:`rob2.rag.embedding_cache`) only
+        chunks whose text changed are sent to the API.
+        """
+        todo = []
+        for pdf_path in pdf_paths:
+            pdf_path = Path(pdf_path)
+            sha256 = sha256_file(pdf_path)
+            if force or self.needs_ingest(pdf_path, sha256):
+                todo.append((pdf_path, sha256))
+        if self.artifacts is not None and todo:
+            # Parsed in the artifact store's process pools; PDFs waiting on OCR
+            # are embedded last instead of holding up the others.
+            extracted = self.artifacts.iter_extract([p for p, _ in todo], sha256s=[h for _, h in todo])
+            ready = ((todo[i], artifact.pages()) for i, artifact in extracted)
+        else:
+            ready = ((item, iter_pdf_pages(str(item[0]))) for item in todo)
+
+        updated = []
+        for (pdf_path, sha256), pages in ready:
+            self.delete_study(pdf_path.name, commit=False)
+            batches = iter_batches(iter_documents(pages), batch_tokens)
+            count = 0
+            for documents, embeddings in embed_batches(batches, embed, concurrency):
+                count += self._add_chunks(pdf_path.name, documents, embeddings)
+            self._record_study(pdf_path.name, sha256, str(pdf_path), count)
+            updated.append(pdf_path.name)
+            if len(updated) % commit_every == 0:
+                self.commit()
+        self.commit()
+        return updated
+
+    def delete_study(self, study: str, commit: bool = True) -> int:
+        self._check_writable()
+        ids = [row[0] for row in self._conn.execute("SELECT id FROM chunks WHERE study = ?", (study,))]
+        if ids and self.index is not None:
+            if self.config.kind == "hnsw":
+                self._conn.executemany("INSERT OR IGNORE INTO stale VALUES (?)", [(i,) for i in ids])
+                self._stale += len(ids)
+            else:
+                self.index.remove_ids(np.array(ids, dtype="int64"))
+        self._conn.execute("DELETE FROM chunks WHERE study = ?", (study,))
+        self._conn.execute("DELETE FROM studies WHERE study = ?", (study,))
+        if commit:
+            self.commit()
+        return len(ids)
+
+    # --------------------------------------------
+    # Search
+    # --------------------------------------------
+    def _rows(self, ids: List[int]) -> Dict[int, tuple]:
+        if not ids:
+            return {}
+        marks = ",".join("?" * len(ids))
+        return {
+            row[0]: row[1:]
+            for row in self._conn.execute(f"SELECT id, study, chunk, page, text FROM chunks WHERE id IN ({marks})", ids)
+        }
+
+    def search(self, query_embedding: np.ndarray, k: int = 5, study: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Nearest chunks to a query, optionally restricted to one study.
+
+        ``score`` is an L2 distance for ``flat-l2`` and a cosine similarity
+        otherwise.
+        """
+        if self.index is None or self.index.ntotal == 0:
+            return []
+        query = prepare_vectors(query_embedding, self.config)
+        if study is None:
+            # Over-fetch so stale HNSW hits can be dropped without returning fewer than k.
+            distances, ids = self.index.search(query, min(k + self._stale, self.index.ntotal))
+            pairs = [(float(d), int(i)) for d, i in zip(distances[0], ids[0]) if i != -1]
+        else:
+            # A study has few chunks: score them exactly from the stored vectors.
+            chunk_ids = [row[0] for row in self._conn.execute("SELECT id FROM chunks WHERE study = ?", (study,))]
+            if not chunk_ids:
+                return []
+            vectors = self._vectors(chunk_ids)
+            if self.config.metric == faiss.METRIC_L2:
+                scores = ((vectors - query) ** 2).sum(axis=1)
+                order = np.argsort(scores)[:k]
+            else:
+                scores = vectors @ query[0]
+                order = np.argsort(-scores)[:k]
+            pairs = [(float(scores[j]), chunk_ids[j]) for j in order]
+        rows = self._rows([i for _, i in pairs])
+        return [
+            {"score": score, "study": rows[i][0], "id": rows[i][1], "page": rows[i][2], "text": rows[i][3]}
+            for score, i in pairs
+            if i in rows
+        ][:k]
+
+    def studies(self) -> Dict[str, str]:
+        """Indexed study name -> content hash."""
+        return dict(self._conn.execute("SELECT study, sha256 FROM studies"))
+
+    def save(self) -> None:
+        if self.index is not None and not self.read_only:
+            tmp = self.vectors_path.with_suffix(".tmp")
+            faiss.write_index(self.index, str(tmp))
+            tmp.replace(self.vectors_path)
+            self.config_path.write_text(json.dumps(asdict(self.config), indent=2), encoding="utf-8")
+
+    def commit(self) -> None:
+        """Compact stale vectors if due, then persist vectors, then metadata."""
+        self._maintain()
+        self.save()
+        self._conn.commit()
+
+    def close(self) -> None:
+        if not self.read_only:
+            self.commit()
+        self._conn.close()
@@ -0,0 +1,296 @@
+"""Shared rate limiting, retry and throttle accounting for provider calls.
+
+A :class:`RateLimiter` keeps two token buckets (requests per minute and tokens
+per minute), refilled continuously. Callers reserve an estimate before each
+request and reconcile it with real usage afterwards. Rate-limit headers from
+responses and errors (``retry-after``, ``x-ratelimit-remaining-*``,
+``x-ratelimit-reset-*``) pull the local buckets in line with the provider's
+view, and retryable failures (429, 5xx, timeouts) are retried with jittered
+exponential backoff.
+
+The same limiter works from async code (``await limiter.call(...)``) and from
+blocking notebook code such as ``embed_texts`` (``limiter.call_sync(...)``).
+Pass the ``with_raw_response`` variant of an OpenAI method so the limiter can
+read the response headers::
+
+    limiter = RateLimiter(requests_per_minute=500, tokens_per_minute=30_000)
+    response = await limiter.call(client.responses.with_raw_response.create, tokens=12_000, **request)
+"""
+
+import asyncio
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Mapping, Optional
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+_RETRYABLE_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "TimeoutError", "ConnectionError"}
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse ``retry-after`` / reset header values ("2", "1.5s", "6m0s", "20ms") to seconds."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+
+class TokenBucket:
+    """Continuously refilled bucket holding up to ``per_minute`` units.
+
+    ``level`` may go negative when reconciled usage exceeds the reservation;
+    the debt is repaid by refill before the next reservation succeeds.
+    """
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        if per_minute <= 0:
+            raise ValueError("per_minute must be positive.")
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self._clock = clock
+        self._level = self.capacity
+        self._stamp = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._level = min(self.capacity, self._level + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def try_take(self, amount: float) -> float:
+        """Take ``amount`` and return 0, or return the seconds to wait before retrying."""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            if self._level >= amount:
+                self._level -= amount
+                return 0.0
+            return (amount - self._level) / self.rate
+
+    def adjust(self, amount: float) -> None:
+        """Give back (positive) or charge (negative) units after the fact."""
+        with self._lock:
+            self._refill()
+            self._level = min(self.capacity, self._level + amount)
+
+    def sync(self, remaining: float, reset_seconds: Optional[float] = None) -> None:
+        """Align with the provider's reported remaining quota."""
+        with self._lock:
+            self._refill()
+            self._level = min(self._level, float(remaining))
+            if reset_seconds and remaining <= 0:
+                # Empty until the provider's reset time.
+                self._level = -reset_seconds * self.rate
+
+    @property
+    def level(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._level
+
+
+@dataclass
+class Backoff:
+    """Jittered exponential backoff policy."""
+
+    max_retries: int = 6
+    base: float = 1.0
+    cap: float = 60.0
+    jitter: float = 1.0
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        exp = min(self.cap, self.base * (2 ** attempt))
+        delay = exp * (1 - self.jitter) + random.uniform(0, exp * self.jitter)
+        if retry_after is not None:
+            delay = max(delay, retry_after + random.uniform(0, self.base * self.jitter))
+        return delay
+
+
+@dataclass
+class ThrottleStats:
+    """Counters for time spent throttled versus doing useful work."""
+
+    requests: int = 0
+    retries: int = 0
+    failures: int = 0
+    tokens: int = 0
+    throttled_seconds: float = 0.0
+    backoff_seconds: float = 0.0
+    busy_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, **deltas) -> None:
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    @property
+    def waiting_seconds(self) -> float:
+        return self.throttled_seconds + self.backoff_seconds
+
+    def summary(self) -> str:
+        total = self.waiting_seconds + self.busy_seconds
+        share = self.waiting_seconds / total if total else 0.0
+        return (
+            f"{self.requests} requests ({self.retries} retries, {self.failures} failed), "
+            f"{self.tokens} tokens; busy {self.busy_seconds:.1f}s, "
+            f"throttled {self.throttled_seconds:.1f}s, backoff {self.backoff_seconds:.1f}s "
+            f"({share:.0%} waiting)"
+        )
+
+
+def _headers_of(obj) -> Optional[Mapping[str, str]]:
+    headers = getattr(obj, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(obj, "response", None), "headers", None)
+    return headers
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return any(cls.__name__ in _RETRYABLE_ERROR_NAMES for cls in type(exc).__mro__)
+
+
+class RateLimiter:
+    """Request and token buckets plus retry handling shared across callers."""
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        backoff: Optional[Backoff] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.requests = TokenBucket(requests_per_minute, clock) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, clock) if tokens_per_minute else None
+        self.backoff = backoff or Backoff()
+        self.stats = ThrottleStats()
+        self._clock = clock
+
+    # --------------------------------------------
+    # Bucket accounting
+    # --------------------------------------------
+    def _try_acquire(self, tokens: int) -> float:
+        wait = self.requests.try_take(1) if self.requests else 0.0
+        if wait:
+            return wait
+        if self.tokens and tokens:
+            wait = self.tokens.try_take(tokens)
+            if wait and self.requests:
+                self.requests.adjust(1)
+        return wait
+
+    def acquire_sync(self, tokens: int = 0) -> None:
+        while True:
+            wait = self._try_acquire(tokens)
+            if not wait:
+                return
+            self.stats.add(throttled_seconds=wait)
+            time.sleep(wait)
+
+    async def acquire(self, tokens: int = 0) -> None:
+        while True:
+            wait = self._try_acquire(tokens)
+            if not wait:
+                return
+            self.stats.add(throttled_seconds=wait)
+            await asyncio.sleep(wait)
+
+    def reconcile(self, estimated: int, actual: int) -> None:
+        """Replace a reserved token estimate with the usage the provider reported."""
+        self.stats.add(tokens=actual)
+        if self.tokens and actual != estimated:
+            self.tokens.adjust(min(estimated, self.tokens.capacity) - actual)
+
+    def observe_headers(self, headers: Optional[Mapping[str, str]]) -> None:
+        """Sync buckets from ``x-ratelimit-*`` headers when present."""
+        if not headers:
+            return
+        for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if bucket is None or remaining is None:
+                continue
+            try:
+                remaining = float(remaining)
+            except ValueError:
+                continue
+            bucket.sync(remaining, parse_duration(headers.get(f"x-ratelimit-reset-{kind}")))
+
+    @staticmethod
+    def retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+        if not headers:
+            return None
+        millis = headers.get("retry-after-ms")
+        if millis is not None:
+            try:
+                return float(millis) / 1000.0
+            except ValueError:
+                pass
+        return parse_duration(headers.get("retry-after"))
+
+    # --------------------------------------------
+    # Calls with retry
+    # --------------------------------------------
+    def _finish(self, result: Any, started: float) -> Any:
+        self.stats.add(requests=1, busy_seconds=self._clock() - started)
+        headers = _headers_of(result)
+        self.observe_headers(headers)
+        if headers is not None and callable(getattr(result, "parse", None)):
+            return result.parse()
+        return result
+
+    def _on_error(self, exc: BaseException, attempt: int, started: float, tokens: int) -> float:
+        """Record a failed attempt and return the backoff delay, re-raising if not retryable."""
+        self.stats.add(busy_seconds=self._clock() - started)
+        if self.tokens and tokens:
+            # Rejected requests do not consume the provider's token quota.
+            self.tokens.adjust(min(tokens, self.tokens.capacity))
+        if not is_retryable(exc) or attempt >= self.backoff.max_retries:
+            self.stats.add(failures=1)
+            raise exc
+        headers = _headers_of(exc)
+        self.observe_headers(headers)
+        delay = self.backoff.delay(attempt, self.retry_after(headers))
+        self.stats.add(retries=1, backoff_seconds=delay)
+        return delay
+
+    async def call(self, fn: Callable[..., Any], *args, tokens: int = 0, **kwargs) -> Any:
+        """Await ``fn(*args, **kwargs)`` under the limiter, retrying transient failures."""
+        attempt = 0
+        while True:
+            await self.acquire(tokens)
+            started = self._clock()
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as exc:
+                await asyncio.sleep(self._on_error(exc, attempt, started, tokens))
+                attempt += 1
+                continue
+            return self._finish(result, started)
+
+    def call_sync(self, fn: Callable[..., Any], *args, tokens: int = 0, **kwargs) -> Any:
+        """Blocking counterpart of :meth:`call`."""
+        attempt = 0
+        while True:
+            self.acquire_sync(tokens)
+            started = self._clock()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as exc:
+                time.sleep(self._on_error(exc, attempt, started, tokens))
+                attempt += 1
+                continue
+            return self._finish(result, started)
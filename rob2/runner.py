@@ -0,0 +1,476 @@
+"""Async engine that walks RoB signalling questions for many studies at once.
+
+Each (study, domain) pair is an independent chain of questions driven by the
+domain's ``get_next_question``. The runner starts every chain concurrently and
+bounds the work with a request semaphore and a shared
+:class:`~rob2.ratelimit.RateLimiter`, so throughput follows the provider's
+rate limits instead of a fixed sleep and transient errors are retried.
+Requests go through a :class:`~rob2.backends.LLMBackend`; a bare OpenAI
+client is wrapped in the Responses API backend.
+
+Typical notebook use::
+
+    runner = AssessmentRunner(AsyncOpenAI(), get_prompt_manifest())
+    results = await runner.run([Study(p) for p in Path("studies").glob("*.pdf")])
+"""
+
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Union
+
+from .common import DomainSpec, Response
+from .compact import AnswerState, CompactResult
+from .domains import get_domain_specs
+from .files import FileRegistry, upload_name
+from .cache import ResponseCache, cache_key, sha256_file
+from .batched import DOMAIN_SCHEMA_NAME, build_domain_prompt, domain_schema, parse_domain_response, replay
+from .backends import LLMBackend, as_backend
+from .llm import (
+    DEFAULT_MODEL,
+    PREFIX_LAYOUT,
+    RESPONSE_SCHEMA,
+    RETRIEVAL_PREAMBLE,
+    ROB2_PREAMBLE,
+    Answer,
+    LLMRequest,
+    acomplete,
+    cached_tokens,
+    estimate_tokens,
+    layout_options,
+    parse_response,
+    usage_tokens,
+)
+from .prompts import get_prompt_manifest, load_prompt
+from .ratelimit import Backoff, RateLimiter
+from .speculation import PathStats, SpeculationPolicy
+from .usage import TokenUsage
+
+if TYPE_CHECKING:
+    from .export import RowWriter
+    from .journal import RunJournal
+    from .rag.qa import Retriever
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RunnerConfig:
+    """Knobs for :class:`AssessmentRunner`."""
+
+    model: str = DEFAULT_MODEL
+    max_concurrency: int = 8
+    requests_per_minute: int = 500
+    tokens_per_minute: int = 30_000
+    max_retries: int = 6
+    # Used to reserve budget before the first answer of a study reports usage.
+    estimated_tokens_per_call: int = 15_000
+    domains: Optional[Sequence[str]] = None
+    # Cache controls: skip the response cache entirely, or re-ask (and
+    # overwrite cached answers for) the listed domains.
+    use_cache: bool = True
+    refresh_domains: Sequence[str] = ()
+    # Rebuild domains from the journal before asking; answers journaled for
+    # a different prompt, preamble or layout are asked again (see rob2.journal).
+    resume: bool = True
+    # Speculative mode sends every question whose reach probability is at
+    # least speculation_threshold in parallel (see rob2.speculation).
+    speculate: bool = False
+    speculation_threshold: float = 0.5
+    # Ask all questions of a domain in one request (see rob2.batched).
+    batch_domains: bool = False
+    # PREFIX_LAYOUT sends the preamble and the PDF before the question so
+    # they form a prefix the provider's prompt cache can reuse across a
+    # study's questions; QUESTION_FIRST_LAYOUT is the notebook's order and
+    # sends no preamble (see rob2.llm). Runs with a retriever attach no
+    # document and use retrieval_preamble instead.
+    prompt_layout: str = PREFIX_LAYOUT
+    preamble: str = ROB2_PREAMBLE
+    retrieval_preamble: str = RETRIEVAL_PREAMBLE
+
+
+@dataclass
+class Study:
+    """A PDF to assess; ``file_id`` is filled in once uploaded."""
+
+    pdf_path: Path
+    file_id: Optional[str] = None
+    _sha256: Optional[str] = field(default=None, repr=False)
+
+    def __post_init__(self):
+        self.pdf_path = Path(self.pdf_path)
+
+    @property
+    def name(self) -> str:
+        return self.pdf_path.name
+
+    @property
+    def sha256(self) -> str:
+        if self._sha256 is None:
+            self._sha256 = sha256_file(self.pdf_path)
+        return self._sha256
+
+
+@dataclass
+class StudyResult:
+    """Rows and final per-domain state for one study.
+
+    States are :class:`~rob2.compact.AnswerState` byte arrays, which behave
+    like the usual question-code ``state`` dicts.
+    """
+
+    study: Study
+    rows: List[dict] = field(default_factory=list)
+    states: Dict[str, AnswerState] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    # Provider usage of this study's requests (see rob2.usage).
+    usage: TokenUsage = field(default_factory=TokenUsage)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def judgements(self, specs: Optional[Dict[str, DomainSpec]] = None) -> Dict[str, CompactResult]:
+        """Each domain's judgement as a shared :class:`~rob2.compact.CompactResult` from its truth table."""
+        specs = specs if specs is not None else get_domain_specs()
+        return {
+            key: specs[key].compiled().evaluate_compact(*state.answers())
+            for key, state in self.states.items()
+            if key in specs
+        }
+
+
+class AssessmentRunner:
+    """Drive ``DomainSpec.get_next_question`` for many studies concurrently."""
+
+    def __init__(
+        self,
+        client,
+        prompt_files: Optional[Dict[str, Dict[str, Path]]] = None,
+        specs: Optional[Dict[str, DomainSpec]] = None,
+        config: Optional[RunnerConfig] = None,
+        limiter: Optional[RateLimiter] = None,
+        cache: Optional[ResponseCache] = None,
+        files: Optional[FileRegistry] = None,
+        path_stats: Optional[PathStats] = None,
+        retriever: Optional["Retriever"] = None,
+        journal: Optional["RunJournal"] = None,
+        writer: Optional["RowWriter"] = None,
+    ):
+        self.client = client
+        self.prompt_files = prompt_files if prompt_files is not None else get_prompt_manifest()
+        self.specs = specs if specs is not None else get_domain_specs()
+        self.config = config or RunnerConfig()
+        # An OpenAI client or any rob2.backends.LLMBackend (e.g. MockBackend for load tests).
+        self.backend: LLMBackend = as_backend(client)
+        # Cache and journal keys use the backend's model name, so mock or local answers never mix with real ones.
+        self.model = self.backend.model_name(self.config.model)
+        self._semaphore = asyncio.Semaphore(self.config.max_concurrency)
+        self.limiter = limiter or RateLimiter(
+            requests_per_minute=self.config.requests_per_minute,
+            tokens_per_minute=self.config.tokens_per_minute,
+            backoff=Backoff(max_retries=self.config.max_retries),
+        )
+        self.cache = cache if self.config.use_cache else None
+        self.files = files if self.backend.openai_files else None
+        self.path_stats = path_stats
+        # With a retriever, prompts carry retrieved excerpts and no PDF is uploaded (see rob2.rag.qa).
+        self.retriever = retriever
+        if retriever is None and not self.backend.supports_files:
+            raise ValueError(f"{type(self.backend).__name__} cannot read PDFs; pass a retriever")
+        # Answers are journaled as they arrive and restored on the next run (see rob2.journal).
+        self.journal = journal
+        self.resumed = 0
+        # Each study's rows are streamed here as soon as it finishes (see rob2.export).
+        self.writer = writer
+        self.policy = SpeculationPolicy(self.config.speculation_threshold, path_stats)
+        self.prefetched = 0
+        self.discarded = 0
+        # Keyed by PDF hash (uploads, token counts) or path (usage), not file
+        # name: studies in different folders may share a name.
+        self._observed_tokens: Dict[str, int] = {}
+        self.usage = TokenUsage()
+        self._study_usage: Dict[Path, TokenUsage] = {}
+        self._prompt_hashes: Dict[str, Dict[str, str]] = {}
+        self._upload_locks: Dict[str, asyncio.Lock] = {}
+
+    # --------------------------------------------
+    # Provider calls
+    # --------------------------------------------
+    async def upload(self, study: Study) -> str:
+        """Upload the PDF once, on the first cache miss, reusing registered uploads."""
+        lock = self._upload_locks.setdefault(study.sha256, asyncio.Lock())
+        async with lock:
+            if study.file_id is None and self.files is not None:
+                study.file_id = self.files.lookup(study.sha256)
+            if study.file_id is None:
+                async with self._semaphore:
+                    study.file_id = await self.limiter.call(
+                        self.backend.aupload, upload_name(study.name), study.pdf_path.read_bytes()
+                    )
+                if self.files is not None:
+                    self.files.record(study.sha256, study.file_id, study.name)
+        return study.file_id
+
+    async def ask(self, study: Study, domain_key: str, question_code: str, prompt_text: str) -> Answer:
+        if self.retriever is not None:
+            prompt_text = self.retriever.prompt(study.name, self.specs[domain_key], [question_code], prompt_text)
+        key = None
+        if self.cache is not None:
+            key = cache_key(study.sha256, self._cache_text(prompt_text), self.model, RESPONSE_SCHEMA)
+            if domain_key not in self.config.refresh_domains:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    return cached
+
+        file_id = await self._file_id(study)
+        estimate = self._estimate(study, prompt_text)
+        request = self._request(study, prompt_text, file_id, domain_key, [question_code])
+        async with self._semaphore:
+            response = await acomplete(self.backend, request, self.limiter, estimate)
+        self._record_usage(study, response)
+        answer = parse_response(response)
+        if answer.total_tokens:
+            self._observed_tokens[study.sha256] = answer.total_tokens
+        if key is not None:
+            self.cache.put(key, answer, study.sha256, self.model, domain_key, question_code)
+        return answer
+
+    async def ask_domain(self, study: Study, spec: DomainSpec) -> Dict[str, Answer]:
+        """Answer every question of a domain with one batched request."""
+        codes = list(spec.questions)
+        prompt_text = build_domain_prompt(self.prompt_files, spec)
+        if self.retriever is not None:
+            prompt_text = self.retriever.prompt(study.name, spec, codes, prompt_text)
+        schema = domain_schema(codes)
+        keys: Dict[str, str] = {}
+        if self.cache is not None:
+            keys = {
+                code: cache_key(study.sha256, f"{self._cache_text(prompt_text)}\0{code}", self.model, schema)
+                for code in codes
+            }
+            if spec.key not in self.config.refresh_domains:
+                cached = {code: self.cache.get(key) for code, key in keys.items()}
+                if all(cached.values()):
+                    return cached
+
+        file_id = await self._file_id(study)
+        request = self._request(study, prompt_text, file_id, spec.key, codes, schema, DOMAIN_SCHEMA_NAME)
+        async with self._semaphore:
+            response = await acomplete(self.backend, request, self.limiter, self._estimate(study, prompt_text))
+        self._record_usage(study, response)
+        answers = parse_domain_response(response, codes)
+        for code, key in keys.items():
+            if code in answers:
+                self.cache.put(key, answers[code], study.sha256, self.model, spec.key, code)
+        return answers
+
+    def _request(
+        self,
+        study: Study,
+        prompt_text: str,
+        file_id: Optional[str],
+        domain_key: str,
+        codes: List[str],
+        schema: Dict = RESPONSE_SCHEMA,
+        schema_name: str = "response_details",
+    ) -> LLMRequest:
+        return LLMRequest(
+            prompt_text,
+            file_id,
+            self.config.model,
+            schema,
+            schema_name,
+            metadata={"study": study.name, "domain": domain_key, "question_codes": codes},
+            **layout_options(self.config.prompt_layout, self._preamble(), study.sha256),
+        )
+
+    def _cache_text(self, prompt_text: str) -> str:
+        """What the response cache keys on: the prompt, plus the preamble and layout when they change the request."""
+        if self.config.prompt_layout == PREFIX_LAYOUT:
+            return f"{self._preamble()}\0{PREFIX_LAYOUT}\0{prompt_text}"
+        return prompt_text
+
+    def _preamble(self) -> str:
+        return self.config.preamble if self.retriever is None else self.config.retrieval_preamble
+
+    def _record_usage(self, study: Study, response) -> None:
+        input_tokens, output_tokens = usage_tokens(response)
+        cached = cached_tokens(response)
+        self.usage.add(input_tokens, output_tokens, cached)
+        self._study_usage.setdefault(study.pdf_path, TokenUsage()).add(input_tokens, output_tokens, cached)
+
+    async def _file_id(self, study: Study) -> Optional[str]:
+        return None if self.retriever is not None else await self.upload(study)
+
+    def _estimate(self, study: Study, prompt_text: str) -> int:
+        if self.retriever is not None:
+            # The prompt is the whole input; leave room for the answer.
+            return estimate_tokens(prompt_text) + 1_000
+        return self._observed_tokens.get(study.sha256) or (
+            self.config.estimated_tokens_per_call + estimate_tokens(prompt_text)
+        )
+
+    # --------------------------------------------
+    # Question walking
+    # --------------------------------------------
+    def domain_keys(self) -> List[str]:
+        keys = self.config.domains or list(self.prompt_files)
+        return [key for key in keys if key in self.specs]
+
+    async def _ask_question(self, study: Study, domain_key: str, question_code: str) -> Answer:
+        prompt_text = load_prompt(self.prompt_files, domain_key, question_code)
+        return await self.ask(study, domain_key, question_code, prompt_text)
+
+    def _restore(self, study: Study, spec: DomainSpec, state: AnswerState, result: StudyResult) -> None:
+        """Rebuild ``state`` and rows from the journal, or forget a refreshed domain."""
+        if spec.key in self.config.refresh_domains:
+            self.journal.reset(study.sha256, spec.key, self.model)
+            return
+        restored = self.journal.restore(study.sha256, spec.key, self.model, self._domain_prompt_hashes(spec))
+        if self.config.batch_domains and spec.get_next_question(restored.state) is not None:
+            # A batched request answers the whole domain; partial progress is re-asked.
+            return
+        state.update(restored.state)
+        result.rows.extend(restored.rows)
+        self.resumed += len(restored.rows)
+        if restored.rows:
+            logger.info("%s %s resumed with %d answers", study.name, spec.key, len(restored.rows))
+
+    def _journal(self, study: Study, spec: DomainSpec, code: str, row: dict, state: AnswerState) -> None:
+        if self.journal is not None:
+            prompt_hash = self._domain_prompt_hashes(spec).get(code, "")
+            self.journal.record(study.sha256, study.name, spec.key, code, self.model, row, state, prompt_hash)
+
+    def _domain_prompt_hashes(self, spec: DomainSpec) -> Dict[str, str]:
+        """Per question, a hash of the prompt text, preamble and layout it is sent with."""
+        hashes = self._prompt_hashes.get(spec.key)
+        if hashes is None:
+            hashes = self._prompt_hashes[spec.key] = {
+                code: hashlib.sha256(
+                    self._cache_text(load_prompt(self.prompt_files, spec.key, code)).encode("utf-8")
+                ).hexdigest()[:16]
+                for code in self.prompt_files.get(spec.key, {})
+            }
+        return hashes
+
+    def _flush_journal(self) -> None:
+        # A finished (or failed) domain is committed now, not on the next record.
+        if self.journal is not None:
+            self.journal.flush()
+
+    async def assess_domain(self, study: Study, domain_key: str, result: StudyResult) -> None:
+        spec = self.specs[domain_key]
+        state = result.states.get(domain_key)
+        if state is None:
+            state = result.states[domain_key] = AnswerState.for_domain(spec)
+        if self.journal is not None and self.config.resume:
+            self._restore(study, spec, state, result)
+            if spec.get_next_question(state) is None:
+                return
+        if self.config.batch_domains:
+            await self._assess_domain_batched(study, spec, state, result)
+            return
+
+        # Speculative requests keyed by question code; prompts do not depend on
+        # earlier answers, so a prefetched answer stays valid once it arrives.
+        pending: Dict[str, asyncio.Future] = {}
+
+        try:
+            question_code = spec.get_next_question(state)
+            while question_code:
+                if self.config.speculate:
+                    for code in self.policy.candidates(spec, state):
+                        if code != question_code and code not in pending:
+                            pending[code] = asyncio.ensure_future(self._ask_question(study, domain_key, code))
+                            self.prefetched += 1
+
+                task = pending.pop(question_code, None)
+                answer = await (task or self._ask_question(study, domain_key, question_code))
+                logger.info(
+                    "%s %s %s -> %s%s",
+                    study.name, domain_key, question_code, answer.answer, " (cached)" if answer.cached else "",
+                )
+
+                row = self._row(study, spec, question_code, answer, self.prompt_files[domain_key][question_code])
+                result.rows.append(row)
+                state[question_code] = answer.to_response()
+                self._journal(study, spec, question_code, row, state)
+                question_code = spec.get_next_question(state)
+        except BaseException:
+            for task in pending.values():
+                task.cancel()
+            raise
+        finally:
+            self._flush_journal()
+
+        if pending:
+            # Off-path answers are not used, but let them finish so they land in the cache.
+            self.discarded += len(pending)
+            await asyncio.gather(*pending.values(), return_exceptions=True)
+        if self.path_stats is not None:
+            self.path_stats.record(domain_key, state)
+
+    async def _assess_domain_batched(
+        self, study: Study, spec: DomainSpec, state: AnswerState, result: StudyResult
+    ) -> None:
+        answers = await self.ask_domain(study, spec)
+        path = replay(spec, answers)
+        for code in path:
+            row = self._row(study, spec, code, answers[code], self.prompt_files[spec.key][code])
+            result.rows.append(row)
+            state[code] = answers[code].to_response()
+            self._journal(study, spec, code, row, state)
+        self._flush_journal()
+        self.discarded += len(answers) - len(path)
+        logger.info("%s %s -> %s", study.name, spec.key, ", ".join(f"{c}={state[c].value}" for c in path))
+        if self.path_stats is not None:
+            self.path_stats.record(spec.key, state)
+
+    async def assess_study(self, study: Study) -> StudyResult:
+        result = StudyResult(study)
+        keys = self.domain_keys()
+        outcomes = await asyncio.gather(
+            *(self.assess_domain(study, key, result) for key in keys),
+            return_exceptions=True,
+        )
+        for key, outcome in zip(keys, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error("%s %s failed: %r", study.name, key, outcome)
+                result.errors[key] = repr(outcome)
+
+        result.rows.sort(key=lambda row: (row["domain"], row["question_code"]))
+        result.usage = self._study_usage.pop(study.pdf_path, result.usage)
+        if self.writer is not None:
+            self.writer.write(result.rows)
+        return result
+
+    async def run(self, studies: Iterable[Union[Study, str, Path]]) -> List[StudyResult]:
+        studies = [s if isinstance(s, Study) else Study(s) for s in studies]
+        if self.retriever is not None:
+            self.retriever.prepare([s.pdf_path for s in studies], [self.specs[key] for key in self.domain_keys()])
+        results = list(await asyncio.gather(*(self.assess_study(study) for study in studies)))
+        if self.path_stats is not None:
+            self.path_stats.save()
+        return results
+
+    @staticmethod
+    def _row(study: Study, spec: DomainSpec, question_code: str, answer: Answer, prompt_path: Path) -> dict:
+        return {
+            "file_name": study.name,
+            "domain": spec.key,
+            "question_code": question_code,
+            "question_text": spec.questions.get(question_code, ""),
+            "prompt_path": str(prompt_path),
+            "answer": answer.answer,
+            "justification": answer.justification,
+            "citations": "; ".join(answer.citations),
+        }
+
+
+def run_assessments(client, studies: Iterable[Union[Study, str, Path]], **kwargs) -> List[StudyResult]:
+    """Blocking wrapper around :meth:`AssessmentRunner.run` for scripts."""
+    runner = AssessmentRunner(client, **kwargs)
+    return asyncio.run(runner.run(studies))
@@ -0,0 +1,288 @@
+"""Single-answer sensitivity analysis over each domain's decision tree.
+
+For every answered signalling question of a study, the engine asks what the
+domain and overall judgements would be had that one answer been different.
+A flipped answer can change which questions are reached (4.1 = N makes 4.3
+reachable where 4.1 = Y did not); answers already known for newly reached
+questions are used, and questions with no answer are left open, so a flip
+yields the set of judgements still possible rather than a single one.
+
+:class:`DomainEnumerator` explores a domain's ``get_next_question`` /
+``evaluate`` pair with every model answer at each branch. The next-question
+and reachable-judgement lookups are memoised on the byte encoding of the
+partial state (see :class:`~rob2.compact.AnswerState`), so shared prefixes
+are explored once and the whole enumeration is reused across studies::
+
+    python -m rob2.sensitivity states.json
+"""
+
+import argparse
+import json
+from dataclasses import dataclass, field
+from itertools import product
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterator, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
+
+from .common import JUDGEMENT_CODE, JUDGEMENTS, DomainSpec, Response
+from .compact import AnswerState
+from .decision import ANSWER_CHOICES
+from .domains import get_domain_specs
+from .overall import DEFAULT_SOME_CONCERNS_THRESHOLD, overall_many
+
+StateMapping = Mapping[str, Optional[Response]]
+FlipOutcome = Tuple[str, Response, Response, FrozenSet[int]]
+
+
+def _labels(codes: FrozenSet[int]) -> Tuple[str, ...]:
+    return tuple(JUDGEMENTS[code] for code in sorted(codes))
+
+
+class DomainEnumerator:
+    """Memoised exploration of one domain's reachable answer paths."""
+
+    def __init__(self, spec: DomainSpec, choices: Tuple[Response, ...] = ANSWER_CHOICES):
+        self.spec = spec
+        self.codes: Tuple[str, ...] = tuple(spec.questions)
+        self.choices = tuple(choices)
+        self._table = spec.compiled() if spec.compiled is not None else None
+        self._next: Dict[bytes, Optional[str]] = {}
+        self._outcomes: Dict[bytes, FrozenSet[int]] = {}
+        self._flips: Dict[bytes, Tuple[FrozenSet[int], List[FlipOutcome]]] = {}
+
+    def next_question(self, state: AnswerState) -> Optional[str]:
+        key = bytes(state.values)
+        if key not in self._next:
+            self._next[key] = self.spec.get_next_question(state)
+        return self._next[key]
+
+    def judgement(self, state: AnswerState) -> int:
+        if self._table is not None:
+            result = self._table.evaluate_state(state)
+        else:
+            result = self.spec.evaluate(*state.answers())
+        return JUDGEMENT_CODE[result.judgement]
+
+    def walk(self, answers: StateMapping) -> AnswerState:
+        """State reached by following ``get_next_question`` through known ``answers``."""
+        state = AnswerState(self.codes)
+        code = self.next_question(state)
+        while code is not None and answers.get(code) is not None:
+            state[code] = answers[code]
+            code = self.next_question(state)
+        return state
+
+    def outcomes(self, state: AnswerState) -> FrozenSet[int]:
+        """Judgement codes reachable by answering the rest of the domain from ``state``."""
+        key = bytes(state.values)
+        found = self._outcomes.get(key)
+        if found is None:
+            code = self.next_question(state)
+            if code is None:
+                found = frozenset((self.judgement(state),))
+            else:
+                found = frozenset()
+                for choice in self.choices:
+                    child = state.copy()
+                    child[code] = choice
+                    found |= self.outcomes(child)
+            self._outcomes[key] = found
+        return found
+
+    def paths(self) -> Iterator[Tuple[Tuple[Tuple[str, Response], ...], str]]:
+        """Every complete answer path from an empty state, with its judgement."""
+
+        def expand(state: AnswerState, prefix: Tuple[Tuple[str, Response], ...]):
+            code = self.next_question(state)
+            if code is None:
+                yield prefix, JUDGEMENTS[self.judgement(state)]
+                return
+            for choice in self.choices:
+                child = state.copy()
+                child[code] = choice
+                yield from expand(child, prefix + ((code, choice),))
+
+        yield from expand(AnswerState(self.codes), ())
+
+    def flips(self, answers: StateMapping) -> Tuple[FrozenSet[int], List[FlipOutcome]]:
+        """Reachable judgements for ``answers`` and for each single-answer flip on its path.
+
+        Each flip is ``(question, original, flipped, judgement codes)``.
+        """
+        known = AnswerState.for_domain(self.spec, {code: answers.get(code) for code in self.codes})
+        key = bytes(known.values)
+        cached = self._flips.get(key)
+        if cached is None:
+            state = self.walk(known)
+            outcomes: List[FlipOutcome] = []
+            for code in state:
+                for choice in self.choices:
+                    if choice is state[code]:
+                        continue
+                    changed = known.copy()
+                    changed[code] = choice
+                    outcomes.append((code, state[code], choice, self.outcomes(self.walk(changed))))
+            cached = self._flips[key] = (self.outcomes(state), outcomes)
+        return cached
+
+
+@dataclass
+class Flip:
+    """Judgements after changing one answer."""
+
+    domain: str
+    question: str
+    original: Response
+    flipped: Response
+    domain_judgements: Tuple[str, ...]
+    overall_judgements: Tuple[str, ...]
+    changes_domain: bool
+    changes_overall: bool
+
+
+@dataclass
+class StudySensitivity:
+    """Judgements of one study and how each single-answer flip affects them.
+
+    Judgements are tuples of the outcomes still possible; they hold one
+    value unless a domain is incomplete.
+    """
+
+    study: str
+    domain_judgements: Dict[str, Tuple[str, ...]]
+    overall_judgements: Tuple[str, ...]
+    flips: List[Flip] = field(default_factory=list)
+
+    def changing(self) -> List[Flip]:
+        """Flips that change the domain or overall judgement."""
+        return [flip for flip in self.flips if flip.changes_domain or flip.changes_overall]
+
+    def rows(self, changing_only: bool = True) -> List[dict]:
+        """Flat rows for a DataFrame or export."""
+        flips = self.changing() if changing_only else self.flips
+        return [
+            {
+                "study": self.study,
+                "domain": flip.domain,
+                "question": flip.question,
+                "original": flip.original.value,
+                "flipped": flip.flipped.value,
+                "domain_judgement": " / ".join(self.domain_judgements[flip.domain]),
+                "flipped_domain_judgement": " / ".join(flip.domain_judgements),
+                "overall_judgement": " / ".join(self.overall_judgements),
+                "flipped_overall_judgement": " / ".join(flip.overall_judgements),
+            }
+            for flip in flips
+        ]
+
+
+class SensitivityAnalyzer:
+    """Single-answer flip analysis for many studies, sharing one enumeration per domain.
+
+    Each study is a mapping of domain key to its ``state``; pass only the
+    Domain 2 variant that applies so the overall judgement is meaningful.
+    """
+
+    def __init__(
+        self,
+        specs: Optional[Dict[str, DomainSpec]] = None,
+        choices: Tuple[Response, ...] = ANSWER_CHOICES,
+        some_concerns_threshold: Optional[int] = DEFAULT_SOME_CONCERNS_THRESHOLD,
+    ):
+        self.specs = specs if specs is not None else get_domain_specs()
+        self.choices = tuple(choices)
+        self.some_concerns_threshold = some_concerns_threshold
+        self._enumerators: Dict[str, DomainEnumerator] = {}
+        self._overall: Dict[Tuple[FrozenSet[int], ...], FrozenSet[int]] = {}
+
+    def enumerator(self, domain_key: str) -> DomainEnumerator:
+        if domain_key not in self._enumerators:
+            if domain_key not in self.specs:
+                raise KeyError(f"Unknown domain: {domain_key}")
+            self._enumerators[domain_key] = DomainEnumerator(self.specs[domain_key], self.choices)
+        return self._enumerators[domain_key]
+
+    def _overall_set(self, domains: Tuple[FrozenSet[int], ...]) -> FrozenSet[int]:
+        found = self._overall.get(domains)
+        if found is None:
+            combos = np.array(list(product(*(sorted(codes) for codes in domains))), dtype=np.uint8)
+            codes, _ = overall_many(combos.reshape(len(combos), len(domains)), self.some_concerns_threshold)
+            found = self._overall[domains] = frozenset(codes.tolist())
+        return found
+
+    def analyze(self, states: Mapping[str, StateMapping], study: str = "") -> StudySensitivity:
+        keys = list(states)
+        base: Dict[str, FrozenSet[int]] = {}
+        outcomes: Dict[str, List[FlipOutcome]] = {}
+        for key in keys:
+            base[key], outcomes[key] = self.enumerator(key).flips(states[key])
+        base_overall = self._overall_set(tuple(base[key] for key in keys))
+
+        result = StudySensitivity(study, {key: _labels(base[key]) for key in keys}, _labels(base_overall))
+        for position, key in enumerate(keys):
+            for code, original, flipped, judgements in outcomes[key]:
+                domains = tuple(judgements if other == position else base[k] for other, k in enumerate(keys))
+                overall = self._overall_set(domains)
+                result.flips.append(
+                    Flip(
+                        key,
+                        code,
+                        original,
+                        flipped,
+                        _labels(judgements),
+                        _labels(overall),
+                        judgements != base[key],
+                        overall != base_overall,
+                    )
+                )
+        return result
+
+    def analyze_many(self, studies: Mapping[str, Mapping[str, StateMapping]]) -> List[StudySensitivity]:
+        return [self.analyze(states, study) for study, states in studies.items()]
+
+
+def load_states(path: Union[str, Path]) -> Dict[str, Dict[str, Dict[str, Response]]]:
+    """Read ``{study: {domain_key: {question_code: "PY", ...}}}`` JSON."""
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    return {
+        study: {
+            key: {code: Response(value) for code, value in state.items() if value is not None}
+            for key, state in domains.items()
+        }
+        for study, domains in data.items()
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m rob2.sensitivity",
+        description="List single-answer flips that change domain or overall judgements.",
+    )
+    parser.add_argument("states", type=Path, help='JSON {study: {domain_key: {question_code: "Y", ...}}}')
+    parser.add_argument("--threshold", type=int, default=DEFAULT_SOME_CONCERNS_THRESHOLD,
+                        help="domains with some concerns that make the overall judgement high (0 disables)")
+    parser.add_argument("--csv", type=Path, help="write the changing flips to this CSV file")
+    args = parser.parse_args(argv)
+
+    analyzer = SensitivityAnalyzer(some_concerns_threshold=args.threshold or None)
+    reports = analyzer.analyze_many(load_states(args.states))
+    rows = [row for report in reports for row in report.rows()]
+    for report in reports:
+        print(f"{report.study}: overall {' / '.join(report.overall_judgements)}")
+        for flip in report.changing():
+            print(
+                f"  {flip.question} {flip.original.value} -> {flip.flipped.value}: "
+                f"{flip.domain} {' / '.join(flip.domain_judgements)}, overall {' / '.join(flip.overall_judgements)}"
+            )
+    if args.csv:
+        import csv
+
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else ["study"])
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Policy for speculatively prefetching signalling questions.
+
+In speculative mode the runner sends every question a domain may still need,
+instead of waiting for each answer before asking the next one. Which
+questions are worth sending is decided by :class:`SpeculationPolicy`: a
+question is prefetched when the probability that it will be asked is at least
+``threshold``. The probability comes from :class:`PathStats` (how often the
+question was reached in past runs whose answers agree with the current
+partial state) once enough such runs exist, and from the decision tree with
+uniformly drawn answers before that.
+"""
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Tuple, Union
+
+from .common import DomainSpec, Response
+from .decision import reach_probabilities
+
+
+class PathStats:
+    """Per-domain counts of completed walks, of questions reached and of each distinct walk."""
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        self.path = Path(path) if path is not None else None
+        self.runs: Dict[str, int] = {}
+        self.reached: Dict[str, Dict[str, int]] = {}
+        # Domain -> "1.1=Y;1.2=PN;..." -> count, for frequencies conditioned on a partial state.
+        self.walks: Dict[str, Dict[str, int]] = {}
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "PathStats":
+        stats = cls(path)
+        if stats.path.exists():
+            data = json.loads(stats.path.read_text(encoding="utf-8"))
+            stats.runs = data.get("runs", {})
+            stats.reached = data.get("reached", {})
+            stats.walks = data.get("walks", {})
+        return stats
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps({"runs": self.runs, "reached": self.reached, "walks": self.walks}, indent=2), encoding="utf-8")
+
+    def record(self, domain_key: str, state: Mapping[str, Optional[Response]]) -> None:
+        """Record one completed walk through a domain: the final ``state`` of its answers."""
+        answers = {code: value.value for code, value in state.items() if value is not None}
+        self.runs[domain_key] = self.runs.get(domain_key, 0) + 1
+        counts = self.reached.setdefault(domain_key, {})
+        for code in answers:
+            counts[code] = counts.get(code, 0) + 1
+        walk = ";".join(f"{code}={value}" for code, value in answers.items())
+        walks = self.walks.setdefault(domain_key, {})
+        walks[walk] = walks.get(walk, 0) + 1
+
+    def conditional(self, domain_key: str, state: Mapping[str, Optional[Response]]) -> Tuple[int, Dict[str, int]]:
+        """``(runs, reached counts)`` over recorded walks whose answers agree with ``state``."""
+        known = {code: value.value for code, value in state.items() if value is not None}
+        runs, reached = 0, {}
+        for walk, count in self.walks.get(domain_key, {}).items():
+            answers = dict(item.split("=", 1) for item in walk.split(";") if item)
+            if all(answers.get(code) == value for code, value in known.items()):
+                runs += count
+                for code in answers:
+                    reached[code] = reached.get(code, 0) + count
+        return runs, reached
+
+    def frequency(self, domain_key: str, question_code: str) -> Optional[float]:
+        runs = self.runs.get(domain_key, 0)
+        if not runs:
+            return None
+        return self.reached.get(domain_key, {}).get(question_code, 0) / runs
+
+
+@dataclass
+class SpeculationPolicy:
+    """Prefetch questions whose reach probability is at least ``threshold``.
+
+    ``threshold=0`` sends every reachable question at once (one round trip per
+    domain); ``threshold=1`` only sends questions that are certain to be asked.
+    """
+
+    threshold: float = 0.5
+    stats: Optional[PathStats] = None
+    min_runs: int = 20
+
+    def probabilities(self, spec: DomainSpec, state: dict) -> Dict[str, float]:
+        # Questions the state has ruled out are not reachable and never appear.
+        probs = reach_probabilities(spec, state)
+        if self.stats is not None:
+            runs, reached = self.stats.conditional(spec.key, state)
+            if runs >= self.min_runs:
+                for code in probs:
+                    if probs[code] < 1.0:
+                        probs[code] = reached.get(code, 0) / runs
+        return probs
+
+    def candidates(self, spec: DomainSpec, state: dict) -> List[str]:
+        """Unanswered questions to send now, given the answers in ``state``."""
+        return [
+            code
+            for code, p in self.probabilities(spec, state).items()
+            if p >= self.threshold and state.get(code) is None
+        ]
@@ -0,0 +1,218 @@
+"""Compiled lookup tables for domain evaluators.
+
+Each domain's ``evaluate`` is a chain of set-membership rules that builds a
+fresh ``DomainResult`` on every call. :func:`compile_domain` runs that chain
+once per answer combination and stores, for every combination of the seven
+answer codes (unanswered plus the six ``Response`` values), the index of an
+interned result object shared by all combinations that end the same way.
+
+The rules only ever test membership in ``YES``, ``NO``, ``NO_INFO`` and
+``NOT_APPLICABLE``, so the chain is run on one representative per class
+(5^n calls) and expanded to the full 7^n table. :meth:`TruthTable.verify`
+checks that expansion against the rule chain for every combination::
+
+    python -m rob2.truth_table
+
+:meth:`TruthTable.evaluate_many` applies the table to a whole matrix of
+encoded answers at once: each row's codes are folded into a table index and
+gathered, so a million rows cost a few array passes instead of a million
+rule-chain calls.
+"""
+
+import argparse
+import time
+from itertools import product
+from typing import Any, Dict, Hashable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .common import CODE_OF, JUDGEMENT_CODE, RESPONSE_CODES, BaseDomain, DomainResult, Response
+from .compact import AnswerState, CompactResult
+
+# Answer class of each response code: unanswered, yes, no info, no, not applicable.
+CLASS_OF_CODE = np.array([0, 1, 1, 2, 3, 3, 4], dtype=np.int64)
+CLASS_REPRESENTATIVES: Tuple[Optional[Response], ...] = (None, Response.Y, Response.NI, Response.N, Response.NA)
+
+_TABLES: Dict[type, "TruthTable"] = {}
+
+
+def result_key(result: DomainResult) -> Tuple[Hashable, ...]:
+    """Everything that distinguishes one evaluation outcome from another."""
+    return type(result), result.domain_name, result.judgement, result.explanation, tuple(result.path)
+
+
+def _encode(answer) -> int:
+    try:
+        return CODE_OF[answer]
+    except (KeyError, TypeError):
+        raise ValueError(f"Invalid input: {answer}. Must be a Response enum or None.") from None
+
+
+def _encode_cell(value) -> int:
+    if isinstance(value, str):
+        value = value.strip().upper()
+        if not value:
+            return 0
+        try:
+            return CODE_OF[Response(value)]
+        except ValueError:
+            raise ValueError(f"Invalid input: {value}. Must be one of Y, PY, NI, PN, N, NA.") from None
+    if isinstance(value, float) and value != value:
+        return 0
+    if isinstance(value, (int, np.integer)) and not isinstance(value, bool):
+        if 0 <= value < len(RESPONSE_CODES):
+            return int(value)
+        raise ValueError(f"Invalid response code: {value}")
+    return _encode(value)
+
+
+def encode_responses(values: Any) -> np.ndarray:
+    """Response codes for an array of answers.
+
+    Integer arrays are taken as codes already (the fast path) and only
+    range-checked; ``Response`` members, answer strings such as ``"PY"``,
+    ``None``, empty strings and NaN are converted element by element.
+    """
+    array = np.asarray(values)
+    if array.dtype.kind in "iu":
+        if array.size and (array.min() < 0 or array.max() >= len(RESPONSE_CODES)):
+            raise ValueError(f"Response codes must be in 0..{len(RESPONSE_CODES) - 1}")
+        return array
+    if array.dtype.kind == "f" and np.all(np.isnan(array) | (array == np.round(array))):
+        return encode_responses(np.nan_to_num(array, nan=0).astype(np.int64))
+    flat = array.ravel()
+    codes = np.fromiter((_encode_cell(value) for value in flat), dtype=np.uint8, count=flat.size)
+    return codes.reshape(array.shape)
+
+
+class TruthTable:
+    """``evaluate`` for one domain as a table over all answer combinations.
+
+    ``table[i]`` is the index into ``results`` for the combination whose
+    response codes, read as base-7 digits in question order, spell ``i``.
+    Results are shared between lookups and must not be mutated.
+    """
+
+    def __init__(self, domain: BaseDomain):
+        self.domain = domain
+        self.codes: Tuple[str, ...] = tuple(domain.questions)
+        self.arity = len(self.codes)
+        self.results: List[DomainResult] = []
+        interned: Dict[Tuple[Hashable, ...], int] = {}
+
+        reduced = np.empty(len(CLASS_REPRESENTATIVES) ** self.arity, dtype=np.int64)
+        for row, answers in enumerate(product(CLASS_REPRESENTATIVES, repeat=self.arity)):
+            result = domain.evaluate(*answers)
+            key = result_key(result)
+            if key not in interned:
+                interned[key] = len(self.results)
+                self.results.append(result)
+            reduced[row] = interned[key]
+
+        index = np.zeros(1, dtype=np.int64)
+        for _ in range(self.arity):
+            index = (index[:, None] * len(CLASS_REPRESENTATIVES) + CLASS_OF_CODE[None, :]).ravel()
+        dtype = np.uint8 if len(self.results) <= np.iinfo(np.uint8).max else np.uint16
+        self.table: np.ndarray = reduced[index].astype(dtype)
+        self.judgements: np.ndarray = np.array(
+            [JUDGEMENT_CODE[result.judgement] for result in self.results], dtype=np.uint8
+        )
+        self.compact: List[CompactResult] = [
+            CompactResult(self, int(code), path_id) for path_id, code in enumerate(self.judgements)
+        ]
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def index(self, answers: Sequence[Optional[Response]]) -> int:
+        """Table row for a sequence of answers in question order."""
+        if len(answers) != self.arity:
+            raise ValueError(f"{self.domain.key} takes {self.arity} answers, got {len(answers)}")
+        row = 0
+        for answer in answers:
+            row = row * len(RESPONSE_CODES) + _encode(answer)
+        return row
+
+    def evaluate(self, *answers: Optional[Response]) -> DomainResult:
+        """Drop-in for ``domain.evaluate`` returning the shared result."""
+        return self.results[self.table[self.index(answers)]]
+
+    def evaluate_compact(self, *answers: Optional[Response]) -> CompactResult:
+        """Like :meth:`evaluate`, returning the shared slotted handle."""
+        return self.compact[self.table[self.index(answers)]]
+
+    def evaluate_state(self, state: Mapping[str, Response]) -> DomainResult:
+        if isinstance(state, AnswerState) and state.codes == self.codes:
+            row = 0
+            for value in state.values:
+                row = row * len(RESPONSE_CODES) + value
+            return self.results[self.table[row]]
+        return self.evaluate(*(state.get(code) for code in self.codes))
+
+    def evaluate_many(self, answers: Any) -> Tuple[np.ndarray, np.ndarray]:
+        """Judgement codes and result IDs for a rows x questions matrix.
+
+        ``answers`` is a 2-D array with one column per question in question
+        order, or a DataFrame with the question codes as columns (in any
+        order, extra columns ignored; a missing code raises ``KeyError``).
+        Judgement codes index ``rob2.common.JUDGEMENTS``; result IDs index
+        :attr:`results`, whose ``path`` and ``explanation`` give the decision
+        path.
+        """
+        if hasattr(answers, "columns"):
+            missing = [code for code in self.codes if code not in answers.columns]
+            if missing:
+                raise KeyError(f"{self.domain.key} answers have no column for {', '.join(missing)}")
+            answers = answers[list(self.codes)].to_numpy()
+        codes = encode_responses(answers)
+        if codes.ndim != 2 or codes.shape[1] != self.arity:
+            raise ValueError(f"{self.domain.key} expects an (n, {self.arity}) answer matrix, got {codes.shape}")
+        rows = np.zeros(len(codes), dtype=np.int64)
+        for column in range(self.arity):
+            rows *= len(RESPONSE_CODES)
+            rows += codes[:, column]
+        result_ids = self.table[rows]
+        return self.judgements[result_ids], result_ids
+
+    def verify(self) -> int:
+        """Compare every combination with the rule chain; returns how many were checked."""
+        checked = 0
+        for row, answers in enumerate(product(RESPONSE_CODES, repeat=self.arity)):
+            expected = result_key(self.domain.evaluate(*answers))
+            if result_key(self.results[self.table[row]]) != expected:
+                raise AssertionError(f"{self.domain.key}: table disagrees with evaluate for {answers}")
+            checked += 1
+        return checked
+
+
+def compile_domain(domain: BaseDomain) -> TruthTable:
+    """Cached :class:`TruthTable` for ``domain``'s class."""
+    table = _TABLES.get(type(domain))
+    if table is None:
+        table = _TABLES[type(domain)] = TruthTable(domain)
+    return table
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from .domains import DOMAIN_CLASSES, get_domain_spec
+
+    parser = argparse.ArgumentParser(
+        prog="python -m rob2.truth_table",
+        description="Check compiled domain tables against the rule chains for every answer combination.",
+    )
+    parser.add_argument("domains", nargs="*", help="registry keys (default: all)")
+    args = parser.parse_args(argv)
+
+    for key in args.domains or DOMAIN_CLASSES:
+        started = time.perf_counter()
+        table = get_domain_spec(key).compiled()
+        compiled = time.perf_counter() - started
+        checked = table.verify()
+        print(
+            f"{key}: {checked} combinations agree, {len(table.results)} distinct results "
+            f"(compiled in {compiled:.2f}s, verified in {time.perf_counter() - started - compiled:.2f}s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Token usage, prompt-cache hits and cost per study.
+
+The runner adds every provider call's usage to a per-study
+:class:`TokenUsage` (``StudyResult.usage``): requests, input tokens, the
+part of them the provider served from its prompt cache, and output tokens.
+Answers served from the local response cache cost nothing and are not
+counted. :func:`usage_rows` turns results into one row per study with the
+cache-hit ratio, the cost and the amount saved by cached input tokens,
+priced with :data:`PRICING` (USD per million tokens; check them against the
+provider's current price list).
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from .llm import DEFAULT_MODEL
+
+
+@dataclass
+class TokenUsage:
+    """Provider usage summed over requests."""
+
+    requests: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+
+    def add(self, input_tokens: int, output_tokens: int, cached_tokens: int = 0) -> None:
+        self.requests += 1
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.cached_tokens += cached_tokens
+
+    def __iadd__(self, other: "TokenUsage") -> "TokenUsage":
+        self.requests += other.requests
+        self.input_tokens += other.input_tokens
+        self.cached_tokens += other.cached_tokens
+        self.output_tokens += other.output_tokens
+        return self
+
+    @property
+    def uncached_tokens(self) -> int:
+        return self.input_tokens - self.cached_tokens
+
+    @property
+    def cache_hit_ratio(self) -> float:
+        """Share of input tokens served from the prompt cache."""
+        return self.cached_tokens / self.input_tokens if self.input_tokens else 0.0
+
+
+@dataclass(frozen=True)
+class Pricing:
+    """USD per million input, cached input and output tokens."""
+
+    input: float
+    cached_input: float
+    output: float
+
+    def cost(self, usage: TokenUsage) -> float:
+        return (
+            usage.uncached_tokens * self.input + usage.cached_tokens * self.cached_input + usage.output_tokens * self.output
+        ) / 1_000_000
+
+    def saved(self, usage: TokenUsage) -> float:
+        """What the cached input tokens would have cost at the uncached rate, minus what they cost."""
+        return usage.cached_tokens * (self.input - self.cached_input) / 1_000_000
+
+
+PRICING: Dict[str, Pricing] = {
+    "gpt-4.1": Pricing(2.00, 0.50, 8.00),
+    "gpt-4.1-mini": Pricing(0.40, 0.10, 1.60),
+    "gpt-4.1-nano": Pricing(0.10, 0.025, 0.40),
+    "gpt-4o": Pricing(2.50, 1.25, 10.00),
+    "gpt-4o-mini": Pricing(0.15, 0.075, 0.60),
+}
+
+
+def pricing_for(model: str) -> Pricing:
+    """Prices for ``model`` (dated snapshots and ``mock:`` names included), else the default model's."""
+    model = model.split(":", 1)[-1]
+    matches = [name for name in PRICING if model == name or model.startswith(name + "-")]
+    return PRICING[max(matches, key=len)] if matches else PRICING[DEFAULT_MODEL]
+
+
+def usage_rows(results: Iterable, pricing: Optional[Pricing] = None, model: str = DEFAULT_MODEL) -> List[dict]:
+    """One row per :class:`~rob2.runner.StudyResult` with tokens, cache-hit ratio, cost and savings."""
+    pricing = pricing or pricing_for(model)
+    rows = []
+    for result in results:
+        usage = result.usage
+        rows.append({
+            "study": result.study.name,
+            "requests": usage.requests,
+            "input_tokens": usage.input_tokens,
+            "cached_tokens": usage.cached_tokens,
+            "output_tokens": usage.output_tokens,
+            "cache_hit_ratio": round(usage.cache_hit_ratio, 4),
+            "cost_usd": round(pricing.cost(usage), 6),
+            "saved_usd": round(pricing.saved(usage), 6),
+        })
+    return rows
+
+
+def total_usage(results: Iterable) -> TokenUsage:
+    total = TokenUsage()
+    for result in results:
+        total += result.usage
+    return total
+
+
+def format_usage(usage: TokenUsage, pricing: Pricing) -> str:
+    """One-line summary: input tokens, cache-hit ratio, cost and savings."""
+    return (
+        f"{usage.input_tokens} input tokens ({usage.cache_hit_ratio:.0%} from prompt cache), "
+        f"{usage.output_tokens} output tokens, ${pricing.cost(usage):.2f} "
+        f"(saved ${pricing.saved(usage):.2f} by prompt caching)"
+    )
@@ -0,0 +1,15 @@
+"""Compiled truth tables must agree with each domain's ``evaluate`` rule chain."""
+
+import pytest
+
+from rob2.domains import get_domain_specs
+
+SPECS = get_domain_specs()
+
+
+@pytest.mark.parametrize("key", sorted(SPECS))
+def test_table_matches_evaluate(key):
+    spec = SPECS[key]
+    table = spec.compiled()
+    # Every combination of answers, None included, is checked.
+    assert table.verify() == 7 ** table.arity